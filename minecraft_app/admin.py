@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import TownyServer, Nation, Town, StaffMember, Rank, ServerRule, DynamicMapPoint, UserProfile, UserPurchase, StoreItem, CartItem
+from .models import TownyServer, Nation, Town, StaffMember, Rank, ServerRule, DynamicMapPoint, UserProfile, UserPurchase, StoreItem, CartItem, RankDelivery, MojangProfileCache, ContactMessage, PlayerEntitlement
+from django.utils import timezone
+from django.db import transaction
+from .minecraft_service import enqueue_rank_delivery
 
 # Basic admin registration for existing models
 admin.site.register(TownyServer)
@@ -31,6 +34,29 @@ class UserPurchaseAdmin(admin.ModelAdmin):
     list_filter = ('payment_status', 'created_at')
     search_fields = ('user__username', 'rank__name', 'payment_id')
     date_hierarchy = 'created_at'
+    actions = ['apply_ranks_in_game']
+    
+    def apply_ranks_in_game(self, request, queryset):
+        # Only paid purchases, through the RankDelivery outbox so each grant is recorded and retried
+        purchases = (
+            queryset.filter(payment_status='completed', rank__isnull=False)
+            .exclude(deliveries__status='pending')
+            .select_related('rank', 'user__profile')
+        )
+        queued = 0
+        with transaction.atomic():
+            for purchase in purchases:
+                username = getattr(getattr(purchase.user, 'profile', None), 'minecraft_username', '')
+                if enqueue_rank_delivery(purchase.user, username, purchase.rank.name, purchase=purchase):
+                    queued += 1
+        skipped = queryset.count() - queued
+        self.message_user(
+            request,
+            f"{queued} rank(s) queued for delivery in game; {skipped} skipped "
+            "(not paid, no rank, no Minecraft username or already queued).",
+        )
+    
+    apply_ranks_in_game.short_description = 'Queue selected ranks for delivery in game'
 
 admin.site.register(UserPurchase, UserPurchaseAdmin)
 
@@ -70,4 +96,55 @@ class CartItemAdmin(admin.ModelAdmin):
     
     get_item_name.short_description = 'Item'
 
-admin.site.register(CartItem, CartItemAdmin)
\ No newline at end of file
+admin.site.register(CartItem, CartItemAdmin)
+
+# Rank delivery outbox (drained by the deliver_ranks command)
+class RankDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('minecraft_username', 'rank_name', 'status', 'attempts', 'next_attempt_at', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('minecraft_username', 'rank_name', 'user__username')
+    readonly_fields = ('created_at', 'delivered_at')
+    actions = ['requeue']
+    
+    def requeue(self, request, queryset):
+        updated = queryset.exclude(status='delivered').update(status='pending', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f"{updated} delivery(ies) queued again.")
+    
+    requeue.short_description = 'Queue selected deliveries again'
+
+admin.site.register(RankDelivery, RankDeliveryAdmin)
+
+
+# Mojang name -> UUID cache (services.fetch_minecraft_uuids)
+class MojangProfileCacheAdmin(admin.ModelAdmin):
+    list_display = ('name', 'minecraft_uuid', 'fetched_at')
+    search_fields = ('name_lower', 'minecraft_uuid')
+
+admin.site.register(MojangProfileCache, MojangProfileCacheAdmin)
+
+
+# Contact form messages waiting for (or sent to) the Discord webhook
+class ContactMessageAdmin(admin.ModelAdmin):
+    list_display = ('name', 'subject', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('name', 'subject', 'discord_username', 'minecraft_username')
+    readonly_fields = ('created_at', 'sent_at')
+    actions = ['requeue']
+    
+    def requeue(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(status='pending', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f"{updated} message(s) queued again.")
+    
+    requeue.short_description = 'Queue selected messages again'
+
+admin.site.register(ContactMessage, ContactMessageAdmin)
+
+
+# Denormalized rank/discount summary per user (entitlements.py)
+class PlayerEntitlementAdmin(admin.ModelAdmin):
+    list_display = ('user', 'highest_rank', 'discount_percentage', 'updated_at')
+    list_filter = ('discount_percentage',)
+    search_fields = ('user__username',)
+    readonly_fields = ('user', 'highest_rank', 'owned_rank_ids', 'discount_percentage', 'updated_at')
+
+admin.site.register(PlayerEntitlement, PlayerEntitlementAdmin)
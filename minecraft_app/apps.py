@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MinecraftAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'minecraft_app'
+
+    def ready(self):
+        # Invalidation des caches à la sauvegarde des modèles
+        from . import signals  # noqa: F401
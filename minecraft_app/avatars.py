@@ -0,0 +1,189 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image
+from .http_client import build_session
+from .services import is_valid_minecraft_username
+
+logger = logging.getLogger(__name__)
+
+UUID_PATTERN = re.compile(r'^[0-9a-fA-F]{32}$')
+
+# Échecs récents : pour un joueur (tête introuvable), ou pour tout mc-heads.net (injoignable)
+FAILURE_CACHE_KEY = 'minecraft_app:avatar_failure:{identifier}'
+UPSTREAM_DOWN_KEY = 'minecraft_app:avatar_upstream_down'
+PRUNE_LOCK_KEY = 'minecraft_app:avatar_prune'
+
+# Tête de Steve fournie avec le site, servie quand mc-heads.net est injoignable
+FALLBACK_AVATAR = os.path.join(settings.BASE_DIR, 'minecraft_app', 'static', 'images', 'steve_head.png')
+
+def normalize_identifier(identifier):
+    """
+    Retourne la forme canonique d'un UUID (sans tirets, minuscules) ou d'un
+    pseudo Minecraft (minuscules), ou None si l'identifiant est invalide.
+    """
+    compact = identifier.replace('-', '')
+    if UUID_PATTERN.match(compact):
+        return compact.lower()
+    if is_valid_minecraft_username(identifier):
+        return identifier.lower()
+    return None
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session():
+    # Session à part : une seule tentative avec un timeout court, pour ne pas bloquer la
+    # requête plusieurs fois OUTBOUND_HTTP_READ_TIMEOUT quand mc-heads.net est en panne
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session(timeout=settings.AVATAR_UPSTREAM_TIMEOUT, retries=0)
+    return _session
+
+def _fetch_source(identifier, path):
+    """
+    Télécharge la tête en taille source depuis mc-heads.net. Les échecs sont
+    mémorisés AVATAR_FAILURE_TTL secondes, par joueur ou pour tout le service
+    s'il ne répond pas, afin de ne pas le réinterroger à chaque requête.
+
+    Returns:
+        bool: True si la tête a été téléchargée
+    """
+    if cache.get_many([UPSTREAM_DOWN_KEY, FAILURE_CACHE_KEY.format(identifier=identifier)]):
+        return False
+    url = f"{settings.AVATAR_UPSTREAM_URL}/avatar/{identifier}/{settings.AVATAR_SOURCE_SIZE}"
+    try:
+        response = _get_session().get(url)
+    except Exception as e:
+        logger.warning(f"Erreur lors du téléchargement de l'avatar {identifier}: {str(e)}")
+        cache.set(UPSTREAM_DOWN_KEY, True, settings.AVATAR_FAILURE_TTL)
+        return False
+    try:
+        if response.status_code != 200:
+            raise ValueError(f"statut {response.status_code}")
+        # Vérifier que c'est bien une image avant de l'enregistrer
+        Image.open(io.BytesIO(response.content)).verify()
+    except Exception as e:
+        logger.warning(f"Avatar {identifier} indisponible: {str(e)}")
+        key = UPSTREAM_DOWN_KEY if response.status_code >= 500 else FAILURE_CACHE_KEY.format(identifier=identifier)
+        cache.set(key, True, settings.AVATAR_FAILURE_TTL)
+        return False
+    _write_atomic(path, response.content)
+    return True
+
+def _entry_mtime(entry):
+    try:
+        return os.path.getmtime(os.path.join(entry.path, 'source.png'))
+    except OSError:
+        return 0
+
+def prune_avatar_cache():
+    """
+    Borne le cache disque à AVATAR_CACHE_MAX_ENTRIES joueurs : au-delà, les
+    têtes téléchargées le plus anciennement sont supprimées (celles qui sont
+    encore demandées sont re-téléchargées tous les AVATAR_CACHE_TTL, donc
+    restent récentes).
+
+    Returns:
+        int: Nombre de joueurs retirés du cache
+    """
+    try:
+        entries = [entry for entry in os.scandir(settings.AVATAR_CACHE_DIR) if entry.is_dir()]
+    except OSError:
+        return 0
+    excess = len(entries) - settings.AVATAR_CACHE_MAX_ENTRIES
+    if excess <= 0:
+        return 0
+    # Un peu de marge pour ne pas recommencer à la prochaine tête
+    excess += settings.AVATAR_CACHE_MAX_ENTRIES // 10
+    entries.sort(key=_entry_mtime)
+    for entry in entries[:excess]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+    return min(excess, len(entries))
+
+def _resize(source_path, size):
+    with Image.open(source_path) as image:
+        # NEAREST garde les pixels nets d'une tête Minecraft
+        resized = image.convert('RGBA').resize((size, size), Image.NEAREST)
+    out = io.BytesIO()
+    resized.save(out, format='PNG', optimize=True)
+    return out.getvalue()
+
+@lru_cache(maxsize=None)
+def get_fallback_avatar(size):
+    """
+    Tête de Steve fournie avec le site, au même format que get_avatar().
+    Réduite une seule fois par taille (AVATAR_MIN_SIZE à AVATAR_MAX_SIZE).
+    """
+    data = _resize(FALLBACK_AVATAR, size)
+    return data, hashlib.md5(data).hexdigest(), True
+
+def get_avatar(identifier, size):
+    """
+    Retourne la tête du joueur en PNG à la taille demandée, depuis le cache
+    disque. La source n'est téléchargée qu'une fois par AVATAR_CACHE_TTL ;
+    chaque taille est générée localement avec Pillow puis gardée sur disque.
+    Le cache est borné à AVATAR_CACHE_MAX_ENTRIES joueurs.
+
+    Args:
+        identifier (str): UUID ou pseudo déjà normalisé
+        size (int): Côté de l'image en pixels
+
+    Returns:
+        tuple: (contenu PNG, ETag, True si c'est l'avatar de repli)
+    """
+    directory = os.path.join(settings.AVATAR_CACHE_DIR, identifier)
+    source_path = os.path.join(directory, 'source.png')
+    sized_path = os.path.join(directory, f'{size}.png')
+
+    try:
+        source_mtime = os.path.getmtime(source_path)
+    except OSError:
+        source_mtime = None
+
+    if source_mtime is None or time.time() - source_mtime > settings.AVATAR_CACHE_TTL:
+        # En cas d'échec, une source périmée vaut mieux que la tête de Steve
+        if _fetch_source(identifier, source_path):
+            if source_mtime is None and cache.add(PRUNE_LOCK_KEY, True, settings.AVATAR_CACHE_PRUNE_INTERVAL):
+                # Nouveau joueur sur disque : nettoyage au plus une fois par intervalle
+                prune_avatar_cache()
+            source_mtime = os.path.getmtime(source_path)
+
+    if source_mtime is None:
+        return get_fallback_avatar(size)
+
+    try:
+        up_to_date = os.path.getmtime(sized_path) >= source_mtime
+    except OSError:
+        up_to_date = False
+
+    if up_to_date:
+        with open(sized_path, 'rb') as f:
+            data = f.read()
+    else:
+        data = _resize(source_path, size)
+        _write_atomic(sized_path, data)
+
+    return data, hashlib.md5(data).hexdigest(), False
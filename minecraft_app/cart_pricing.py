@@ -0,0 +1,94 @@
+import time
+from collections import namedtuple
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from .models import CartItem, get_player_discount
+
+# Panier d'un joueur, chaque ligne annotée de son `subtotal`
+PricedCart = namedtuple('PricedCart', ['items', 'count', 'total', 'discount_percentage'])
+
+def price_cart(user):
+    """
+    Calcule les prix de tout le panier en un nombre fixe de requêtes : les
+    lignes avec leur grade/objet (une jointure), puis la remise du joueur une
+    seule fois (depuis ses droits en cache).
+
+    Returns:
+        PricedCart: Lignes annotées, nombre de lignes, total et remise appliquée
+    """
+    items = list(
+        CartItem.objects.filter(user=user).select_related('rank', 'store_item').order_by('added_at', 'id')
+    )
+    discount_percentage = get_player_discount(user)
+
+    total = Decimal('0.00')
+    for item in items:
+        item.subtotal = item.get_subtotal(discount_percentage)
+        total += item.subtotal
+
+    return PricedCart(items=items, count=len(items), total=total, discount_percentage=discount_percentage)
+
+
+CART_SUMMARY_CACHE_KEY = 'minecraft_app:cart_summary:{user_id}'
+CART_PRICES_VERSION_KEY = 'minecraft_app:cart_prices_version'
+
+# Nombre de lignes et total du panier, pour l'en-tête de la boutique et les réponses AJAX
+CartSummary = namedtuple('CartSummary', ['count', 'total'])
+
+def _summary_key(user_id):
+    return CART_SUMMARY_CACHE_KEY.format(user_id=user_id)
+
+def _get_cached_summary(user_id):
+    """
+    Résumé en cache (None s'il manque ou date d'avant un changement de prix),
+    et la version actuelle des prix, en un seul aller-retour vers le cache.
+    """
+    key = _summary_key(user_id)
+    values = cache.get_many([key, CART_PRICES_VERSION_KEY])
+    version = values.get(CART_PRICES_VERSION_KEY)
+    entry = values.get(key)
+    if entry is None or entry[0] != version:
+        return None, version
+    return CartSummary(entry[1], entry[2]), version
+
+def _set_summary(user_id, summary, version):
+    cache.set(_summary_key(user_id), (version, summary.count, summary.total), timeout=settings.CART_SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+def remember_cart_summary(user, cart):
+    """Met en cache le résumé d'un panier qui vient d'être entièrement calculé."""
+    return _set_summary(user.id, CartSummary(cart.count, cart.total), cache.get(CART_PRICES_VERSION_KEY))
+
+def get_cart_summary(user):
+    """
+    Nombre de lignes et total du panier depuis le cache ; le panier n'est
+    recalculé (price_cart) que si le résumé manque.
+    """
+    summary, version = _get_cached_summary(user.id)
+    if summary is None:
+        cart = price_cart(user)
+        summary = _set_summary(user.id, CartSummary(cart.count, cart.total), version)
+    return summary
+
+def adjust_cart_summary(user, count_delta, total_delta):
+    """
+    Applique la modification d'une ligne au résumé en cache, sans relire le
+    panier. Sans résumé en cache, le panier est recalculé une fois.
+
+    Returns:
+        CartSummary: Le résumé à jour
+    """
+    summary, version = _get_cached_summary(user.id)
+    if summary is None:
+        # La ligne est déjà enregistrée : price_cart() en tient compte
+        cart = price_cart(user)
+        return _set_summary(user.id, CartSummary(cart.count, cart.total), version)
+    return _set_summary(user.id, CartSummary(summary.count + count_delta, summary.total + total_delta), version)
+
+def invalidate_cart_summary(user_id):
+    cache.delete(_summary_key(user_id))
+
+def invalidate_all_cart_summaries():
+    """Un prix ou une remise a changé : tous les totaux en cache sont périmés."""
+    cache.set(CART_PRICES_VERSION_KEY, time.time_ns(), timeout=None)
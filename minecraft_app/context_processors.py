@@ -0,0 +1,6 @@
+from .server_status import get_server
+
+
+def server(request):
+    """Met le TownyServer (depuis le cache) à disposition de tous les templates, pour base.html."""
+    return {'server': get_server()}
@@ -0,0 +1,188 @@
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .http_client import get_session
+from .models import ContactMessage
+
+logger = logging.getLogger(__name__)
+
+# Limites imposées par Discord pour un message de webhook
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARACTERS_PER_MESSAGE = 6000
+
+# Webhook supprimé ou URL changée : les messages attendent qu'il soit corrigé
+WEBHOOK_UNAVAILABLE_STATUSES = (401, 403, 404)
+
+def _truncate(value, limit):
+    return value if len(value) <= limit else value[:limit - 1] + "…"
+
+def build_contact_embed(contact):
+    """Embed Discord pour un message du formulaire de contact, tronqué aux limites de Discord."""
+    return {
+        "title": _truncate(f"New Contact Message: {contact.subject}", 256),
+        "description": _truncate(contact.message, 4096),
+        "color": 3447003,  # Discord blue
+        "fields": [
+            {"name": "From", "value": _truncate(contact.name, 1024), "inline": True},
+            {"name": "Discord", "value": _truncate(contact.discord_username or "Not provided", 1024), "inline": True},
+            {"name": "Minecraft", "value": _truncate(contact.minecraft_username or "Not provided", 1024), "inline": True}
+        ],
+        "footer": {"text": "Message sent from the website contact form"},
+        "timestamp": contact.created_at.isoformat(),
+    }
+
+def _embed_size(embed):
+    # Discord compte les caractères des titres, descriptions, champs et pieds de page
+    return (len(embed["title"]) + len(embed["description"]) + len(embed["footer"]["text"])
+            + sum(len(field["name"]) + len(field["value"]) for field in embed["fields"]))
+
+def group_embeds(contacts):
+    """
+    Regroupe les messages en envois de 10 embeds au plus, sans dépasser la
+    limite de 6000 caractères par message Discord.
+
+    Returns:
+        list: Listes de paires (ContactMessage, embed), une par envoi
+    """
+    batches = []
+    current, current_size = [], 0
+    for contact in contacts:
+        embed = build_contact_embed(contact)
+        size = _embed_size(embed)
+        if current and (len(current) == MAX_EMBEDS_PER_MESSAGE or current_size + size > MAX_EMBED_CHARACTERS_PER_MESSAGE):
+            batches.append(current)
+            current, current_size = [], 0
+        current.append((contact, embed))
+        current_size += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+class RateLimitedWebhook:
+    """
+    Envoi vers un webhook Discord en respectant ses en-têtes de limite de débit
+    (X-RateLimit-Remaining / X-RateLimit-Reset-After, par bucket) et les
+    réponses 429 (retry_after, éventuellement globales).
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.bucket = None
+        self._blocked_until = {}
+
+    def wait_time(self):
+        """Secondes à attendre avant de pouvoir poster sur ce webhook."""
+        now = time.monotonic()
+        return max(0, self._blocked_until.get(self.bucket, 0) - now, self._blocked_until.get('global', 0) - now)
+
+    def _update_limits(self, response):
+        self.bucket = response.headers.get('X-RateLimit-Bucket', self.bucket)
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset_after = response.headers.get('X-RateLimit-Reset-After')
+        if remaining is not None and reset_after is not None and int(remaining) == 0:
+            self._blocked_until[self.bucket] = time.monotonic() + float(reset_after)
+
+    def post(self, embeds):
+        """
+        Poste les embeds, en attendant si le bucket est épuisé.
+
+        Returns:
+            requests.Response: La réponse de Discord (un 429 est déjà pris en compte)
+        """
+        wait = self.wait_time()
+        if wait:
+            time.sleep(wait)
+        response = get_session().post(self.url, json={"embeds": embeds}, params={"wait": "true"})
+        self._update_limits(response)
+        if response.status_code == 429:
+            try:
+                data = response.json()
+            except ValueError:
+                data = {}
+            retry_after = float(data.get('retry_after', response.headers.get('Retry-After', 1)))
+            key = 'global' if data.get('global') or response.headers.get('X-RateLimit-Global') else self.bucket
+            self._blocked_until[key] = time.monotonic() + retry_after
+            logger.warning(f"Discord rate limit reached, retrying in {retry_after}s")
+        return response
+
+
+def _retry_delay(attempts):
+    delay = settings.CONTACT_DELIVERY_BACKOFF_BASE * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(delay, settings.CONTACT_DELIVERY_BACKOFF_MAX))
+
+def _save(contacts, **fields):
+    for contact in contacts:
+        for name, value in fields.items():
+            setattr(contact, name, value)
+    ContactMessage.objects.bulk_update(contacts, ['attempts'] + list(fields))
+
+def _post_batch(webhook, batch, counts):
+    contacts = [contact for contact, _ in batch]
+    for contact in contacts:
+        contact.attempts += 1
+    try:
+        response = webhook.post([embed for _, embed in batch])
+        status_code, error = response.status_code, f"HTTP {response.status_code}: {response.text[:500]}"
+    except Exception as e:
+        status_code, error = None, str(e)
+
+    if status_code in (200, 204):
+        _save(contacts, status='sent', sent_at=timezone.now(), last_error='')
+        counts['sent'] += len(contacts)
+    elif status_code == 400:
+        if len(batch) > 1:
+            # Un seul embed invalide fait refuser tout l'envoi : isoler le message fautif
+            for item in batch:
+                item[0].attempts -= 1
+                _post_batch(webhook, [item], counts)
+        else:
+            logger.error(f"Discord rejected contact message {contacts[0].id}: {error}")
+            _save(contacts, status='failed', last_error=error)
+            counts['failed'] += 1
+    else:
+        for contact in contacts:
+            contact.last_error = error
+            contact.next_attempt_at = timezone.now() + _retry_delay(contact.attempts)
+        ContactMessage.objects.bulk_update(contacts, ['attempts', 'last_error', 'next_attempt_at'])
+        counts['retried'] += len(contacts)
+        if status_code in WEBHOOK_UNAVAILABLE_STATUSES:
+            logger.error(
+                f"Discord webhook refused ({error}): check DISCORD_WEBHOOK_URL, "
+                f"{len(contacts)} message(s) kept and rescheduled"
+            )
+        else:
+            logger.warning(f"Discord webhook delivery failed, {len(contacts)} message(s) rescheduled: {error}")
+
+def deliver_contact_messages(webhook, limit=50):
+    """
+    Poste sur Discord les messages de contact en attente, regroupés jusqu'à
+    10 embeds par envoi. Tout échec (réseau, 5xx, 429, mais aussi webhook
+    supprimé ou URL invalide : 401, 403, 404) replanifie les messages avec un
+    backoff plafonné : ils sont retentés jusqu'à être livrés. Seul un message
+    refusé comme invalide (400) est marqué en échec. Comme pour
+    deliver_pending_ranks, les messages traités sont verrouillés (skip_locked)
+    pour que plusieurs workers puissent tourner sans doublons.
+
+    Args:
+        webhook (RateLimitedWebhook): Webhook cible, qui garde l'état des limites de débit
+        limit (int): Nombre maximum de messages traités
+
+    Returns:
+        dict: Nombre de messages envoyés, replanifiés et refusés
+    """
+    counts = {'sent': 0, 'retried': 0, 'failed': 0}
+    with transaction.atomic():
+        # Lignes verrouillées pendant l'envoi : un autre worker passe aux suivantes
+        # au lieu de poster les mêmes messages une deuxième fois
+        contacts = list(
+            ContactMessage.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=timezone.now())
+            .order_by('created_at')[:limit]
+        )
+        for batch in group_embeds(contacts):
+            _post_batch(webhook, batch, counts)
+    return counts
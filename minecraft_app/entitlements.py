@@ -0,0 +1,71 @@
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .cart_pricing import invalidate_cart_summary
+from .models import PlayerEntitlement, UserPurchase, get_discount_for_rank_names
+
+ENTITLEMENT_CACHE_KEY = 'minecraft_app:entitlement:{user_id}'
+
+# Grade le plus cher, identifiants des grades possédés et palier de remise d'un joueur
+Entitlement = namedtuple('Entitlement', ['highest_rank', 'owned_rank_ids', 'discount_percentage'])
+
+def _cache_key(user_id):
+    return ENTITLEMENT_CACHE_KEY.format(user_id=user_id)
+
+def _to_entitlement(record):
+    return Entitlement(
+        highest_rank=record.highest_rank,
+        owned_rank_ids=frozenset(record.owned_rank_ids),
+        discount_percentage=record.discount_percentage,
+    )
+
+def refresh_entitlement(user_id):
+    """
+    Recalcule l'enregistrement dénormalisé d'un joueur depuis ses achats
+    terminés. À appeler dans la transaction qui modifie ses achats : la ligne
+    est verrouillée le temps du calcul, et le cache n'est vidé qu'au commit.
+
+    Returns:
+        PlayerEntitlement: L'enregistrement mis à jour
+    """
+    with transaction.atomic():
+        record, _ = PlayerEntitlement.objects.select_for_update().get_or_create(user_id=user_id)
+        ranks = [
+            purchase.rank
+            for purchase in UserPurchase.objects.filter(user_id=user_id, payment_status='completed').select_related('rank')
+            if purchase.rank
+        ]
+        record.highest_rank = max(ranks, key=lambda rank: rank.price) if ranks else None
+        record.owned_rank_ids = sorted({rank.id for rank in ranks})
+        record.discount_percentage = get_discount_for_rank_names({rank.name.lower() for rank in ranks})
+        record.save()
+
+        def clear_cached():
+            cache.delete(_cache_key(user_id))
+            # La remise a pu changer : le total du panier aussi
+            invalidate_cart_summary(user_id)
+        transaction.on_commit(clear_cached)
+    return record
+
+def get_entitlement(user):
+    """
+    Droits d'un joueur, depuis le cache puis l'enregistrement dénormalisé,
+    sans parcourir son historique d'achats. L'enregistrement est créé au
+    premier appel pour les comptes antérieurs à son introduction.
+
+    Returns:
+        Entitlement: Grade le plus cher (ou None), grades possédés, remise
+    """
+    key = _cache_key(user.id)
+    entitlement = cache.get(key)
+    if entitlement is None:
+        record = PlayerEntitlement.objects.select_related('highest_rank').filter(user_id=user.id).first()
+        if record is None:
+            record = refresh_entitlement(user.id)
+        entitlement = _to_entitlement(record)
+        cache.set(key, entitlement, timeout=settings.ENTITLEMENT_CACHE_TIMEOUT)
+    return entitlement
+
+def owns_rank(user, rank):
+    return rank.id in get_entitlement(user).owned_rank_ids
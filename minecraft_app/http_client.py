@@ -0,0 +1,128 @@
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+import stripe
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class HostStats:
+    """Compteurs de latence et d'erreurs par hôte pour les appels sortants."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def record(self, host, elapsed_ms=None, error=False):
+        with self._lock:
+            stats = self._hosts.setdefault(
+                host, {'requests': 0, 'errors': 0, 'timed': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            )
+            stats['requests'] += 1
+            if error:
+                stats['errors'] += 1
+            if elapsed_ms is not None:
+                stats['timed'] += 1
+                stats['total_ms'] += elapsed_ms
+                stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+
+    def snapshot(self):
+        """Copie des compteurs, avec la latence moyenne par hôte."""
+        with self._lock:
+            return {
+                host: dict(stats, avg_ms=round(stats['total_ms'] / stats['timed'], 1) if stats['timed'] else None)
+                for host, stats in self._hosts.items()
+            }
+
+
+host_stats = HostStats()
+
+
+def _record_response(response, *args, **kwargs):
+    host = urlsplit(response.url).netloc
+    host_stats.record(host, response.elapsed.total_seconds() * 1000, error=response.status_code >= 500)
+
+
+class OutboundSession(requests.Session):
+    """
+    Session requests partagée : timeouts stricts par défaut et comptage des
+    échecs réseau (les réponses sont comptées par le hook `response`).
+    """
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.default_timeout = timeout
+        self.hooks['response'].append(_record_response)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.default_timeout)
+        try:
+            return super().request(method, url, **kwargs)
+        except requests.RequestException:
+            host_stats.record(urlsplit(url).netloc, error=True)
+            raise
+
+
+def build_session(timeout=None, retries=None):
+    """
+    Crée une session avec un pool de connexions keep-alive par hôte, et des
+    nouvelles tentatives avec jitter réservées aux méthodes idempotentes.
+
+    Args:
+        timeout: Timeout par défaut (connexion, lecture) ; OUTBOUND_HTTP_* sinon
+        retries (int): Nombre de nouvelles tentatives ; OUTBOUND_HTTP_RETRIES sinon
+    """
+    if timeout is None:
+        timeout = (settings.OUTBOUND_HTTP_CONNECT_TIMEOUT, settings.OUTBOUND_HTTP_READ_TIMEOUT)
+    if retries is None:
+        retries = settings.OUTBOUND_HTTP_RETRIES
+    session = OutboundSession(timeout=timeout)
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=0.5,
+        backoff_jitter=0.5,
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,  # GET, HEAD, PUT, DELETE... jamais POST
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.OUTBOUND_HTTP_POOL_HOSTS,
+        pool_maxsize=settings.OUTBOUND_HTTP_POOL_SIZE,
+        max_retries=retry,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Session HTTP sortante partagée par le processus (Mojang, Discord, Stripe)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def configure_stripe():
+    """Fait passer les appels de la librairie Stripe par la session partagée."""
+    stripe.default_http_client = stripe.RequestsClient(
+        timeout=(settings.OUTBOUND_HTTP_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT),
+        session=get_session(),
+    )
+    # Stripe gère lui-même les clés d'idempotence pour ses nouvelles tentatives
+    stripe.max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
@@ -0,0 +1,72 @@
+from django.db.models import Count, F, Sum
+from .models import Nation, Town
+
+def adjust_nation_counters(nation_id, towns_delta, residents_delta):
+    """Applique une variation aux compteurs d'une nation, en SQL pour rester juste en concurrence."""
+    if nation_id is None or not (towns_delta or residents_delta):
+        return
+    Nation.objects.filter(pk=nation_id).update(
+        towns_count=F('towns_count') + towns_delta,
+        residents_total=F('residents_total') + residents_delta,
+    )
+
+def refresh_nation_counters(nation_ids=None):
+    """
+    Recalcule towns_count et residents_total depuis les villes, pour les
+    nations données (ou toutes). Sert après des écritures en masse qui
+    n'envoient pas de signaux (bulk_create, update, import).
+    """
+    nations = Nation.objects.all()
+    if nation_ids is not None:
+        nations = nations.filter(pk__in=nation_ids)
+    totals = {
+        row['nation_id']: row
+        for row in Town.objects.filter(nation__in=nations).values('nation_id').annotate(
+            towns=Count('id'), residents=Sum('residents_count')
+        )
+    }
+    updated = []
+    for nation in nations.only('id', 'towns_count', 'residents_total'):
+        row = totals.get(nation.id, {})
+        towns, residents = row.get('towns', 0), row.get('residents') or 0
+        if (nation.towns_count, nation.residents_total) != (towns, residents):
+            nation.towns_count, nation.residents_total = towns, residents
+            updated.append(nation)
+    Nation.objects.bulk_update(updated, ['towns_count', 'residents_total'], batch_size=500)
+    return len(updated)
+
+def town_saving(town):
+    """
+    Avant l'enregistrement d'une ville dont on ne connaît pas l'état précédent
+    (instance construite à la main, ou chargée sans nation ni résidents),
+    relit sa nation et ses résidents en base pour que town_saved applique
+    la bonne variation.
+    """
+    if getattr(town, '_counted', None) is not None or town.pk is None:
+        return
+    town._counted = Town.objects.filter(pk=town.pk).values_list('nation_id', 'residents_count').first()
+
+def town_saved(town, created):
+    """Répercute la création ou la modification d'une ville sur les compteurs de nation."""
+    counted = getattr(town, '_counted', None)
+    if created:
+        adjust_nation_counters(town.nation_id, 1, town.residents_count)
+    elif counted is None:
+        # Ligne absente de la base juste avant l'enregistrement : seule la nation actuelle est touchée
+        if town.nation_id is not None:
+            refresh_nation_counters([town.nation_id])
+    else:
+        old_nation_id, old_residents = counted
+        if old_nation_id == town.nation_id:
+            adjust_nation_counters(town.nation_id, 0, town.residents_count - (old_residents or 0))
+        else:
+            adjust_nation_counters(old_nation_id, -1, -(old_residents or 0))
+            adjust_nation_counters(town.nation_id, 1, town.residents_count)
+    town._counted = (town.nation_id, town.residents_count)
+
+def town_deleted(town):
+    adjust_nation_counters(town.nation_id, -1, -town.residents_count)
+
+def get_nation_leaderboard(limit=3):
+    """Nations ayant le plus de villes, lues via l'index nation_leaderboard_idx."""
+    return Nation.objects.order_by('-towns_count', 'id')[:limit]
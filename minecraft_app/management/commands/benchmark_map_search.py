@@ -0,0 +1,85 @@
+import heapq
+import math
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from minecraft_app.map_tiles import POINT_TYPES
+from minecraft_app.models import get_map_tile
+from minecraft_app.spatial_search import nearest_points, points_within
+
+# Étendue de la carte Terre au 1:1000, en blocs
+WORLD_HALF_WIDTH = 20000
+WORLD_HALF_HEIGHT = 10000
+
+
+class Command(BaseCommand):
+    help = "Time nearest/radius map searches on synthetic points against a full scan, without touching the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=100000, help="Number of synthetic points")
+        parser.add_argument('--queries', type=int, default=200, help="Number of random queries per search")
+        parser.add_argument('--k', type=int, default=10, help="Neighbours per nearest search")
+        parser.add_argument('--radius', type=int, default=2000, help="Radius of the radius search, in blocks")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['points'] < options['k']:
+            raise CommandError("--points must be at least --k")
+        rng = random.Random(options['seed'])
+
+        points, grid = [], {}
+        for index in range(options['points']):
+            x = rng.randint(-WORLD_HALF_WIDTH, WORLD_HALF_WIDTH)
+            z = rng.randint(-WORLD_HALF_HEIGHT, WORLD_HALF_HEIGHT)
+            point = [f"t{index}", 'town', f"Town {index}", x, z]
+            points.append(point)
+            grid.setdefault(get_map_tile(x, z), []).append(point)
+
+        def load_tiles(tiles):
+            return {tile: grid.get(tile, []) for tile in tiles}
+
+        queries = [
+            (rng.randint(-WORLD_HALF_WIDTH, WORLD_HALF_WIDTH), rng.randint(-WORLD_HALF_HEIGHT, WORLD_HALF_HEIGHT))
+            for _ in range(options['queries'])
+        ]
+        types = set(POINT_TYPES)
+        k, radius = options['k'], options['radius']
+
+        def scan_nearest(x, z):
+            return heapq.nsmallest(k, (math.hypot(p[3] - x, p[4] - z) for p in points))
+
+        def scan_within(x, z):
+            return sorted(d for d in (math.hypot(p[3] - x, p[4] - z) for p in points) if d <= radius)
+
+        tile_xs = [tile[0] for tile in grid]
+        tile_zs = [tile[1] for tile in grid]
+        bounds = (min(tile_xs), min(tile_zs), max(tile_xs), max(tile_zs))
+
+        def grid_nearest(x, z):
+            return nearest_points(x, z, k, types, load_tiles=load_tiles, bounds=bounds)
+
+        def grid_within(x, z):
+            return points_within(x, z, radius, types, len(points), load_tiles=load_tiles)
+
+        self.stdout.write(f"{len(points)} points in {len(grid)} tiles, {len(queries)} queries")
+        for label, indexed, scan in (
+            (f"nearest k={k}", grid_nearest, scan_nearest),
+            (f"radius {radius}", grid_within, scan_within),
+        ):
+            indexed_ms, indexed_results = self._time(indexed, queries)
+            scan_ms, scan_results = self._time(scan, queries)
+            mismatches = sum(
+                1 for found, expected in zip(indexed_results, scan_results)
+                if [round(d, 1) for d in expected] != [point[-1] for point in found]
+            )
+            self.stdout.write(
+                f"{label}: grid {indexed_ms:.3f} ms/query, full scan {scan_ms:.3f} ms/query "
+                f"({scan_ms / indexed_ms:.0f}x), mismatches: {mismatches}"
+            )
+
+    def _time(self, search, queries):
+        start = time.perf_counter()
+        results = [search(x, z) for x, z in queries]
+        return (time.perf_counter() - start) * 1000 / len(queries), results
\ No newline at end of file
@@ -0,0 +1,41 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from minecraft_app import projection
+
+
+class Command(BaseCommand):
+    help = "Time batch lat/lon <-> block conversions against a scalar loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=100000, help="Number of random positions")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        lons = [rng.uniform(-180, 180) for _ in range(options['points'])]
+        lats = [rng.uniform(-90, 90) for _ in range(options['points'])]
+
+        self.stdout.write(f"{len(lons)} positions")
+
+        scalar_ms, blocks = self._time(lambda: [projection.lonlat_to_block(lon, lat) for lon, lat in zip(lons, lats)])
+        batch_ms, (xs, zs) = self._time(lambda: projection.lonlat_to_blocks(lons, lats))
+        mismatches = sum(1 for (x, z), bx, bz in zip(blocks, xs, zs) if (x, z) != (bx, bz))
+        self.stdout.write(
+            f"lon/lat -> blocks: batch {batch_ms:.1f} ms, scalar loop {scalar_ms:.1f} ms "
+            f"({scalar_ms / batch_ms:.1f}x), mismatches: {mismatches}"
+        )
+
+        block_xs, block_zs = [x for x, _ in blocks], [z for _, z in blocks]
+        scalar_ms, _ = self._time(lambda: [projection.block_to_lonlat(x, z) for x, z in zip(block_xs, block_zs)])
+        batch_ms, _ = self._time(lambda: projection.blocks_to_lonlat(block_xs, block_zs))
+        self.stdout.write(
+            f"blocks -> lon/lat: batch {batch_ms:.1f} ms, scalar loop {scalar_ms:.1f} ms ({scalar_ms / batch_ms:.1f}x)"
+        )
+
+    def _time(self, convert):
+        start = time.perf_counter()
+        result = convert()
+        return (time.perf_counter() - start) * 1000, result
\ No newline at end of file
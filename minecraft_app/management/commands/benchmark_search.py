@@ -0,0 +1,61 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+
+from minecraft_app.search import SearchEntry, SearchIndex, normalize
+
+
+class Command(BaseCommand):
+    help = "Time autocomplete queries on an in-memory player index of synthetic names, without touching the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=100000, help="Number of synthetic player names")
+        parser.add_argument('--queries', type=int, default=2000, help="Number of queries")
+        parser.add_argument('--limit', type=int, default=10, help="Results per query")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        alphabet = string.ascii_letters + string.digits + '_'
+        names = [
+            ''.join(rng.choice(alphabet) for _ in range(rng.randint(3, 16)))
+            for _ in range(options['players'])
+        ]
+
+        start = time.perf_counter()
+        index = SearchIndex(SearchEntry('player', i, name, '', None, None) for i, name in enumerate(names))
+        self.stdout.write(f"Built index of {len(names)} players in {time.perf_counter() - start:.2f}s")
+
+        # Début de saisie, nom complet, et nom avec une faute de frappe
+        queries = []
+        for _ in range(options['queries']):
+            name = rng.choice(names)
+            kind = rng.randrange(3)
+            if kind == 0:
+                queries.append(name[:rng.randint(1, len(name))])
+            elif kind == 1:
+                queries.append(name)
+            else:
+                position = rng.randrange(len(name))
+                queries.append(name[:position] + rng.choice(alphabet) + name[position + 1:])
+
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(normalize(query), options['limit'])
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+
+        def percentile(p):
+            return timings[min(len(timings) - 1, int(len(timings) * p / 100))]
+
+        self.stdout.write(
+            f"{len(queries)} queries: p50 {percentile(50):.2f} ms, p99 {percentile(99):.2f} ms, max {timings[-1]:.2f} ms"
+        )
+
+        start = time.perf_counter()
+        for i in range(1000):
+            index.add(SearchEntry('player', len(names) + i, f"newplayer{i}", '', None, None))
+        self.stdout.write(f"Incremental add: {(time.perf_counter() - start):.3f} ms per player")
@@ -0,0 +1,66 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from minecraft_app.models import Town
+from minecraft_app.projection import block_distances, lonlat_to_blocks, parse_lonlat
+
+
+class Command(BaseCommand):
+    help = (
+        "Check every town's real_world_location against its map coordinates on the 1:1000 Earth map. "
+        "Locations are read as 'lat, lon', or looked up by name in a --places CSV (name,lat,lon)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--places', help="CSV file with name,lat,lon columns for named locations")
+        parser.add_argument('--tolerance', type=int, default=50, help="Maximum distance in blocks (1 block = 1 km)")
+
+    def handle(self, *args, **options):
+        places = self._load_places(options['places']) if options['places'] else {}
+
+        resolved, unresolved = [], 0
+        towns = Town.objects.exclude(real_world_location='').values_list(
+            'id', 'name', 'real_world_location', 'location_x', 'location_z'
+        )
+        for town_id, name, location, x, z in towns.iterator(chunk_size=2000):
+            lonlat = parse_lonlat(location) or places.get(location.strip().lower())
+            if lonlat is None:
+                unresolved += 1
+                continue
+            resolved.append((town_id, name, location, x, z, lonlat))
+
+        if resolved:
+            # Une seule conversion pour toutes les villes
+            expected_xs, expected_zs = lonlat_to_blocks(
+                [row[5][0] for row in resolved], [row[5][1] for row in resolved]
+            )
+            distances = block_distances(
+                [row[3] for row in resolved], [row[4] for row in resolved], expected_xs, expected_zs
+            )
+        else:
+            expected_xs = expected_zs = distances = []
+
+        misplaced = 0
+        for row, expected_x, expected_z, distance in zip(resolved, expected_xs, expected_zs, distances):
+            if distance > options['tolerance']:
+                misplaced += 1
+                town_id, name, location, x, z, _ = row
+                self.stdout.write(
+                    f"#{town_id} {name}: at {x}, {z} but '{location}' is at {int(expected_x)}, {int(expected_z)} "
+                    f"({distance:.0f} blocks away)"
+                )
+
+        self.stdout.write(
+            f"Checked: {len(resolved)}, misplaced: {misplaced}, unknown locations: {unresolved}"
+        )
+
+    def _load_places(self, path):
+        places = {}
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    places[row['name'].strip().lower()] = (float(row['lon']), float(row['lat']))
+        except (OSError, KeyError, ValueError) as e:
+            raise CommandError(f"Cannot read places file {path}: {e}")
+        return places
\ No newline at end of file
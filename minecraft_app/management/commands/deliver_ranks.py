@@ -0,0 +1,32 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from minecraft_app.minecraft_service import deliver_pending_ranks
+
+logger = logging.getLogger('minecraft_app')
+
+
+class Command(BaseCommand):
+    help = "Drain the rank delivery outbox: send pending LuckPerms commands to the server over RCON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Process due deliveries once and exit")
+        parser.add_argument('--interval', type=float, default=5, help="Seconds to sleep when the outbox is empty")
+        parser.add_argument('--batch-size', type=int, default=50, help="Maximum deliveries per batch")
+
+    def handle(self, *args, **options):
+        while True:
+            counts = deliver_pending_ranks(limit=options['batch_size'])
+            if any(counts.values()):
+                self.stdout.write(
+                    f"Delivered: {counts['delivered']}, retried: {counts['retried']}, dead: {counts['dead']}"
+                )
+
+            if options['once']:
+                return
+
+            # Enchaîner directement tant que des lots complets sont traités
+            if sum(counts.values()) < options['batch_size']:
+                time.sleep(options['interval'])
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from minecraft_app.towny_import import TownyImportError, import_towny, read_dump
+
+
+class Command(BaseCommand):
+    help = (
+        "Import nations, towns and map points from a Towny export: a flatfile data directory, "
+        "a directory of nations.csv/towns.csv/map_points.csv, or a JSON Lines file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Towny data directory, CSV directory or JSON Lines file")
+        parser.add_argument('--keep-missing', action='store_true', help="Do not delete rows missing from the export")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per bulk write")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change, then roll back")
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        try:
+            results = import_towny(
+                read_dump(options['path']),
+                delete_missing=not options['keep_missing'],
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+            )
+        except (TownyImportError, OSError) as e:
+            raise CommandError(str(e))
+
+        for kind, counts in results.items():
+            self.stdout.write(
+                f"{kind}: {counts.created} created, {counts.updated} updated, "
+                f"{counts.deleted} deleted, {counts.unchanged} unchanged"
+            )
+        suffix = " (dry run, rolled back)" if options['dry_run'] else ""
+        self.stdout.write(f"Done in {time.monotonic() - start:.1f}s{suffix}")
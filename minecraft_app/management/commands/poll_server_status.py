@@ -0,0 +1,42 @@
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from minecraft_app.server_status import refresh_server_status, save_status_snapshot
+
+logger = logging.getLogger('minecraft_app')
+
+
+class Command(BaseCommand):
+    help = "Poll the Minecraft server status (Server List Ping, RCON list fallback) into the cache and the TownyServer row."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Poll once, save to the database and exit")
+
+    def handle(self, *args, **options):
+        last_db_write = None
+        last_online = None
+
+        while True:
+            snapshot = refresh_server_status()
+            self.stdout.write(
+                f"{'Online' if snapshot['online'] else 'Offline'} "
+                f"({snapshot.get('player_count', 0)}/{snapshot.get('max_players', '?')}, via {snapshot['source']})"
+            )
+
+            # Écriture en base périodique, ou immédiate si le serveur change d'état
+            now = time.monotonic()
+            if (options['once'] or last_db_write is None or snapshot['online'] != last_online
+                    or now - last_db_write >= settings.MINECRAFT_STATUS_DB_WRITE_INTERVAL):
+                save_status_snapshot(snapshot)
+                last_db_write = now
+                last_online = snapshot['online']
+
+            if options['once']:
+                return
+
+            jitter = random.uniform(-settings.MINECRAFT_STATUS_POLL_JITTER, settings.MINECRAFT_STATUS_POLL_JITTER)
+            time.sleep(max(1, settings.MINECRAFT_STATUS_POLL_INTERVAL + jitter))
@@ -0,0 +1,89 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from minecraft_app.models import UserProfile
+from minecraft_app.services import fetch_minecraft_uuids
+
+
+class Command(BaseCommand):
+    help = (
+        "Resolve Minecraft UUIDs in bulk for profiles with a pending or stale UUID. "
+        "Progress is saved after every chunk, so an interrupted run can simply be started again. "
+        "With --watch, keeps running as the background resolver for new signups and name changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-days', type=int, default=30,
+                            help="Re-check profiles whose UUID was last checked more than this many days ago")
+        parser.add_argument('--chunk-size', type=int, default=200, help="Profiles resolved and saved per chunk")
+        parser.add_argument('--workers', type=int, default=4, help="Concurrent requests to the Mojang API")
+        parser.add_argument('--limit', type=int, default=None, help="Stop after this many profiles")
+        parser.add_argument('--watch', action='store_true', help="Keep polling for pending profiles")
+        parser.add_argument('--interval', type=float, default=5, help="Seconds between passes with --watch")
+
+    def handle(self, *args, **options):
+        while True:
+            counts = self.resolve_pass(options)
+            if counts['processed'] or not options['watch']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Done: {counts['processed']} processed, {counts['updated']} updated, "
+                    f"{counts['not_found']} not found, {counts['failed']} failed"
+                ))
+            if not options['watch']:
+                return
+            time.sleep(options['interval'])
+
+    def resolve_pass(self, options):
+        stale_before = timezone.now() - timedelta(days=options['stale_days'])
+        queryset = (
+            UserProfile.objects.exclude(minecraft_username='')
+            .filter(Q(minecraft_uuid_checked_at__isnull=True) | Q(minecraft_uuid_checked_at__lt=stale_before))
+            .order_by('pk')
+        )
+
+        counts = {'processed': 0, 'updated': 0, 'not_found': 0, 'failed': 0}
+        last_pk = 0
+        while options['limit'] is None or counts['processed'] < options['limit']:
+            size = options['chunk_size']
+            if options['limit'] is not None:
+                size = min(size, options['limit'] - counts['processed'])
+            # Parcours par clé pour ne pas relire les profils déjà traités
+            chunk = list(queryset.filter(pk__gt=last_pk)[:size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+
+            uuids = fetch_minecraft_uuids([profile.minecraft_username for profile in chunk], workers=options['workers'])
+            checked_at = timezone.now()
+
+            # Ignorer les profils dont le pseudo a changé pendant la résolution
+            current_names = dict(
+                UserProfile.objects.filter(pk__in=[profile.pk for profile in chunk])
+                .values_list('pk', 'minecraft_username')
+            )
+            to_update = []
+            for profile in chunk:
+                if profile.minecraft_username not in uuids:
+                    # Échec réseau : le profil sera repris au prochain passage
+                    counts['failed'] += 1
+                    continue
+                if current_names.get(profile.pk) != profile.minecraft_username:
+                    continue
+                uuid = uuids[profile.minecraft_username] or ''
+                if not uuid:
+                    counts['not_found'] += 1
+                if uuid != profile.minecraft_uuid:
+                    counts['updated'] += 1
+                profile.minecraft_uuid = uuid
+                profile.minecraft_uuid_checked_at = checked_at
+                to_update.append(profile)
+
+            UserProfile.objects.bulk_update(to_update, ['minecraft_uuid', 'minecraft_uuid_checked_at'])
+            counts['processed'] += len(chunk)
+            self.stdout.write(f"{counts['processed']} profiles processed...")
+
+        return counts
@@ -0,0 +1,37 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from minecraft_app.discord_webhook import RateLimitedWebhook, deliver_contact_messages
+
+logger = logging.getLogger('minecraft_app')
+
+
+class Command(BaseCommand):
+    help = "Post queued contact form messages to the Discord webhook, batching embeds and honouring rate limits."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Process due messages once and exit")
+        parser.add_argument('--interval', type=float, default=5, help="Seconds to sleep when the queue is empty")
+        parser.add_argument('--batch-size', type=int, default=50, help="Maximum messages per pass")
+
+    def handle(self, *args, **options):
+        if not settings.DISCORD_WEBHOOK_URL:
+            raise CommandError("DISCORD_WEBHOOK_URL is not configured")
+
+        # Garder le même objet entre deux passes pour conserver l'état des limites de débit
+        webhook = RateLimitedWebhook(settings.DISCORD_WEBHOOK_URL)
+        while True:
+            counts = deliver_contact_messages(webhook, limit=options['batch_size'])
+            if any(counts.values()):
+                self.stdout.write(
+                    f"Sent: {counts['sent']}, retried: {counts['retried']}, failed: {counts['failed']}"
+                )
+
+            if options['once']:
+                return
+
+            if sum(counts.values()) < options['batch_size']:
+                time.sleep(max(options['interval'], webhook.wait_time()))
@@ -0,0 +1,255 @@
+import hashlib
+import math
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Min
+from .projection import blocks_to_lonlat
+from .models import MAP_TILE_SIZE, DynamicMapPoint, Town, get_map_tile
+
+TILE_CACHE_KEY = 'minecraft_app:map_tile:{version}:{tile_x}:{tile_z}'
+TILE_VERSION_KEY = 'minecraft_app:map_tile_version:{tile_x}:{tile_z}'
+GLOBAL_VERSION_KEY = 'minecraft_app:map_tile_version'
+BOUNDS_CACHE_KEY = 'minecraft_app:map_tile_bounds:{version}'
+BOUNDS_VERSION_KEY = 'minecraft_app:map_tile_bounds_version'
+
+# Types de points servis par l'API : 'town' pour les villes, puis ceux de DynamicMapPoint
+POINT_TYPES = ['town'] + [choice for choice, _ in DynamicMapPoint.POINT_TYPE_CHOICES if choice != 'town']
+
+# Colonnes du format compact, une liste par point
+COMPACT_FIELDS = ['id', 'type', 'name', 'x', 'z']
+
+
+class MapQueryError(ValueError):
+    """Paramètres de requête de carte invalides (bbox, types)."""
+    pass
+
+
+def parse_bbox(value):
+    """
+    Décode `min_x,min_z,max_x,max_z` (coordonnées de blocs).
+
+    Returns:
+        tuple: (min_x, min_z, max_x, max_z)
+    """
+    try:
+        parts = [float(part) for part in value.split(',')]
+    except (AttributeError, ValueError):
+        parts = []
+    # 'inf' et 'nan' sont acceptés par float() mais ne sont pas des blocs
+    if len(parts) != 4 or not all(math.isfinite(part) for part in parts):
+        raise MapQueryError("bbox attendu : min_x,min_z,max_x,max_z")
+    min_x, min_z, max_x, max_z = (int(part) for part in parts)
+    if min_x > max_x or min_z > max_z:
+        raise MapQueryError("bbox inversée")
+    return min_x, min_z, max_x, max_z
+
+def parse_types(value):
+    """Types demandés (`town,warp,...`), ou tous si le paramètre est absent."""
+    if not value:
+        return set(POINT_TYPES)
+    types = {part.strip() for part in value.split(',') if part.strip()}
+    unknown = types - set(POINT_TYPES)
+    if unknown:
+        raise MapQueryError(f"Types inconnus : {', '.join(sorted(unknown))}")
+    return types
+
+def tiles_for_bbox(min_x, min_z, max_x, max_z):
+    """Tuiles de la grille couvertes par la zone, limitées à MAP_MAX_TILES."""
+    first_x, first_z = get_map_tile(min_x, min_z)
+    last_x, last_z = get_map_tile(max_x, max_z)
+    count = (last_x - first_x + 1) * (last_z - first_z + 1)
+    if count > settings.MAP_MAX_TILES:
+        raise MapQueryError(f"Zone trop grande : {count} tuiles (maximum {settings.MAP_MAX_TILES})")
+    return [(tile_x, tile_z) for tile_x in range(first_x, last_x + 1) for tile_z in range(first_z, last_z + 1)]
+
+def _tile_version_key(tile):
+    return TILE_VERSION_KEY.format(tile_x=tile[0], tile_z=tile[1])
+
+def get_tile_versions(tiles):
+    """
+    Version courante de chaque tuile, en un seul aller-retour vers le cache.
+    Une version combine la version globale (imports en masse) et celle de la tuile.
+    """
+    keys = {tile: _tile_version_key(tile) for tile in tiles}
+    values = cache.get_many(list(keys.values()) + [GLOBAL_VERSION_KEY])
+    global_version = values.get(GLOBAL_VERSION_KEY, 0)
+    return {tile: f"{global_version}.{values.get(key, 0)}" for tile, key in keys.items()}
+
+def invalidate_tiles(tiles):
+    """Invalide les tuiles où un point a été ajouté, déplacé ou supprimé."""
+    version = time.time_ns()
+    cache.set_many({_tile_version_key(tile): version for tile in set(tiles)}, timeout=None)
+
+def invalidate_all_tiles():
+    """Après une écriture en masse (import Towny) : toutes les tuiles sont à recalculer."""
+    version = time.time_ns()
+    cache.set_many({GLOBAL_VERSION_KEY: version, BOUNDS_VERSION_KEY: version}, timeout=None)
+
+def _bounds_cache_key():
+    return BOUNDS_CACHE_KEY.format(version=cache.get(BOUNDS_VERSION_KEY, 0))
+
+def get_occupied_bounds():
+    """
+    Rectangle des tuiles contenant au moins un point, en cache. Il peut être
+    plus grand que nécessaire (point supprimé), jamais plus petit : un point
+    placé hors du rectangle connu change sa version (voir point_saved()).
+
+    Returns:
+        tuple: (min_tile_x, min_tile_z, max_tile_x, max_tile_z), ou None si la carte est vide
+    """
+    # Version lue avant la base : un point ajouté pendant le calcul rendra ce résultat obsolète
+    key = _bounds_cache_key()
+    bounds = cache.get(key)
+    if bounds is not None:
+        return bounds or None
+    aggregates = [
+        model.objects.aggregate(Min('tile_x'), Min('tile_z'), Max('tile_x'), Max('tile_z'))
+        for model in (Town, DynamicMapPoint)
+    ]
+    aggregates = [row for row in aggregates if row['tile_x__min'] is not None]
+    if aggregates:
+        bounds = (
+            min(row['tile_x__min'] for row in aggregates),
+            min(row['tile_z__min'] for row in aggregates),
+            max(row['tile_x__max'] for row in aggregates),
+            max(row['tile_z__max'] for row in aggregates),
+        )
+    # Carte vide mise en cache comme ()
+    cache.set(key, bounds or (), settings.MAP_TILE_CACHE_TIMEOUT)
+    return bounds
+
+def _extend_bounds(tile):
+    # Sans rectangle en cache, un calcul en cours a pu lire la base avant ce point
+    bounds = cache.get(_bounds_cache_key())
+    if not bounds or not (bounds[0] <= tile[0] <= bounds[2] and bounds[1] <= tile[1] <= bounds[3]):
+        cache.set(BOUNDS_VERSION_KEY, time.time_ns(), timeout=None)
+
+def build_tile(tile_x, tile_z):
+    """
+    Points d'une tuile, lus via les index (tile_x, tile_z). Une ville est
+    de type 'capital' quand elle est la capitale de sa nation.
+
+    Returns:
+        list: Points au format compact (voir COMPACT_FIELDS)
+    """
+    points = []
+    towns = Town.objects.filter(tile_x=tile_x, tile_z=tile_z).select_related('nation').only(
+        'id', 'name', 'location_x', 'location_z', 'nation__capital'
+    )
+    for town in towns:
+        is_capital = town.nation is not None and town.nation.capital == town.name
+        points.append([f"t{town.id}", 'capital' if is_capital else 'town', town.name, town.location_x, town.location_z])
+    map_points = DynamicMapPoint.objects.filter(tile_x=tile_x, tile_z=tile_z).only(
+        'id', 'name', 'point_type', 'location_x', 'location_z'
+    )
+    for point in map_points:
+        points.append([f"p{point.id}", point.point_type, point.name, point.location_x, point.location_z])
+    return points
+
+def get_tiles(tiles):
+    """
+    Contenu des tuiles depuis le cache (une entrée par tuile et par version) ;
+    seules les tuiles absentes ou invalidées sont relues en base.
+
+    Returns:
+        tuple: ({tuile: points}, {tuile: version})
+    """
+    versions = get_tile_versions(tiles)
+    keys = {
+        tile: TILE_CACHE_KEY.format(version=versions[tile], tile_x=tile[0], tile_z=tile[1])
+        for tile in tiles
+    }
+    cached = cache.get_many(list(keys.values()))
+    contents, missing = {}, {}
+    for tile, key in keys.items():
+        if key in cached:
+            contents[tile] = cached[key]
+        else:
+            contents[tile] = missing[key] = build_tile(*tile)
+    if missing:
+        cache.set_many(missing, timeout=settings.MAP_TILE_CACHE_TIMEOUT)
+    return contents, versions
+
+def tiles_etag(versions, *variant):
+    """ETag d'une réponse : versions des tuiles servies et paramètres de rendu."""
+    parts = [f"{tile[0]}:{tile[1]}:{version}" for tile, version in sorted(versions.items())] + [str(v) for v in variant]
+    return hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+
+def point_has_type(point, types):
+    # Une capitale reste une ville : elle est servie pour 'town' comme pour 'capital'
+    if point[1] == 'capital':
+        return 'capital' in types or 'town' in types
+    return point[1] in types
+
+def select_points(contents, types, bbox=None):
+    """Points des tuiles dont le type est demandé et, si donnée, dans la bbox exacte."""
+    selected = []
+    for tile in sorted(contents):
+        for point in contents[tile]:
+            if not point_has_type(point, types):
+                continue
+            if bbox and not (bbox[0] <= point[3] <= bbox[2] and bbox[1] <= point[4] <= bbox[3]):
+                continue
+            selected.append(point)
+    return selected
+
+def to_geojson(points, lonlat=False):
+    """
+    FeatureCollection GeoJSON. Par défaut dans le plan de la carte : les
+    coordonnées sont les blocs [x, z], comme attendu par un fond de carte en
+    CRS simple. Avec `lonlat`, les positions réelles [longitude, latitude]
+    correspondantes, converties en un seul lot (projection.py).
+    """
+    if lonlat:
+        lons, lats = blocks_to_lonlat([point[3] for point in points], [point[4] for point in points])
+        coordinates = [[round(float(lon), 5), round(float(lat), 5)] for lon, lat in zip(lons, lats)]
+    else:
+        coordinates = [[point[3], point[4]] for point in points]
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'id': point[0],
+                'geometry': {'type': 'Point', 'coordinates': position},
+                'properties': {'type': point[1], 'name': point[2]},
+            }
+            for point, position in zip(points, coordinates)
+        ],
+    }
+
+def tile_bounds(tile_x, tile_z):
+    """Coordonnées de blocs couvertes par une tuile : (min_x, min_z, max_x, max_z)."""
+    return (tile_x * MAP_TILE_SIZE, tile_z * MAP_TILE_SIZE,
+            (tile_x + 1) * MAP_TILE_SIZE - 1, (tile_z + 1) * MAP_TILE_SIZE - 1)
+
+def point_saved(instance, created):
+    """
+    Invalide, au commit, la tuile d'une ville ou d'un point de carte
+    enregistré, et celle qu'il occupait avant s'il a été déplacé.
+    """
+    stored = getattr(instance, '_stored_tile', None)
+    current = (instance.tile_x, instance.tile_z)
+    instance._stored_tile = current
+    if stored is None and not created:
+        # Instance construite à la main ou chargée sans ses tuiles : ancienne tuile inconnue
+        transaction.on_commit(invalidate_all_tiles)
+        return
+    tiles = {current} if stored is None else {current, stored}
+
+    def invalidate():
+        invalidate_tiles(tiles)
+        _extend_bounds(current)
+    transaction.on_commit(invalidate)
+
+def point_deleted(instance):
+    tiles = {(instance.tile_x, instance.tile_z)}
+    transaction.on_commit(lambda: invalidate_tiles(tiles))
+
+def nation_changed(nation):
+    """Le nom de la capitale a pu changer : les tuiles des villes de la nation sont à recalculer."""
+    tiles = set(Town.objects.filter(nation=nation).values_list('tile_x', 'tile_z').distinct())
+    if tiles:
+        transaction.on_commit(lambda: invalidate_tiles(tiles))
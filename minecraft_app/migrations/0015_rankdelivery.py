@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('minecraft_app', '0014_cartitem_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minecraft_username', models.CharField(max_length=100)),
+                ('rank_name', models.CharField(max_length=100)),
+                ('command', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('delivered', 'Delivered'), ('dead', 'Dead letter')], default='pending', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('purchase', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='deliveries', to='minecraft_app.userpurchase')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rank_deliveries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Rank deliveries',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='minecraft_a_status_51e941_idx')],
+            },
+        ),
+    ]
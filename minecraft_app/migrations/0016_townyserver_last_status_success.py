@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecraft_app', '0015_rankdelivery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='townyserver',
+            name='last_status_success',
+            field=models.DateTimeField(blank=True, help_text='Last time the status poller reached the server', null=True),
+        ),
+    ]
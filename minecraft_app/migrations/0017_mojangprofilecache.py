@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecraft_app', '0016_townyserver_last_status_success'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MojangProfileCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name_lower', models.CharField(max_length=16, unique=True)),
+                ('name', models.CharField(max_length=16)),
+                ('minecraft_uuid', models.CharField(blank=True, max_length=32)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+        ),
+    ]
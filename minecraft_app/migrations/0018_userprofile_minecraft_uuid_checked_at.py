@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecraft_app', '0017_mojangprofilecache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='minecraft_uuid_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
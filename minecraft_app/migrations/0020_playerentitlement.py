@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('minecraft_app', '0019_contactmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerEntitlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owned_rank_ids', models.JSONField(blank=True, default=list)),
+                ('discount_percentage', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('highest_rank', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='minecraft_app.rank')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='entitlement', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
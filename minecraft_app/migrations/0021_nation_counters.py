@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:17
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_nation_counters(apps, schema_editor):
+    Nation = apps.get_model('minecraft_app', 'Nation')
+    nations = list(Nation.objects.annotate(towns_total=Count('towns'), residents=Sum('towns__residents_count')))
+    for nation in nations:
+        nation.towns_count = nation.towns_total
+        nation.residents_total = nation.residents or 0
+    Nation.objects.bulk_update(nations, ['towns_count', 'residents_total'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecraft_app', '0020_playerentitlement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nation',
+            name='residents_total',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='nation',
+            name='towns_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='nation',
+            index=models.Index(fields=['-towns_count', 'id'], name='nation_leaderboard_idx'),
+        ),
+        migrations.RunPython(fill_nation_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecraft_app', '0021_nation_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dynamicmappoint',
+            index=models.Index(fields=['point_type', 'id'], name='mappoint_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='town',
+            index=models.Index(fields=['nation', '-residents_count', 'id'], name='town_nation_residents_idx'),
+        ),
+    ]
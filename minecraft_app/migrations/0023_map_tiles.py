@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:19
+
+from django.db import migrations, models
+
+TILE_SIZE = 1024
+
+
+def fill_map_tiles(apps, schema_editor):
+    for model_name in ('Town', 'DynamicMapPoint'):
+        model = apps.get_model('minecraft_app', model_name)
+        rows = list(model.objects.only('id', 'location_x', 'location_z'))
+        for row in rows:
+            row.tile_x, row.tile_z = row.location_x // TILE_SIZE, row.location_z // TILE_SIZE
+        model.objects.bulk_update(rows, ['tile_x', 'tile_z'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecraft_app', '0022_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dynamicmappoint',
+            name='tile_x',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='dynamicmappoint',
+            name='tile_z',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='town',
+            name='tile_x',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='town',
+            name='tile_z',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='dynamicmappoint',
+            index=models.Index(fields=['tile_x', 'tile_z'], name='mappoint_tile_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='town',
+            index=models.Index(fields=['tile_x', 'tile_z'], name='town_tile_idx'),
+        ),
+        migrations.RunPython(fill_map_tiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+def deduplicate_usernames(apps, schema_editor):
+    # The first account to claim a name keeps it; later case-insensitive duplicates
+    # are cleared and will have to pick their name again from their profile
+    UserProfile = apps.get_model('minecraft_app', 'UserProfile')
+    seen = set()
+    profiles = []
+    for profile in UserProfile.objects.exclude(minecraft_username='').order_by('id').iterator(chunk_size=2000):
+        key = profile.minecraft_username.strip().lower() or None
+        if key in seen:
+            profile.minecraft_username = ''
+            profile.minecraft_uuid = ''
+            profile.minecraft_uuid_checked_at = None
+            key = None
+        elif key is not None:
+            seen.add(key)
+        profile.minecraft_username_normalized = key
+        profiles.append(profile)
+    UserProfile.objects.bulk_update(
+        profiles,
+        ['minecraft_username', 'minecraft_username_normalized', 'minecraft_uuid', 'minecraft_uuid_checked_at'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecraft_app', '0023_map_tiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='minecraft_username_normalized',
+            field=models.CharField(editable=False, max_length=100, null=True),
+        ),
+        migrations.RunPython(deduplicate_usernames, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Separate from the data migration in 0024, so the unique index is built in its own transaction
+
+    dependencies = [
+        ('minecraft_app', '0024_userprofile_minecraft_username_normalized'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprofile',
+            name='minecraft_username_normalized',
+            field=models.CharField(editable=False, max_length=100, null=True, unique=True),
+        ),
+    ]
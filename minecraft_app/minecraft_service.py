@@ -1,9 +1,31 @@
 import logging
-from mcrcon import MCRcon
+import random
+from datetime import timedelta
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import RankDelivery
+from .rcon import get_rcon_pool
 
 logger = logging.getLogger('minecraft_app')
 
+def build_rank_command(username, rank_name):
+    """
+    Construit la commande LuckPerms qui ajoute un rang à un joueur.
+    
+    Args:
+        username (str): Nom d'utilisateur Minecraft
+        rank_name (str): Nom du rang à appliquer
+    
+    Returns:
+        str: Commande à envoyer via RCON
+    """
+    # Nettoyer le nom du rang (enlever les espaces, convertir en minuscules)
+    clean_rank = rank_name.lower().replace(' ', '_')
+    # La commande dépend de votre plugin de permissions
+    # Pour LuckPerms:
+    return f"lp user {username} parent add {clean_rank}"
+
 def apply_rank_to_player(username, rank_name):
     """
     Applique un rang à un joueur sur le serveur Minecraft via RCON.
@@ -20,32 +42,106 @@ def apply_rank_to_player(username, rank_name):
         return False
     
     try:
-        # Nettoyer le nom du rang (enlever les espaces, convertir en minuscules)
-        clean_rank = rank_name.lower().replace(' ', '_')
+        lp_command = build_rank_command(username, rank_name)
+        logger.info(f"Envoi de la commande: {lp_command}")
+        # Connexion empruntée au pool du processus (voir rcon.py)
+        resp = get_rcon_pool().command(lp_command)
+        logger.info(f"Réponse reçue: {resp}")
+        return True
         
-        # Ajouter les logs de débogage
-        logger.info(f"Connexion RCON à {settings.MINECRAFT_RCON_HOST}:{settings.MINECRAFT_RCON_PORT}")
-        
-        # Se connecter au serveur Minecraft via RCON sans utiliser de signal
-        mcr = MCRcon(
-            settings.MINECRAFT_RCON_HOST, 
-            settings.MINECRAFT_RCON_PASSWORD, 
-            settings.MINECRAFT_RCON_PORT,
-            tlsmode=0  # Désactive TLS pour éviter les problèmes de signal
+    except Exception as e:
+        logger.error(f"Erreur RCON détaillée: {str(e)}", exc_info=True)
+        return False
+
+def enqueue_rank_delivery(user, username, rank_name, purchase=None):
+    """
+    Enregistre dans l'outbox la commande qui donnera le rang au joueur.
+    
+    À appeler dans la même transaction que la création du UserPurchase : la
+    livraison est faite plus tard par la commande `deliver_ranks`.
+    
+    Args:
+        user (User): Utilisateur qui reçoit le rang
+        username (str): Nom d'utilisateur Minecraft
+        rank_name (str): Nom du rang à appliquer
+        purchase (UserPurchase): Achat à l'origine de la livraison
+    
+    Returns:
+        RankDelivery: La ligne créée, ou None si aucun pseudo n'est fourni
+    """
+    if not username:
+        logger.warning(f"No Minecraft username for user {user}, rank {rank_name} not queued")
+        return None
+    
+    delivery = RankDelivery.objects.create(
+        user=user,
+        purchase=purchase,
+        minecraft_username=username,
+        rank_name=rank_name,
+        command=build_rank_command(username, rank_name),
+    )
+    logger.info(f"Rank {rank_name} queued for {username} (delivery {delivery.id})")
+    return delivery
+
+def get_retry_delay(attempts):
+    """
+    Délai avant la prochaine tentative : backoff exponentiel plafonné, avec jitter.
+    
+    Args:
+        attempts (int): Nombre de tentatives déjà effectuées
+    
+    Returns:
+        timedelta: Délai à attendre
+    """
+    base = settings.RANK_DELIVERY_BACKOFF_BASE * (2 ** max(attempts - 1, 0))
+    delay = min(base, settings.RANK_DELIVERY_BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+def deliver_pending_ranks(limit=50):
+    """
+    Envoie au serveur les livraisons en attente dont l'échéance est passée.
+    
+    Les lignes sont verrouillées (skip_locked) pendant l'envoi pour que plusieurs
+    workers puissent tourner en parallèle sans livrer deux fois la même commande.
+    Une livraison qui échoue est replanifiée avec backoff exponentiel, puis passe
+    en dead letter après RANK_DELIVERY_MAX_ATTEMPTS tentatives.
+    
+    Args:
+        limit (int): Nombre maximum de livraisons traitées
+    
+    Returns:
+        dict: Nombre de livraisons réussies, replanifiées et abandonnées
+    """
+    counts = {'delivered': 0, 'retried': 0, 'dead': 0}
+    
+    with transaction.atomic():
+        deliveries = list(
+            RankDelivery.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at')[:limit]
         )
         
-        try:
-            mcr.connect()
-            # La commande dépend de votre plugin de permissions
-            # Pour LuckPerms:
-            lp_command = f"lp user {username} parent add {clean_rank}"
-            logger.info(f"Envoi de la commande: {lp_command}")
-            resp = mcr.command(lp_command)
-            logger.info(f"Réponse reçue: {resp}")
-            return True
-        finally:
-            mcr.disconnect()
+        # Toutes les commandes dues partent sur une seule connexion
+        results = get_rcon_pool().command_batch([d.command for d in deliveries]) if deliveries else []
         
-    except Exception as e:
-        logger.error(f"Erreur RCON détaillée: {str(e)}", exc_info=True)
-        return False
\ No newline at end of file
+        for delivery, result in zip(deliveries, results):
+            delivery.attempts += 1
+            if result.success:
+                logger.info(f"Delivery {delivery.id} ({delivery.command}): {result.response}")
+                delivery.status = 'delivered'
+                delivery.delivered_at = timezone.now()
+                delivery.last_error = ''
+                counts['delivered'] += 1
+            else:
+                delivery.last_error = result.error or ''
+                if delivery.attempts >= settings.RANK_DELIVERY_MAX_ATTEMPTS:
+                    delivery.status = 'dead'
+                    counts['dead'] += 1
+                    logger.error(f"Delivery {delivery.id} ({delivery.command}) abandoned after {delivery.attempts} attempts: {result.error}")
+                else:
+                    delivery.next_attempt_at = timezone.now() + get_retry_delay(delivery.attempts)
+                    counts['retried'] += 1
+                    logger.warning(f"Delivery {delivery.id} failed (attempt {delivery.attempts}), retrying at {delivery.next_attempt_at}: {result.error}")
+            delivery.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error', 'delivered_at'])
+    
+    return counts
@@ -1,8 +1,32 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.urls import reverse
 import logging
 from decimal import Decimal
 
+# Side of a map tile in blocks (1 block = 1 km on the 1:1000 Earth map), see map_tiles.py
+MAP_TILE_SIZE = 1024
+
+def get_map_tile(x, z):
+    """
+    Returns the (tile_x, tile_z) grid cell containing block X/Z
+    """
+    return x // MAP_TILE_SIZE, z // MAP_TILE_SIZE
+
+def _stored_map_tile(instance):
+    # Tile the row is currently indexed under, so a move also invalidates it (see map_tiles.py)
+    if 'tile_x' in instance.__dict__ and 'tile_z' in instance.__dict__:
+        return instance.tile_x, instance.tile_z
+    return None
+
+def _save_with_map_tile(instance, kwargs):
+    # Keep the precomputed tile in sync with the coordinates, even on partial saves
+    instance.tile_x, instance.tile_z = get_map_tile(instance.location_x, instance.location_z)
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and {'location_x', 'location_z'} & set(update_fields):
+        kwargs['update_fields'] = set(update_fields) | {'tile_x', 'tile_z'}
+
 class TownyServer(models.Model):
     name = models.CharField(max_length=100, default="Novania - Earth Towny")
     ip_address = models.CharField(max_length=100, default="play.Novania.fr")
@@ -12,6 +36,7 @@ class TownyServer(models.Model):
     max_players = models.IntegerField(default=100)
     status = models.BooleanField(default=True)  # True = online, False = offline
     discord_link = models.CharField(max_length=100, blank=True, null=True)
+    last_status_success = models.DateTimeField(null=True, blank=True, help_text="Last time the status poller reached the server")
     
     def __str__(self):
         return self.name
@@ -27,6 +52,14 @@ class Nation(models.Model):
     capital = models.CharField(max_length=100)
     flag_image = models.CharField(max_length=255, blank=True, null=True, help_text="URL of the flag image")
     real_world_country = models.CharField(max_length=100, blank=True, help_text="Real world country represented")
+    # Maintained by leaderboard.py when towns are created, moved or deleted
+    towns_count = models.IntegerField(default=0, editable=False)
+    residents_total = models.IntegerField(default=0, editable=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-towns_count', 'id'], name='nation_leaderboard_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -41,9 +74,35 @@ class Town(models.Model):
     location_x = models.IntegerField(help_text="X coordinate on the map")
     location_z = models.IntegerField(help_text="Z coordinate on the map")
     real_world_location = models.CharField(max_length=100, blank=True, help_text="Real world location represented")
+    tile_x = models.IntegerField(default=0, editable=False)
+    tile_z = models.IntegerField(default=0, editable=False)
+    
+    class Meta:
+        indexes = [
+            # Keyset pagination of a nation's towns (nation_detail)
+            models.Index(fields=['nation', '-residents_count', 'id'], name='town_nation_residents_idx'),
+            # Map tiles (map_tiles.py)
+            models.Index(fields=['tile_x', 'tile_z'], name='town_tile_idx'),
+        ]
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        _save_with_map_tile(self, kwargs)
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this town contributes to its nation's counters (see leaderboard.py).
+        # With deferred fields the previous values are unknown and are read back before saving
+        if 'nation_id' in instance.__dict__ and 'residents_count' in instance.__dict__:
+            instance._counted = (instance.nation_id, instance.residents_count)
+        else:
+            instance._counted = None
+        instance._stored_tile = _stored_map_tile(instance)
+        return instance
 
 class StaffMember(models.Model):
     ROLE_CHOICES = [
@@ -113,30 +172,96 @@ class DynamicMapPoint(models.Model):
     location_x = models.IntegerField(help_text="X coordinate on the map")
     location_z = models.IntegerField(help_text="Z coordinate on the map")
     description = models.TextField(blank=True)
+    tile_x = models.IntegerField(default=0, editable=False)
+    tile_z = models.IntegerField(default=0, editable=False)
+    
+    class Meta:
+        indexes = [
+            # Keyset pagination of map points filtered by type (map_points_api)
+            models.Index(fields=['point_type', 'id'], name='mappoint_type_idx'),
+            # Map tiles (map_tiles.py)
+            models.Index(fields=['tile_x', 'tile_z'], name='mappoint_tile_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.get_point_type_display()})"
     
+    def save(self, *args, **kwargs):
+        _save_with_map_tile(self, kwargs)
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_tile = _stored_map_tile(instance)
+        return instance
+    
     # Ajoutez ceci à la fin de minecraft_app/models.py
 
+def normalize_minecraft_username(username):
+    """
+    Lookup key of a Minecraft username: names are case-insensitive, so
+    'Steve' and 'steve' are the same player. None when there is no name.
+    """
+    return (username or '').strip().lower() or None
+
+def find_profile_by_minecraft_username(username):
+    """Profile registered with this Minecraft username, whatever its case, or None"""
+    key = normalize_minecraft_username(username)
+    if key is None:
+        return None
+    return UserProfile.objects.select_related('user').filter(minecraft_username_normalized=key).first()
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     minecraft_username = models.CharField(max_length=100, blank=True)
+    # Lowercased minecraft_username: every lookup goes through its unique index, which also
+    # makes two concurrent registrations of the same name fail instead of both succeeding
+    minecraft_username_normalized = models.CharField(max_length=100, unique=True, null=True, editable=False)
     minecraft_uuid = models.CharField(max_length=36, blank=True)
+    minecraft_uuid_checked_at = models.DateTimeField(null=True, blank=True)
     bio = models.TextField(blank=True)
     discord_username = models.CharField(max_length=100, blank=True)
     
     def __str__(self):
         return f"Profil de {self.user.username}"
     
+    def save(self, *args, **kwargs):
+        self.minecraft_username_normalized = normalize_minecraft_username(self.minecraft_username)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'minecraft_username' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'minecraft_username_normalized'}
+        super().save(*args, **kwargs)
+    
+    @property
+    def uuid_pending(self):
+        """True while the background resolver has not looked up the current username yet"""
+        return bool(self.minecraft_username) and self.minecraft_uuid_checked_at is None
+    
     def get_avatar_url(self):
+        # Falls back to the username while the UUID is pending
         if self.minecraft_uuid:
-            return f"https://mc-heads.net/avatar/{self.minecraft_uuid}/100"
+            return reverse('avatar', args=[self.minecraft_uuid, 100])
         elif self.minecraft_username:
-            return f"https://mc-heads.net/avatar/{self.minecraft_username}/100"
+            return reverse('avatar', args=[self.minecraft_username, 100])
         else:
-            return "https://mc-heads.net/avatar/MHF_Steve/100"  # Avatar par défaut
+            return reverse('avatar', args=['MHF_Steve', 100])  # Avatar par défaut
+        
+class MojangProfileCache(models.Model):
+    """
+    Name -> UUID answers from the Mojang API, shared by every worker process.
+
+    An empty `minecraft_uuid` records a "no such player" answer (negative cache).
+    """
+    name_lower = models.CharField(max_length=16, unique=True)
+    name = models.CharField(max_length=16)
+    minecraft_uuid = models.CharField(max_length=32, blank=True)
+    fetched_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} -> {self.minecraft_uuid or 'not found'}"
         
+
 class UserPurchase(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='purchases')
     rank = models.ForeignKey(Rank, on_delete=models.SET_NULL, null=True)
@@ -193,7 +318,11 @@ class CartItem(models.Model):
         return f"{self.user.username} - Unknown item"
     
 
-    def get_subtotal(self):
+    def get_subtotal(self, discount_percentage=None):
+        """
+        Price of this cart line. Pass the player's discount_percentage when
+        pricing a whole cart (see cart_pricing.price_cart) to avoid looking it up per line.
+        """
         if self.rank:
             # Check if there's metadata with discounted price
             if self.metadata and 'discounted_price' in self.metadata:
@@ -201,12 +330,9 @@ class CartItem(models.Model):
             return self.rank.price
         elif self.store_item:
             # Apply any rank-based discount
-            discount_percentage = get_player_discount(self.user)
-            item_price = self.store_item.price
-            if discount_percentage > 0:
-                discount_factor = Decimal(1 - discount_percentage / 100)
-                item_price = round(item_price * discount_factor, 2)
-            return item_price * self.quantity
+            if discount_percentage is None:
+                discount_percentage = get_player_discount(self.user)
+            return apply_discount(self.store_item.price, discount_percentage) * self.quantity
         return Decimal('0.00')
     
     def save(self, *args, **kwargs):
@@ -236,27 +362,96 @@ class WebhookError(models.Model):
 
     def __str__(self):
         return f"{self.event_type} - {self.session_id} - {self.error_message[:50]}"
-    
 
-def get_player_discount(user):
+
+class RankDelivery(models.Model):
     """
-    Returns the discount percentage a player should receive based on their highest rank
+    Outbox entry for a LuckPerms command that still has to reach the Minecraft server.
+
+    Rows are written in the same transaction as the purchase and drained by the
+    `deliver_ranks` management command, so the Stripe webhook never waits on RCON.
     """
-    if not user or not user.is_authenticated:
-        return 0
-    
-    # Get user's purchased ranks
-    purchased_ranks = UserPurchase.objects.filter(
-        user=user,
-        payment_status='completed'
-    ).select_related('rank')
-    
-    if not purchased_ranks.exists():
-        return 0
-    
-    # Get names of all purchased ranks
-    rank_names = [purchase.rank.name.lower() for purchase in purchased_ranks if purchase.rank]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('delivered', 'Delivered'),
+        ('dead', 'Dead letter'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='rank_deliveries')
+    purchase = models.ForeignKey(UserPurchase, on_delete=models.SET_NULL, null=True, blank=True, related_name='deliveries')
+    minecraft_username = models.CharField(max_length=100)
+    rank_name = models.CharField(max_length=100)
+    command = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Rank deliveries"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.minecraft_username} - {self.rank_name} ({self.get_status_display()})"
+
+
+class ContactMessage(models.Model):
+    """Contact form message, persisted first and posted to Discord by the send_contact_messages command"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Rejected by Discord'),
+    ]
+
+    name = models.CharField(max_length=100)
+    discord_username = models.CharField(max_length=100, blank=True)
+    minecraft_username = models.CharField(max_length=100, blank=True)
+    subject = models.CharField(max_length=200)
+    message = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} - {self.subject} ({self.get_status_display()})"
+
+
+class PlayerEntitlement(models.Model):
+    """Denormalized summary of a user's completed rank purchases, maintained by entitlements.refresh_entitlement"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='entitlement')
+    highest_rank = models.ForeignKey(Rank, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    owned_rank_ids = models.JSONField(default=list, blank=True)
+    discount_percentage = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.highest_rank.name if self.highest_rank else 'No rank'} ({self.discount_percentage}%)"
     
+
+def apply_discount(price, discount_percentage):
+    """
+    Returns the price after a percentage discount, rounded to the cent
+    """
+    if discount_percentage <= 0:
+        return price
+    return round(price * Decimal(1 - discount_percentage / 100), 2)
+
+def get_discount_for_rank_names(rank_names):
+    """
+    Returns the discount percentage granted by a set of lowercased rank names
+    """
     # Define discount tiers
     if 'deity' in rank_names:
         return 20  # 20% discount
@@ -267,4 +462,14 @@ def get_player_discount(user):
     elif 'hero' in rank_names or 'role hero' in rank_names:
         return 5   # 5% discount
     else:
-        return 0   # No discount
\ No newline at end of file
+        return 0   # No discount
+
+def get_player_discount(user):
+    """
+    Returns the discount percentage a player should receive based on their highest rank
+    """
+    if not user or not user.is_authenticated:
+        return 0
+    
+    from .entitlements import get_entitlement
+    return get_entitlement(user).discount_percentage
@@ -0,0 +1,122 @@
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.translation import get_language
+
+VERSION_KEY_PREFIX = 'minecraft_app:page_version:'
+PAGE_KEY_PREFIX = 'minecraft_app:page:'
+
+# base.html affiche l'état du serveur sur chaque page
+ALWAYS_DEPENDS_ON = ('minecraft_app.townyserver',)
+
+
+class PageCacheStats:
+    """Compteurs de hits/miss par vue pour le cache de pages (par processus)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view_name, outcome):
+        with self._lock:
+            stats = self._views.setdefault(view_name, {'hits': 0, 'misses': 0, 'bypassed': 0})
+            stats[outcome] += 1
+
+    def snapshot(self):
+        """Copie des compteurs, avec le taux de hit par vue."""
+        with self._lock:
+            result = {}
+            for view_name, stats in self._views.items():
+                lookups = stats['hits'] + stats['misses']
+                result[view_name] = dict(stats, hit_rate=round(stats['hits'] / lookups, 3) if lookups else None)
+            return result
+
+
+page_cache_stats = PageCacheStats()
+
+
+def _version_key(label):
+    return VERSION_KEY_PREFIX + label
+
+def invalidate_pages(model):
+    """
+    Invalide toutes les pages en cache qui dépendent de ce modèle, en changeant
+    sa version : les anciennes entrées ne sont plus jamais lues et expirent seules.
+    """
+    cache.set(_version_key(model._meta.label_lower), time.time_ns(), timeout=None)
+
+def _get_versions(labels):
+    keys = [_version_key(label) for label in labels]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Version inconnue (cache vidé) : en créer une, sans écraser celle d'un autre processus
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [str(versions[key]) for key in keys]
+
+def _page_key(request, labels):
+    parts = [get_language() or settings.LANGUAGE_CODE, request.get_full_path()] + _get_versions(labels)
+    return PAGE_KEY_PREFIX + hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+
+def _is_cacheable_request(request):
+    if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+        return False
+    # Un message flash est propre au visiteur ; len() ne le marque pas comme lu
+    return not len(messages.get_messages(request))
+
+def _is_cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        # get_token() a été appelé : la page contient un jeton CSRF propre au visiteur
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+def cache_anonymous_page(*models):
+    """
+    Met en cache le HTML d'une vue publique pour les visiteurs anonymes, par
+    chemin et par langue. Le cache est invalidé dès qu'une ligne d'un des
+    modèles donnés (ou du TownyServer) change, via invalidate_pages().
+
+    Args:
+        *models: Modèles dont dépend le contenu de la page
+    """
+    labels = sorted({model._meta.label_lower for model in models} | set(ALWAYS_DEPENDS_ON))
+
+    def decorator(view):
+        view_name = view.__name__
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _is_cacheable_request(request):
+                page_cache_stats.record(view_name, 'bypassed')
+                return view(request, *args, **kwargs)
+
+            key = _page_key(request, labels)
+            cached = cache.get(key)
+            if cached is not None:
+                page_cache_stats.record(view_name, 'hits')
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Page-Cache'] = 'HIT'
+                return response
+
+            page_cache_stats.record(view_name, 'misses')
+            response = view(request, *args, **kwargs)
+            if _is_cacheable_response(request, response):
+                cache.set(key, (response.content, response['Content-Type']), timeout=settings.PAGE_CACHE_TIMEOUT)
+                response['X-Page-Cache'] = 'MISS'
+            return response
+
+        return wrapper
+
+    return decorator
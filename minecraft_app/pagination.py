@@ -0,0 +1,96 @@
+import base64
+import json
+from collections import namedtuple
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# Une page de résultats et le curseur de la suivante (None en fin de liste)
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor'])
+
+
+class InvalidCursor(ValueError):
+    """Curseur de pagination illisible ou ne correspondant pas au tri."""
+    pass
+
+
+def encode_cursor(values):
+    data = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+def decode_cursor(token, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise InvalidCursor("Curseur illisible")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Curseur incompatible avec ce tri")
+    return values
+
+def _cursor_values(model, ordering, values):
+    # Chaque valeur est validée par son champ (type et bornes) : un curseur forgé
+    # ne doit pas faire échouer la requête SQL
+    cleaned = []
+    for field, value in zip(ordering, values):
+        model_field = model._meta.get_field(field.lstrip('-'))
+        try:
+            if value is None:
+                raise ValidationError("Valeur manquante")
+            cleaned.append(model_field.clean(value, None))
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor("Curseur incompatible avec ce tri")
+    return cleaned
+
+def get_page_size(request):
+    """Taille de page demandée (?limit=), bornée par LISTING_MAX_PAGE_SIZE."""
+    try:
+        size = int(request.GET.get('limit', settings.LISTING_PAGE_SIZE))
+    except ValueError:
+        size = settings.LISTING_PAGE_SIZE
+    return max(1, min(size, settings.LISTING_MAX_PAGE_SIZE))
+
+def _seek_filter(ordering, values):
+    # (a, b) après (va, vb) : a au-delà de va, ou a == va et b au-delà de vb
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[position]})
+        for previous, value in zip(ordering[:position], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+def keyset_page(queryset, ordering, cursor=None, page_size=50):
+    """
+    Pagination par clé (seek) : au lieu d'un OFFSET qui relit toutes les lignes
+    précédentes, chaque page reprend après la dernière ligne de la précédente,
+    ce qui reste un simple parcours d'index quelle que soit la profondeur.
+
+    Args:
+        queryset: Requête à paginer
+        ordering (list): Champs de tri (préfixe '-' pour décroissant) ; le
+            dernier doit être unique, typiquement 'id'
+        cursor (str): Curseur renvoyé par la page précédente, ou None
+        page_size (int): Nombre de lignes par page
+
+    Returns:
+        KeysetPage: Lignes de la page et curseur de la suivante
+
+    Raises:
+        InvalidCursor: Si le curseur ne peut pas être décodé ou si ses valeurs
+            ne correspondent pas aux champs de tri
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = _cursor_values(queryset.model, ordering, decode_cursor(cursor, len(ordering)))
+        queryset = queryset.filter(_seek_filter(ordering, values))
+
+    # Une ligne de plus pour savoir s'il reste une page
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, field.lstrip('-')) for field in ordering])
+    return KeysetPage(items, next_cursor)
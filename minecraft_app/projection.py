@@ -0,0 +1,91 @@
+import numpy as np
+from django.conf import settings
+
+# Circonférence équatoriale de la Terre, en mètres
+EARTH_CIRCUMFERENCE = 40075016.686
+
+
+def blocks_per_degree():
+    """Blocs par degré de longitude (et de latitude) : 111,3 au 1:1000."""
+    return EARTH_CIRCUMFERENCE / settings.MAP_SCALE / 360
+
+def _check_lonlat(lon, lat):
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        raise ValueError(f"Coordonnées hors limites : longitude {lon}, latitude {lat}")
+
+def lonlat_to_block(lon, lat):
+    """
+    Bloc (x, z) d'un point réel, en projection équirectangulaire : x croît
+    vers l'est, z vers le sud, comme dans Minecraft.
+
+    Raises:
+        ValueError: Si la longitude ou la latitude est hors limites
+    """
+    _check_lonlat(lon, lat)
+    scale = blocks_per_degree()
+    return (round(settings.MAP_ORIGIN_X + lon * scale), round(settings.MAP_ORIGIN_Z - lat * scale))
+
+def block_to_lonlat(x, z):
+    """Longitude et latitude du bloc (x, z), inverse de lonlat_to_block()."""
+    scale = blocks_per_degree()
+    return ((x - settings.MAP_ORIGIN_X) / scale, (settings.MAP_ORIGIN_Z - z) / scale)
+
+def lonlat_to_blocks(lons, lats):
+    """
+    Conversion en lot de lonlat_to_block(), vectorisée avec NumPy : des
+    milliers de points par appel sans boucle Python.
+
+    Args:
+        lons: Longitudes (séquence ou tableau NumPy)
+        lats: Latitudes, de même longueur
+
+    Returns:
+        tuple: (xs, zs), tableaux d'entiers NumPy
+
+    Raises:
+        ValueError: Si une coordonnée est hors limites
+    """
+    lons, lats = np.asarray(lons, dtype=float), np.asarray(lats, dtype=float)
+    invalid = (np.abs(lons) > 180) | (np.abs(lats) > 90) | np.isnan(lons) | np.isnan(lats)
+    if invalid.any():
+        index = int(np.argmax(invalid))
+        _check_lonlat(lons[index], lats[index])
+    scale = blocks_per_degree()
+    # np.rint arrondit au pair le plus proche, comme round()
+    xs = np.rint(settings.MAP_ORIGIN_X + lons * scale).astype(np.int64)
+    zs = np.rint(settings.MAP_ORIGIN_Z - lats * scale).astype(np.int64)
+    return xs, zs
+
+def blocks_to_lonlat(xs, zs):
+    """
+    Conversion en lot de block_to_lonlat().
+
+    Returns:
+        tuple: (lons, lats), tableaux NumPy
+    """
+    scale = blocks_per_degree()
+    xs, zs = np.asarray(xs, dtype=float), np.asarray(zs, dtype=float)
+    return (xs - settings.MAP_ORIGIN_X) / scale, (settings.MAP_ORIGIN_Z - zs) / scale
+
+def block_distances(xs, zs, expected_xs, expected_zs):
+    """Distance en blocs entre deux lots de positions, élément par élément."""
+    return np.hypot(np.asarray(xs) - np.asarray(expected_xs), np.asarray(zs) - np.asarray(expected_zs))
+
+def parse_lonlat(text):
+    """
+    Lit une position réelle écrite `latitude, longitude` (ordre des cartes
+    en ligne), ou None si le texte n'en est pas une (nom de lieu).
+
+    Returns:
+        tuple: (lon, lat) ou None
+    """
+    parts = text.replace(';', ',').split(',')
+    if len(parts) != 2:
+        return None
+    try:
+        lat, lon = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        return None
+    return lon, lat
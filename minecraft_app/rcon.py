@@ -0,0 +1,333 @@
+import logging
+import select
+import socket
+import struct
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from mcrcon import MCRcon, MCRconException
+
+logger = logging.getLogger('minecraft_app')
+
+# Résultat d'une commande envoyée via RconPool.command_batch()
+RconResult = namedtuple('RconResult', ['command', 'success', 'response', 'error'])
+
+
+class RconPoolTimeout(MCRconException):
+    """Aucune connexion RCON libre n'a pu être obtenue dans le délai imparti."""
+    pass
+
+
+class PooledRcon(MCRcon):
+    """
+    Connexion RCON réutilisable, destinée à vivre dans un RconPool.
+
+    MCRcon installe un handler SIGALRM dans son constructeur et s'en sert pour
+    ses timeouts de lecture, ce qui ne fonctionne que dans le thread principal.
+    Cette variante s'appuie à la place sur les timeouts du socket, ce qui permet
+    de l'utiliser depuis les threads des workers WSGI.
+    """
+
+    def __init__(self, host, password, port=25575, timeout=5):
+        # MCRcon.__init__ n'est volontairement pas appelé (signal.signal)
+        self.host = host
+        self.password = password
+        self.port = port
+        self.tlsmode = 0
+        self.timeout = timeout
+        self.socket = None
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self._request_id = 0
+
+    def connect(self):
+        self.socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self._send(3, self.password)
+
+    def _read(self, length):
+        data = b""
+        while len(data) < length:
+            chunk = self.socket.recv(length - len(data))
+            if not chunk:
+                raise ConnectionResetError("Connexion RCON fermée par le serveur")
+            data += chunk
+        return data
+
+    def _write_packet(self, request_id, out_type, out_data):
+        payload = struct.pack("<ii", request_id, out_type) + out_data.encode("utf8") + b"\x00\x00"
+        self.socket.sendall(struct.pack("<i", len(payload)) + payload)
+
+    def _read_packet(self):
+        (in_length,) = struct.unpack("<i", self._read(4))
+        payload = self._read(in_length)
+        in_id, _ = struct.unpack("<ii", payload[:8])
+        if payload[-2:] != b"\x00\x00":
+            raise MCRconException("Incorrect padding")
+        if in_id == -1:
+            raise MCRconException("Login failed")
+        return in_id, payload[8:-2].decode("utf8")
+
+    def _has_pending_data(self):
+        return bool(select.select([self.socket], [], [], 0)[0])
+
+    def command_batch(self, pending, responses, depth=1):
+        """
+        Envoie plusieurs commandes sur cette connexion, chacune avec son propre
+        identifiant de requête, et range les réponses dans `responses`.
+
+        Jusqu'à `depth` commandes sont envoyées sans attendre de réponse. Le
+        serveur traitant les requêtes dans l'ordre, une réponse est complète dès
+        qu'un paquet d'un autre identifiant arrive, ou que plus rien n'est en
+        attente sur le socket (même heuristique que MCRcon._send).
+
+        Le lecteur RCON vanilla ne décode qu'un paquet par lecture TCP : au-delà
+        de depth=1, réserver ce mode aux serveurs qui gèrent le pipelining.
+
+        Args:
+            pending (list): Paires (clé, commande) à envoyer
+            responses (dict): Réponses reçues, indexées par clé ; rempli au fur et
+                à mesure pour qu'un appelant puisse reprendre après une erreur
+            depth (int): Nombre maximum de commandes en vol
+        """
+        to_send = deque(pending)
+        in_flight = deque()
+        received = {}
+
+        while to_send or in_flight:
+            while to_send and len(in_flight) < depth:
+                key, command = to_send.popleft()
+                self._request_id += 1
+                self._write_packet(self._request_id, 2, command)
+                in_flight.append((self._request_id, key))
+                received[key] = ""
+
+            in_id, data = self._read_packet()
+            # Les réponses des requêtes précédentes sont terminées
+            while in_flight and in_flight[0][0] != in_id:
+                _, key = in_flight.popleft()
+                responses[key] = received.pop(key)
+            if not in_flight:
+                raise MCRconException(f"Unexpected RCON request id {in_id}")
+
+            received[in_flight[0][1]] += data
+            if not self._has_pending_data():
+                _, key = in_flight.popleft()
+                responses[key] = received.pop(key)
+                if depth == 1:
+                    time.sleep(0.003)  # MC-72390 workaround, comme MCRcon.command
+
+        self.last_used = time.monotonic()
+
+    def is_alive(self):
+        """
+        Vérifie sans aller-retour réseau que le socket est toujours utilisable.
+
+        Aucune requête n'est en cours sur une connexion au repos : si le socket
+        est lisible, c'est que le serveur l'a fermé (ou a envoyé des données
+        orphelines), dans les deux cas la connexion doit être jetée.
+        """
+        if self.socket is None:
+            return False
+        try:
+            readable, _, _ = select.select([self.socket], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def ping(self):
+        """
+        Aller-retour léger pour vérifier que le serveur répond.
+
+        Un paquet de type inconnu reçoit une réponse "Unknown request" sans
+        qu'aucune commande ne soit exécutée ni journalisée côté serveur.
+        """
+        self._send(0, '')
+        self.last_used = time.monotonic()
+
+
+class RconPool:
+    """
+    Pool thread-safe de connexions RCON authentifiées vers un serveur Minecraft.
+
+    Le nombre de connexions ouvertes est borné par `size`. Les connexions au
+    repos sont contrôlées à chaque emprunt, pingées si elles n'ont pas servi
+    depuis `keepalive` secondes, et recréées de façon transparente si le
+    serveur les a coupées.
+    """
+
+    def __init__(self, host, port, password, size=2, timeout=5, acquire_timeout=10, keepalive=30,
+                 pipeline_depth=1):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+        self.keepalive = keepalive
+        self.pipeline_depth = pipeline_depth
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _open(self):
+        logger.info(f"Connexion RCON à {self.host}:{self.port}")
+        conn = PooledRcon(self.host, self.password, self.port, timeout=self.timeout)
+        try:
+            conn.connect()
+        except Exception:
+            conn.disconnect()
+            raise
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.disconnect()
+        except OSError:
+            pass
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._open()
+            if not conn.is_alive():
+                logger.debug("Connexion RCON fermée par le serveur, abandon")
+                self._discard(conn)
+                continue
+            if time.monotonic() - conn.last_used > self.keepalive:
+                try:
+                    conn.ping()
+                except (OSError, MCRconException) as e:
+                    logger.debug(f"Ping RCON échoué, abandon de la connexion: {str(e)}")
+                    self._discard(conn)
+                    continue
+            return conn
+
+    @contextmanager
+    def connection(self):
+        """Emprunte une connexion authentifiée pour la durée du bloc `with`."""
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise RconPoolTimeout(
+                f"Aucune connexion RCON disponible après {self.acquire_timeout}s"
+            )
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        except BaseException:
+            # L'état du flux est inconnu après une erreur : ne pas la remettre au pool
+            if conn is not None:
+                self._discard(conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                conn.last_used = time.monotonic()
+                with self._lock:
+                    self._idle.append(conn)
+            self._slots.release()
+
+    def command(self, command, retries=1):
+        """
+        Envoie une commande et retourne la réponse du serveur.
+
+        En cas de socket cassé la commande est renvoyée sur une connexion neuve,
+        `retries` fois au plus. Les appelants ne doivent donc passer que des
+        commandes idempotentes (c'est le cas de `lp user ... parent add`).
+        """
+        attempt = 0
+        while True:
+            try:
+                with self.connection() as conn:
+                    return conn.command(command)
+            except RconPoolTimeout:
+                raise
+            except (OSError, MCRconException) as e:
+                if attempt >= retries:
+                    raise
+                attempt += 1
+                logger.warning(f"Connexion RCON perdue ({str(e)}), nouvelle tentative {attempt}/{retries}")
+
+    def command_batch(self, commands, retries=1):
+        """
+        Envoie une liste de commandes sur une seule connexion authentifiée.
+
+        Si la connexion casse en cours de route, seules les commandes restées
+        sans réponse sont renvoyées sur une connexion neuve (`retries` fois au
+        plus) ; comme pour command(), elles doivent être idempotentes.
+
+        Returns:
+            list: Un RconResult par commande, dans l'ordre de `commands`
+        """
+        responses = {}
+        error = None
+        attempt = 0
+        while True:
+            pending = [(i, command) for i, command in enumerate(commands) if i not in responses]
+            if not pending:
+                break
+            try:
+                with self.connection() as conn:
+                    conn.command_batch(pending, responses, depth=self.pipeline_depth)
+            except RconPoolTimeout as e:
+                error = e
+                break
+            except (OSError, MCRconException) as e:
+                error = e
+                if attempt >= retries:
+                    break
+                attempt += 1
+                logger.warning(
+                    f"Connexion RCON perdue ({str(e)}), renvoi de {len(commands) - len(responses)} "
+                    f"commande(s), tentative {attempt}/{retries}"
+                )
+
+        return [
+            RconResult(command, True, responses[i], None) if i in responses
+            else RconResult(command, False, None, str(error))
+            for i, command in enumerate(commands)
+        ]
+
+    def close(self):
+        """Ferme toutes les connexions au repos."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_rcon_pool():
+    """Retourne le pool RCON du processus, créé au premier appel depuis les settings."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = RconPool(
+                    settings.MINECRAFT_RCON_HOST,
+                    settings.MINECRAFT_RCON_PORT,
+                    settings.MINECRAFT_RCON_PASSWORD,
+                    size=settings.MINECRAFT_RCON_POOL_SIZE,
+                    timeout=settings.MINECRAFT_RCON_TIMEOUT,
+                    acquire_timeout=settings.MINECRAFT_RCON_POOL_ACQUIRE_TIMEOUT,
+                    keepalive=settings.MINECRAFT_RCON_KEEPALIVE,
+                    pipeline_depth=settings.MINECRAFT_RCON_PIPELINE_DEPTH,
+                )
+    return _pool
+
+
+def close_rcon_pool():
+    """Ferme le pool du processus ; le prochain appel à get_rcon_pool() en recrée un."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,354 @@
+import logging
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict, namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from .models import Nation, Town, UserProfile
+
+logger = logging.getLogger(__name__)
+
+SEARCH_KINDS = ('player', 'town', 'nation')
+SEARCH_VERSION_KEY = 'minecraft_app:search_version:{kind}'
+
+# Un résultat possible : joueur, ville ou nation, avec son lieu réel et, pour une ville, sa position
+SearchEntry = namedtuple('SearchEntry', ['kind', 'id', 'name', 'detail', 'x', 'z'])
+
+# Scores : nom exact, début du nom, début d'un mot du nom ou du lieu réel ; les
+# correspondances approchées (trigrammes) restent en dessous
+EXACT_SCORE = 1.0
+NAME_PREFIX_SCORE = 0.9
+WORD_PREFIX_SCORE = 0.8
+TRIGRAM_WEIGHT = 0.7
+
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Minuscules sans accents, pour comparer « Évry » et « evry »."""
+    if not text:
+        return ''
+    if text.isascii():
+        # Cas de presque tous les pseudos Minecraft
+        return text.lower().strip()
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower().strip()
+
+def trigrams(text):
+    """Trigrammes d'un texte normalisé, chaque mot bordé d'espaces comme pg_trgm."""
+    grams = set()
+    for word in WORD_PATTERN.findall(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def _terms(entry):
+    # Nom et lieu réel normalisés une seule fois par entrée
+    return normalize(entry.name), normalize(entry.detail)
+
+def _name_key(entry, terms):
+    return (terms[0], entry.id)
+
+def _word_keys(entry, terms):
+    # Mots du nom après le premier, et mots du lieu réel
+    name, detail = terms
+    words = set(WORD_PATTERN.findall(name)[1:] + WORD_PATTERN.findall(detail))
+    return [(word, entry.id) for word in words]
+
+def _insert(keys, key):
+    keys.insert(bisect_left(keys, key), key)
+
+def _discard(keys, key):
+    position = bisect_left(keys, key)
+    if position < len(keys) and keys[position] == key:
+        del keys[position]
+
+
+class SearchIndex:
+    """
+    Index en mémoire d'un type de résultat : deux listes triées pour la
+    recherche par préfixe (bisect), l'une des noms, l'autre des mots des noms
+    et lieux réels, et des listes de trigrammes pour les fautes de frappe.
+    Les ajouts et retraits se font entrée par entrée.
+    """
+
+    def __init__(self, entries=()):
+        self.entries = {}
+        # Listes séparées : les mots (score plus faible) ne prennent pas la place des noms
+        self._name_keys = []
+        self._word_keys = []
+        # trigramme -> {terme}, un terme valant id * 2 pour le nom et id * 2 + 1 pour le lieu réel
+        self._postings = defaultdict(set)
+        self._term_sizes = {}
+        for entry in entries:
+            terms = _terms(entry)
+            self.entries[entry.id] = entry
+            if terms[0]:
+                self._name_keys.append(_name_key(entry, terms))
+            self._word_keys.extend(_word_keys(entry, terms))
+            self._index_terms(entry, terms)
+        # Un seul tri pour la construction initiale
+        self._name_keys.sort()
+        self._word_keys.sort()
+
+    def _index_terms(self, entry, terms):
+        postings = self._postings
+        for position, term in enumerate(terms):
+            grams = trigrams(term) if term else ()
+            if grams:
+                key = entry.id * 2 + position
+                self._term_sizes[key] = len(grams)
+                for gram in grams:
+                    postings[gram].add(key)
+
+    def add(self, entry):
+        self.remove(entry.id)
+        terms = _terms(entry)
+        self.entries[entry.id] = entry
+        if terms[0]:
+            _insert(self._name_keys, _name_key(entry, terms))
+        for key in _word_keys(entry, terms):
+            _insert(self._word_keys, key)
+        self._index_terms(entry, terms)
+
+    def remove(self, entry_id):
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return
+        terms = _terms(entry)
+        _discard(self._name_keys, _name_key(entry, terms))
+        for key in _word_keys(entry, terms):
+            _discard(self._word_keys, key)
+        for position, term in enumerate(terms):
+            key = entry.id * 2 + position
+            self._term_sizes.pop(key, None)
+            for gram in trigrams(term):
+                postings = self._postings.get(gram)
+                if postings is not None:
+                    postings.discard(key)
+                    if not postings:
+                        del self._postings[gram]
+
+    def search(self, query, limit):
+        """
+        Entrées correspondant à une requête déjà normalisée : préfixes d'abord,
+        puis, s'il manque des résultats, similarité de trigrammes au-dessus de
+        SEARCH_MIN_SIMILARITY.
+
+        Returns:
+            list: Paires (score, entrée), non triées
+        """
+        scores = {}
+        # Noms commençant par la requête, dans l'ordre alphabétique (le nom exact en premier) :
+        # les `limit` premiers suffisent, un préfixe court pouvant en avoir des milliers
+        keys = self._name_keys
+        position = bisect_left(keys, (query,))
+        while len(scores) < limit and position < len(keys) and keys[position][0].startswith(query):
+            key, entry_id = keys[position]
+            scores[entry_id] = EXACT_SCORE if key == query else NAME_PREFIX_SCORE
+            position += 1
+
+        # Puis, s'il manque des résultats, les mots du nom ou du lieu réel
+        keys = self._word_keys
+        position = bisect_left(keys, (query,))
+        while len(scores) < limit and position < len(keys) and keys[position][0].startswith(query):
+            entry_id = keys[position][1]
+            scores.setdefault(entry_id, WORD_PREFIX_SCORE)
+            position += 1
+
+        query_grams = trigrams(query)
+        if len(scores) < limit and len(query) >= 3 and query_grams:
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(self._postings.get(gram, ()))
+            threshold = settings.SEARCH_MIN_SIMILARITY
+            size = len(query_grams)
+            # count / (size + term_size - count) >= seuil exige au moins ce nombre de trigrammes communs
+            min_shared = threshold * (size + 1) / (1 + threshold)
+            term_sizes = self._term_sizes
+            for term, count in shared.items():
+                if count < min_shared:
+                    continue
+                similarity = count / (size + term_sizes[term] - count)
+                if similarity >= threshold:
+                    score = similarity * TRIGRAM_WEIGHT
+                    entry_id = term >> 1
+                    if score > scores.get(entry_id, 0):
+                        scores[entry_id] = score
+
+        return [(score, self.entries[entry_id]) for entry_id, score in scores.items()]
+
+
+def player_entry(profile):
+    return SearchEntry('player', profile.user_id, profile.minecraft_username, '', None, None)
+
+def town_entry(town):
+    return SearchEntry('town', town.id, town.name, town.real_world_location, town.location_x, town.location_z)
+
+def nation_entry(nation):
+    return SearchEntry('nation', nation.id, nation.name, nation.real_world_country, None, None)
+
+def _load_entries(kind):
+    if kind == 'player':
+        profiles = UserProfile.objects.exclude(minecraft_username='').only('user_id', 'minecraft_username')
+        return (player_entry(profile) for profile in profiles.iterator(chunk_size=5000))
+    if kind == 'town':
+        towns = Town.objects.only('id', 'name', 'real_world_location', 'location_x', 'location_z')
+        return (town_entry(town) for town in towns.iterator(chunk_size=5000))
+    nations = Nation.objects.only('id', 'name', 'real_world_country')
+    return (nation_entry(nation) for nation in nations.iterator(chunk_size=5000))
+
+
+# Index de ce processus par type : (version, SearchIndex), et types en cours de reconstruction
+_indexes = {}
+_rebuilding = set()
+_lock = threading.Lock()
+
+def _version_key(kind):
+    return SEARCH_VERSION_KEY.format(kind=kind)
+
+def _get_versions(kinds):
+    keys = {kind: _version_key(kind) for kind in kinds}
+    versions = cache.get_many(list(keys.values()))
+    for kind, key in keys.items():
+        if key not in versions:
+            # Version inconnue (cache vidé) : en créer une, sans écraser celle d'un autre processus
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return {kind: versions[key] for kind, key in keys.items()}
+
+def _bump_version(kind):
+    try:
+        return cache.incr(_version_key(kind))
+    except ValueError:
+        cache.add(_version_key(kind), time.time_ns(), timeout=None)
+        return cache.incr(_version_key(kind))
+
+def _rebuild(kind, version=None):
+    try:
+        if version is None:
+            version = _get_versions([kind])[kind]
+        index = SearchIndex(_load_entries(kind))
+        with _lock:
+            # Les versions ne font qu'augmenter : ne pas remplacer un index mis à jour entre-temps
+            state = _indexes.get(kind)
+            if state is None or state[0] < version:
+                _indexes[kind] = (version, index)
+    except Exception:
+        # Base pas encore migrée, connexion perdue... : nouvel essai à la prochaine recherche
+        logger.exception(f"Construction de l'index de recherche {kind} impossible")
+    finally:
+        with _lock:
+            _rebuilding.discard(kind)
+        # Ce thread a ouvert sa propre connexion à la base
+        connection.close()
+
+def _start_rebuild(kind, version=None):
+    with _lock:
+        if kind in _rebuilding:
+            return
+        _rebuilding.add(kind)
+    threading.Thread(target=_rebuild, args=(kind, version), daemon=True).start()
+
+def warm_indexes(kinds=SEARCH_KINDS):
+    """
+    Construit en arrière-plan les index absents de ce processus (quelques
+    secondes pour 100 000 joueurs), pour qu'aucune recherche ne les attende.
+    """
+    for kind in kinds:
+        if kind not in _indexes:
+            _start_rebuild(kind)
+
+def _get_index(kind, version):
+    """Index à jour ou périmé de ce processus, ou None s'il est encore en construction."""
+    state = _indexes.get(kind)
+    if state is not None and state[0] == version:
+        return state[1]
+    # Index absent, ou modifié par un autre processus : l'ancien index reste servi pendant
+    # sa reconstruction en arrière-plan. La version est lue avant la base, donc une
+    # modification pendant la lecture déclenchera une autre reconstruction
+    _start_rebuild(kind, version)
+    return state[1] if state is not None else None
+
+def _database_matches(kind, query, limit):
+    # En attendant l'index : noms commençant par la requête, via la base
+    if kind == 'player':
+        profiles = UserProfile.objects.filter(minecraft_username_normalized__startswith=query)
+        entries = [player_entry(profile) for profile in profiles.only('user_id', 'minecraft_username')[:limit]]
+    elif kind == 'town':
+        towns = Town.objects.filter(name__istartswith=query)
+        entries = [town_entry(town) for town in towns.only(
+            'id', 'name', 'real_world_location', 'location_x', 'location_z'
+        )[:limit]]
+    else:
+        nations = Nation.objects.filter(name__istartswith=query)
+        entries = [nation_entry(nation) for nation in nations.only('id', 'name', 'real_world_country')[:limit]]
+    return [
+        (EXACT_SCORE if normalize(entry.name) == query else NAME_PREFIX_SCORE, entry)
+        for entry in entries
+    ]
+
+def search(query, kinds=SEARCH_KINDS, limit=10):
+    """
+    Recherche par préfixe et approchée sur les noms de joueurs, villes et
+    nations et leurs lieux réels. Les index sont en mémoire ; une version par
+    type, en cache, indique quand un autre processus les a rendus périmés.
+    Tant qu'un index n'est pas construit, seuls les noms commençant par la
+    requête sont cherchés, en base.
+
+    Args:
+        query (str): Texte saisi
+        kinds: Types de résultats voulus (voir SEARCH_KINDS)
+        limit (int): Nombre maximal de résultats
+
+    Returns:
+        list: Paires (score, SearchEntry), les meilleures d'abord
+    """
+    query = normalize(query)
+    if not query:
+        return []
+    versions = _get_versions(kinds)
+    results = []
+    for kind in kinds:
+        index = _get_index(kind, versions[kind])
+        if index is None:
+            results.extend(_database_matches(kind, query, limit))
+            continue
+        # Les mises à jour sur place (update_search_entry) se font sous le même verrou
+        with _lock:
+            results.extend(index.search(query, limit))
+    results.sort(key=lambda result: (-result[0], normalize(result[1].name)))
+    return results[:limit]
+
+def update_search_entry(kind, entry_id, entry=None):
+    """
+    Répercute l'enregistrement (ou la suppression, sans `entry`) d'une ligne :
+    l'index de ce processus est mis à jour sur place, et la version en cache
+    avance pour que les autres processus reconstruisent le leur.
+    """
+    state = _indexes.get(kind)
+    if state is not None and state[1].entries.get(entry_id) == entry:
+        # Les champs indexés n'ont pas changé (modification de la bio, du nombre de résidents...)
+        return
+    version = _bump_version(kind)
+    with _lock:
+        state = _indexes.get(kind)
+        if state is None:
+            return
+        if entry is None:
+            state[1].remove(entry_id)
+        else:
+            state[1].add(entry)
+        # Si une autre modification est passée entre-temps, cet index ne la contient pas :
+        # il garde son ancienne version et sera reconstruit
+        if version == state[0] + 1:
+            _indexes[kind] = (version, state[1])
+
+def invalidate_search(kind):
+    """Après des écritures en masse : tous les processus reconstruisent cet index."""
+    _bump_version(kind)
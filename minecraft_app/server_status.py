@@ -0,0 +1,141 @@
+import logging
+import re
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import TownyServer
+from .page_cache import invalidate_pages
+from .rcon import get_rcon_pool
+from . import slp
+
+logger = logging.getLogger('minecraft_app')
+
+STATUS_CACHE_KEY = 'minecraft_app:server_status'
+SERVER_CACHE_KEY = 'minecraft_app:towny_server'
+
+# "There are 3 of a max of 100 players online: ..." (vanilla)
+# "There are 3 out of maximum 100 players online." (Paper/Spigot)
+RCON_LIST_PATTERN = re.compile(r'There are (\d+)\D+?(\d+)')
+COLOR_CODE_PATTERN = re.compile(r'§.')
+
+def query_via_slp():
+    """
+    Interroge le serveur de jeu via le Server List Ping.
+
+    Returns:
+        dict: Joueurs en ligne/max, version, MOTD et latence
+    """
+    status = slp.get_status_client().status_sync(
+        settings.MINECRAFT_SERVER_HOST,
+        settings.MINECRAFT_SERVER_PORT,
+    )
+    return {
+        'player_count': status.players_online,
+        'max_players': status.players_max,
+        'version': status.version,
+        'motd': status.motd,
+        'latency_ms': status.latency_ms,
+    }
+
+def query_via_rcon():
+    """
+    Solution de repli : commande `list` via le pool RCON.
+
+    Returns:
+        dict: Joueurs en ligne/max
+    """
+    resp = COLOR_CODE_PATTERN.sub('', get_rcon_pool().command('list'))
+    match = RCON_LIST_PATTERN.search(resp)
+    if not match:
+        raise ValueError(f"Réponse inattendue à la commande list: {resp}")
+    return {
+        'player_count': int(match.group(1)),
+        'max_players': int(match.group(2)),
+    }
+
+def get_status_snapshot():
+    """Dernier état connu du serveur de jeu, tel que mis en cache par le poller."""
+    return cache.get(STATUS_CACHE_KEY)
+
+def refresh_server_status():
+    """
+    Interroge le serveur de jeu (SLP, puis RCON `list` en repli) et met le
+    résultat en cache. Ne lève pas d'exception : un serveur injoignable donne
+    un état hors ligne.
+
+    Returns:
+        dict: Nouvel état, avec la date du dernier succès (`last_success`)
+    """
+    previous = get_status_snapshot() or {}
+    now = timezone.now()
+    snapshot = {
+        'online': False,
+        'source': None,
+        'checked_at': now,
+        'last_success': previous.get('last_success'),
+    }
+
+    for source, query in (('slp', query_via_slp), ('rcon', query_via_rcon)):
+        try:
+            snapshot.update(query())
+        except Exception as e:
+            logger.warning(f"Status du serveur via {source} indisponible: {str(e)}")
+            continue
+        snapshot.update({'online': True, 'source': source, 'last_success': now})
+        break
+
+    cache.set(STATUS_CACHE_KEY, snapshot, timeout=settings.MINECRAFT_STATUS_CACHE_TIMEOUT)
+    # Les pages en cache affichent le statut et le nombre de joueurs
+    displayed = ('online', 'player_count', 'max_players')
+    if any(previous.get(field) != snapshot.get(field) for field in displayed):
+        invalidate_pages(TownyServer)
+    return snapshot
+
+def save_status_snapshot(snapshot):
+    """
+    Recopie l'état en base sur le TownyServer, pour les pages rendues quand
+    le cache est vide ou n'est pas partagé avec le poller.
+    """
+    fields = {'status': snapshot['online']}
+    if snapshot['online']:
+        fields.update({
+            'player_count': snapshot['player_count'],
+            'max_players': snapshot['max_players'],
+            'last_status_success': snapshot['last_success'],
+        })
+    else:
+        fields['player_count'] = 0
+    TownyServer.objects.filter(pk__in=TownyServer.objects.order_by('pk')[:1]).update(**fields)
+    # update() n'envoie pas post_save : invalider nous-mêmes la copie en cache
+    invalidate_server_cache()
+
+def invalidate_server_cache():
+    cache.delete(SERVER_CACHE_KEY)
+    invalidate_pages(TownyServer)
+
+def get_cached_server():
+    """
+    TownyServer tel qu'en base, gardé en cache jusqu'à sa prochaine sauvegarde.
+    Un site sans serveur configuré met aussi None en cache.
+    """
+    missing = object()
+    server = cache.get(SERVER_CACHE_KEY, missing)
+    if server is missing:
+        server = TownyServer.objects.first()
+        cache.set(SERVER_CACHE_KEY, server, timeout=settings.SERVER_CACHE_TIMEOUT)
+    return server
+
+def get_server():
+    """
+    Retourne le TownyServer à afficher, avec le statut et le nombre de joueurs
+    du dernier état mis en cache par le poller. Ne contacte jamais le serveur de
+    jeu, et n'interroge la base que si le cache est vide.
+    """
+    server = get_cached_server()
+    snapshot = get_status_snapshot()
+    if server and snapshot:
+        server.status = snapshot['online']
+        server.player_count = snapshot.get('player_count', 0) if snapshot['online'] else 0
+        server.max_players = snapshot.get('max_players', server.max_players)
+        server.last_status_success = snapshot['last_success'] or server.last_status_success
+    return server
@@ -1,39 +1,223 @@
-import requests
 import json
 import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.utils import timezone
+from .http_client import get_session
+from .models import MojangProfileCache
 
 logger = logging.getLogger(__name__)
 
-def fetch_minecraft_uuid(username):
+# Pseudos Minecraft : 3 à 16 caractères, lettres, chiffres et underscore
+MINECRAFT_USERNAME_PATTERN = re.compile(r'^[A-Za-z0-9_]{3,16}$')
+
+# Valeur stockée dans les caches pour une réponse "joueur inconnu"
+NOT_FOUND = ''
+
+# Nombre maximum de pseudos par appel à l'endpoint de résolution en lot
+MOJANG_BULK_LOOKUP_SIZE = 10
+
+class UuidLRUCache:
+    """
+    Cache LRU en mémoire, thread-safe, avec une durée de vie par entrée.
+    Premier niveau du cache name -> UUID, devant la table MojangProfileCache.
     """
-    Récupère l'UUID Minecraft d'un utilisateur à partir de son nom d'utilisateur.
-    Utilise l'API Mojang.
     
-    Args:
-        username (str): Nom d'utilisateur Minecraft
-        
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+uuid_cache = UuidLRUCache(max_size=settings.MOJANG_UUID_CACHE_SIZE)
+
+def is_valid_minecraft_username(username):
+    """
+    Indique si un pseudo peut exister chez Mojang (longueur et caractères),
+    sans appel réseau.
+    """
+    return bool(username) and bool(MINECRAFT_USERNAME_PATTERN.match(username))
+
+def _cache_ttl(uuid):
+    if uuid:
+        return settings.MOJANG_UUID_CACHE_TTL
+    return settings.MOJANG_UUID_NEGATIVE_CACHE_TTL
+
+def _remember_uuids(answers):
+    """Enregistre des réponses de Mojang dans les deux niveaux de cache : answers associe pseudo -> UUID ou NOT_FOUND."""
+    now = timezone.now()
+    entries = {}
+    for username, uuid in answers.items():
+        uuid_cache.set(username.lower(), uuid, _cache_ttl(uuid))
+        entries[username.lower()] = MojangProfileCache(
+            name_lower=username.lower(), name=username, minecraft_uuid=uuid, fetched_at=now
+        )
+    MojangProfileCache.objects.bulk_create(
+        entries.values(),
+        update_conflicts=True,
+        unique_fields=['name_lower'],
+        update_fields=['name', 'minecraft_uuid', 'fetched_at'],
+    )
+
+def _lookup_cached_uuid(username):
+    """
+    Cherche une réponse encore valide dans le cache mémoire puis en base.
+    
     Returns:
-        str: UUID de l'utilisateur (sans tirets) ou None si non trouvé
+        str: UUID, NOT_FOUND pour un joueur connu comme inexistant, ou None si rien en cache
     """
-    if not username:
+    key = username.lower()
+    uuid = uuid_cache.get(key)
+    if uuid is not None:
+        return uuid
+    
+    entry = MojangProfileCache.objects.filter(name_lower=key).first()
+    if entry is None:
         return None
-        
-    try:
-        url = f"https://api.mojang.com/users/profiles/minecraft/{username}"
-        response = requests.get(url, timeout=5)
+    age = (timezone.now() - entry.fetched_at).total_seconds()
+    ttl = _cache_ttl(entry.minecraft_uuid)
+    if age >= ttl:
+        return None
+    uuid_cache.set(key, entry.minecraft_uuid, ttl - age)
+    return entry.minecraft_uuid
+
+class TokenBucket:
+    """
+    Limiteur de débit thread-safe : `rate` jetons par seconde, au plus
+    `capacity` accumulés. acquire() bloque jusqu'à ce qu'un jeton soit libre.
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+_mojang_bucket = None
+_mojang_bucket_lock = threading.Lock()
+
+def get_mojang_bucket():
+    """
+    Limiteur partagé par le processus pour l'API Mojang : la limite est par
+    adresse IP, donc commune à tous les appels et à toutes les passes de
+    resolve_minecraft_uuids, pas renouvelée à chaque lot.
+    """
+    global _mojang_bucket
+    if _mojang_bucket is None:
+        with _mojang_bucket_lock:
+            if _mojang_bucket is None:
+                _mojang_bucket = TokenBucket(settings.MOJANG_API_RATE, settings.MOJANG_API_BURST)
+    return _mojang_bucket
+
+def _post_bulk_lookup(names, bucket, retries=3):
+    """
+    Résout jusqu'à 10 pseudos en un appel à l'endpoint POST de Mojang.
+    
+    Returns:
+        dict: pseudo demandé -> UUID ou NOT_FOUND ; vide si l'appel a échoué
+    """
+    url = f"{settings.MOJANG_API_URL}/profiles/minecraft"
+    for attempt in range(retries):
+        bucket.acquire()
+        try:
+            response = get_session().post(url, json=names)
+        except Exception as e:
+            logger.error(f"Exception lors de la résolution en lot: {str(e)}")
+            time.sleep(2 ** attempt)
+            continue
         
         if response.status_code == 200:
-            data = response.json()
-            return data.get('id')  # UUID sans tirets
-        elif response.status_code == 204 or response.status_code == 404:
-            logger.warning(f"Utilisateur Minecraft non trouvé: {username}")
-            return None
+            found = {profile['name'].lower(): profile['id'] for profile in response.json()}
+            return {name: found.get(name.lower(), NOT_FOUND) for name in names}
+        if response.status_code == 429:
+            retry_after = float(response.headers.get('Retry-After', 2 ** attempt))
+            logger.warning(f"Limite de débit Mojang atteinte, nouvel essai dans {retry_after}s")
+            time.sleep(retry_after)
+            continue
+        logger.error(f"Erreur lors de la résolution en lot: {response.status_code}")
+        return {}
+    return {}
+
+def fetch_minecraft_uuids(usernames, workers=4, bucket=None):
+    """
+    Résout une liste de pseudos via l'endpoint de Mojang qui accepte 10 noms
+    par appel. Les lots partent en parallèle sur `workers` threads, sans dépasser
+    MOJANG_API_RATE appels par seconde d'un appel à l'autre. Les réponses passent par le cache
+    mémoire (LRU) et la table MojangProfileCache, y compris les "joueur inconnu"
+    avec une durée de vie plus courte.
+    
+    Args:
+        usernames (list): Pseudos Minecraft
+        workers (int): Nombre d'appels simultanés
+        bucket (TokenBucket): Limiteur de débit ; celui du processus par défaut
+    
+    Returns:
+        dict: pseudo -> UUID (sans tirets), ou None si le joueur n'existe pas.
+              Les pseudos dont la résolution a échoué sont absents.
+    """
+    results = {}
+    to_fetch = []
+    for username in dict.fromkeys(usernames):
+        if not is_valid_minecraft_username(username):
+            results[username] = None
+            continue
+        cached = _lookup_cached_uuid(username)
+        if cached is not None:
+            results[username] = cached or None
         else:
-            logger.error(f"Erreur lors de la récupération de l'UUID: {response.status_code}")
-            return None
-    except Exception as e:
-        logger.error(f"Exception lors de la récupération de l'UUID: {str(e)}")
-        return None
+            to_fetch.append(username)
+    
+    if to_fetch:
+        bucket = bucket or get_mojang_bucket()
+        chunks = [to_fetch[i:i + MOJANG_BULK_LOOKUP_SIZE] for i in range(0, len(to_fetch), MOJANG_BULK_LOOKUP_SIZE)]
+        answers = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for chunk_answers in executor.map(lambda chunk: _post_bulk_lookup(chunk, bucket), chunks):
+                answers.update(chunk_answers)
+        if answers:
+            _remember_uuids(answers)
+        results.update({username: uuid or None for username, uuid in answers.items()})
+    
+    return results
 
 def format_uuid_with_dashes(uuid):
     """
@@ -48,4 +232,4 @@ def format_uuid_with_dashes(uuid):
     if not uuid or len(uuid) != 32:
         return uuid
         
-    return f"{uuid[0:8]}-{uuid[8:12]}-{uuid[12:16]}-{uuid[16:20]}-{uuid[20:32]}"
\ No newline at end of file
+    return f"{uuid[0:8]}-{uuid[8:12]}-{uuid[12:16]}-{uuid[16:20]}-{uuid[20:32]}"
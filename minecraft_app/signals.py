@@ -0,0 +1,165 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cart_pricing import invalidate_all_cart_summaries
+from .entitlements import refresh_entitlement
+from .leaderboard import town_deleted, town_saved, town_saving
+from .map_tiles import nation_changed, point_deleted, point_saved
+from .models import DynamicMapPoint, Nation, Rank, ServerRule, StaffMember, StoreItem, Town, TownyServer, UserProfile, UserPurchase
+from .page_cache import invalidate_pages
+from .search import nation_entry, player_entry, town_entry, update_search_entry, warm_indexes
+from .server_status import invalidate_server_cache
+from .store_catalog import invalidate_catalog
+
+
+@receiver(post_save, sender=TownyServer)
+@receiver(post_delete, sender=TownyServer)
+def clear_server_cache(sender, **kwargs):
+    invalidate_server_cache()
+
+
+@receiver(post_save, sender=ServerRule)
+@receiver(post_delete, sender=ServerRule)
+@receiver(post_save, sender=Nation)
+@receiver(post_delete, sender=Nation)
+@receiver(post_save, sender=Town)
+@receiver(post_delete, sender=Town)
+@receiver(post_save, sender=StaffMember)
+@receiver(post_delete, sender=StaffMember)
+def clear_cached_pages(sender, **kwargs):
+    invalidate_pages(sender)
+
+
+# Champs de StoreItem absents du catalogue affiché et des résumés de panier
+STORE_ITEM_STOCK_FIELDS = {'quantity'}
+
+
+@receiver(post_save, sender=Rank)
+@receiver(post_delete, sender=Rank)
+@receiver(post_save, sender=StoreItem)
+@receiver(post_delete, sender=StoreItem)
+def clear_store_catalog(sender, update_fields=None, **kwargs):
+    # Décrément du stock par le webhook Stripe : rien à invalider
+    if sender is StoreItem and update_fields and set(update_fields) <= STORE_ITEM_STOCK_FIELDS:
+        return
+    invalidate_catalog()
+    invalidate_all_cart_summaries()
+
+
+def _refresh_entitlements_on_commit(user_ids):
+    def refresh():
+        # Les comptes supprimés entre-temps n'ont plus de droits à recalculer
+        for user_id in User.objects.filter(id__in=user_ids).values_list('id', flat=True):
+            refresh_entitlement(user_id)
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=UserPurchase)
+def update_entitlement(sender, instance, **kwargs):
+    # Dans la transaction de l'achat, pour que les droits soient à jour dès le commit
+    refresh_entitlement(instance.user_id)
+
+
+@receiver(post_delete, sender=UserPurchase)
+def update_entitlement_after_delete(sender, instance, **kwargs):
+    _refresh_entitlements_on_commit([instance.user_id])
+
+
+@receiver(post_save, sender=Rank)
+@receiver(pre_delete, sender=Rank)
+def update_rank_owners_entitlements(sender, instance, **kwargs):
+    # Le prix et le nom d'un grade déterminent le grade le plus haut et la remise de ses détenteurs
+    user_ids = set(
+        UserPurchase.objects.filter(rank=instance, payment_status='completed').values_list('user_id', flat=True)
+    )
+    if user_ids:
+        _refresh_entitlements_on_commit(user_ids)
+
+
+@receiver(pre_save, sender=Town)
+def remember_nation_counters(sender, instance, raw=False, **kwargs):
+    if not raw:
+        town_saving(instance)
+
+
+@receiver(post_save, sender=Town)
+def update_nation_counters(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        town_saved(instance, created)
+
+
+@receiver(post_delete, sender=Town)
+def update_nation_counters_after_delete(sender, instance, **kwargs):
+    town_deleted(instance)
+
+
+@receiver(post_save, sender=Town)
+@receiver(post_save, sender=DynamicMapPoint)
+def invalidate_map_tile(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        point_saved(instance, created)
+
+
+@receiver(post_delete, sender=Town)
+@receiver(post_delete, sender=DynamicMapPoint)
+def invalidate_map_tile_after_delete(sender, instance, **kwargs):
+    point_deleted(instance)
+
+
+@receiver(post_save, sender=Nation)
+@receiver(pre_delete, sender=Nation)
+def invalidate_nation_map_tiles(sender, instance, raw=False, **kwargs):
+    # Avant la suppression, tant que les villes sont encore rattachées à la nation
+    if not raw:
+        nation_changed(instance)
+
+
+def _update_search_on_commit(kind, entry_id, entry=None):
+    transaction.on_commit(lambda: update_search_entry(kind, entry_id, entry))
+
+
+@receiver(post_save, sender=UserProfile)
+def update_player_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        entry = player_entry(instance) if instance.minecraft_username else None
+        _update_search_on_commit('player', instance.user_id, entry)
+
+
+@receiver(post_delete, sender=UserProfile)
+def remove_player_search(sender, instance, **kwargs):
+    _update_search_on_commit('player', instance.user_id)
+
+
+@receiver(post_save, sender=Town)
+def update_town_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _update_search_on_commit('town', instance.id, town_entry(instance))
+
+
+@receiver(post_delete, sender=Town)
+def remove_town_search(sender, instance, **kwargs):
+    _update_search_on_commit('town', instance.id)
+
+
+@receiver(post_save, sender=Nation)
+def update_nation_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _update_search_on_commit('nation', instance.id, nation_entry(instance))
+
+
+@receiver(post_delete, sender=Nation)
+def remove_nation_search(sender, instance, **kwargs):
+    _update_search_on_commit('nation', instance.id)
+
+
+@receiver(request_started)
+def warm_search_indexes(sender, **kwargs):
+    # Première requête du processus, après le fork éventuel des workers (un thread
+    # démarré dans AppConfig.ready() ne survivrait pas à gunicorn --preload)
+    request_started.disconnect(warm_search_indexes)
+    if settings.SEARCH_WARM_INDEXES:
+        warm_indexes()
@@ -0,0 +1,333 @@
+import asyncio
+import json
+import struct
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+# Réponse d'un Server List Ping
+ServerStatus = namedtuple(
+    'ServerStatus',
+    ['host', 'port', 'version', 'protocol', 'players_online', 'players_max', 'motd', 'latency_ms'],
+)
+
+
+class SlpError(Exception):
+    """Le serveur n'a pas répondu correctement au Server List Ping."""
+    pass
+
+
+def encode_varint(value):
+    """Encode un entier au format VarInt du protocole Minecraft."""
+    value &= 0xFFFFFFFF
+    out = b""
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out += bytes([byte | 0x80])
+        else:
+            return out + bytes([byte])
+
+
+def decode_varint(read):
+    """
+    Lit un VarInt à l'aide de `read(n)`, qui doit retourner exactement n octets.
+    """
+    result = 0
+    for shift in range(0, 35, 7):
+        byte = read(1)[0]
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            if result & 0x80000000:
+                result -= 1 << 32
+            return result
+    raise SlpError("VarInt trop long")
+
+
+def encode_string(value):
+    data = value.encode('utf-8')
+    return encode_varint(len(data)) + data
+
+
+def build_packet(packet_id, payload=b""):
+    body = encode_varint(packet_id) + payload
+    return encode_varint(len(body)) + body
+
+
+def build_handshake(host, port):
+    """Handshake (état suivant : status) suivi de la requête de status."""
+    payload = encode_varint(-1) + encode_string(host) + struct.pack(">H", port) + encode_varint(1)
+    return build_packet(0x00, payload) + build_packet(0x00)
+
+
+def build_ping(token):
+    return build_packet(0x01, struct.pack(">q", token))
+
+
+def split_packet(body):
+    """Sépare l'identifiant de paquet (VarInt) de son contenu."""
+    position = [0]
+
+    def read_body(n):
+        chunk = body[position[0]:position[0] + n]
+        if len(chunk) < n:
+            raise SlpError("Paquet tronqué")
+        position[0] += n
+        return chunk
+
+    packet_id = decode_varint(read_body)
+    return packet_id, body[position[0]:]
+
+
+def read_packet(read):
+    """Lit un paquet complet avec `read(n)` et retourne (identifiant, contenu)."""
+    length = decode_varint(read)
+    if length <= 0:
+        raise SlpError("Paquet vide")
+    return split_packet(read(length))
+
+
+async def read_packet_async(reader):
+    """Variante asyncio de read_packet() pour un asyncio.StreamReader."""
+    length = 0
+    for shift in range(0, 35, 7):
+        byte = (await reader.readexactly(1))[0]
+        length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+    else:
+        raise SlpError("VarInt trop long")
+    if length <= 0:
+        raise SlpError("Paquet vide")
+    return split_packet(await reader.readexactly(length))
+
+
+def parse_status_response(payload):
+    """Décode le JSON d'une réponse de status (paquet 0x00)."""
+    position = [0]
+
+    def read(n):
+        chunk = payload[position[0]:position[0] + n]
+        if len(chunk) < n:
+            raise SlpError("Réponse tronquée")
+        position[0] += n
+        return chunk
+
+    length = decode_varint(read)
+    try:
+        return json.loads(read(length).decode('utf-8'))
+    except ValueError as e:
+        raise SlpError(f"JSON de status invalide: {str(e)}")
+
+
+def flatten_motd(description):
+    """Convertit la description (texte brut ou composant JSON) en texte simple."""
+    if isinstance(description, str):
+        return description
+    if isinstance(description, dict):
+        text = description.get('text', '')
+        for extra in description.get('extra', []):
+            text += flatten_motd(extra)
+        return text
+    if isinstance(description, list):
+        return "".join(flatten_motd(part) for part in description)
+    return ""
+
+
+def make_status(host, port, data, latency_ms):
+    version = data.get('version', {})
+    players = data.get('players', {})
+    return ServerStatus(
+        host=host,
+        port=port,
+        version=version.get('name', ''),
+        protocol=version.get('protocol'),
+        players_online=int(players.get('online', 0)),
+        players_max=int(players.get('max', 0)),
+        motd=flatten_motd(data.get('description', '')),
+        latency_ms=latency_ms,
+    )
+
+
+async def _ping(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        started = time.monotonic()
+        writer.write(build_handshake(host, port))
+        await writer.drain()
+        packet_id, payload = await read_packet_async(reader)
+        if packet_id != 0x00:
+            raise SlpError(f"Paquet inattendu: {packet_id}")
+        data = parse_status_response(payload)
+        latency_ms = (time.monotonic() - started) * 1000
+
+        # Le ping/pong donne une latence plus juste ; certains serveurs ferment avant
+        try:
+            token = int(time.time() * 1000)
+            started = time.monotonic()
+            writer.write(build_ping(token))
+            await writer.drain()
+            packet_id, payload = await read_packet_async(reader)
+            if packet_id == 0x01 and struct.unpack(">q", payload[:8])[0] == token:
+                latency_ms = (time.monotonic() - started) * 1000
+        except (OSError, SlpError, struct.error, asyncio.IncompleteReadError):
+            pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+    return make_status(host, port, data, round(latency_ms, 1))
+
+
+async def async_ping(host, port=25565, timeout=3):
+    """
+    Interroge un serveur Minecraft via le protocole Server List Ping (1.7+).
+
+    Args:
+        host (str): Adresse du serveur
+        port (int): Port du serveur
+        timeout (float): Délai maximum pour l'ensemble de l'échange
+
+    Returns:
+        ServerStatus: Version, joueurs en ligne/max, MOTD et latence
+    """
+    try:
+        return await asyncio.wait_for(_ping(host, port), timeout)
+    except asyncio.IncompleteReadError:
+        raise SlpError("Connexion fermée par le serveur")
+    except asyncio.TimeoutError:
+        raise SlpError(f"Pas de réponse de {host}:{port} après {timeout}s")
+
+
+class StatusClient:
+    """
+    Client Server List Ping avec cache à durée de vie courte.
+
+    Les réponses (et les échecs) sont gardées `ttl` secondes par serveur, et
+    les demandes simultanées pour un même serveur sont regroupées en un seul
+    ping, qu'elles viennent de coroutines (status) ou de threads (status_sync).
+    """
+
+    def __init__(self, ttl=5, timeout=3):
+        self.ttl = ttl
+        self.timeout = timeout
+        self._results = {}
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def _cached(self, key):
+        entry = self._results.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry
+        return None
+
+    def _store(self, key, status, error):
+        self._results[key] = (time.monotonic() + self.ttl, status, error)
+
+    @staticmethod
+    def _unwrap(entry):
+        _, status, error = entry
+        if error is not None:
+            raise error
+        return status
+
+    async def status(self, host, port=25565):
+        """État d'un serveur, depuis le cache ou via un ping partagé."""
+        key = (host, port)
+        entry = self._cached(key)
+        if entry:
+            return self._unwrap(entry)
+
+        task = self._in_flight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self._fetch(key))
+            self._in_flight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key):
+        try:
+            status = await async_ping(key[0], key[1], self.timeout)
+        except (OSError, SlpError) as e:
+            self._store(key, None, e)
+            raise
+        else:
+            self._store(key, status, None)
+            return status
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def status_many(self, targets):
+        """
+        Interroge plusieurs serveurs en parallèle, chacun avec son propre timeout.
+
+        Args:
+            targets (list): Paires (hôte, port)
+
+        Returns:
+            dict: (hôte, port) -> ServerStatus, ou l'exception levée pour ce serveur
+        """
+        results = await asyncio.gather(
+            *(self.status(host, port) for host, port in targets), return_exceptions=True
+        )
+        return dict(zip(targets, results))
+
+    def status_sync(self, host, port=25565):
+        """
+        Point d'entrée pour le code synchrone (vues, commandes). Un seul thread
+        lance le ping quand le cache a expiré ; les autres attendent son résultat.
+        """
+        key = (host, port)
+        with self._lock:
+            entry = self._cached(key)
+            if entry:
+                return self._unwrap(entry)
+            event = self._in_flight.get(('sync',) + key)
+            leader = event is None
+            if leader:
+                event = threading.Event()
+                self._in_flight[('sync',) + key] = event
+
+        if not leader:
+            event.wait(self.timeout + 1)
+            entry = self._cached(key)
+            if entry:
+                return self._unwrap(entry)
+            raise SlpError(f"Pas de réponse de {host}:{port}")
+
+        try:
+            status = asyncio.run(async_ping(host, port, self.timeout))
+        except (OSError, SlpError) as e:
+            with self._lock:
+                self._store(key, None, e)
+            raise
+        else:
+            with self._lock:
+                self._store(key, status, None)
+            return status
+        finally:
+            with self._lock:
+                self._in_flight.pop(('sync',) + key, None)
+            event.set()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_status_client():
+    """Client SLP partagé du processus, configuré depuis les settings."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = StatusClient(
+                    ttl=settings.MINECRAFT_STATUS_CACHE_TTL,
+                    timeout=settings.MINECRAFT_STATUS_TIMEOUT,
+                )
+    return _client
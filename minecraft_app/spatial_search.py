@@ -0,0 +1,112 @@
+import heapq
+import math
+from .map_tiles import MapQueryError, get_occupied_bounds, get_tiles, point_has_type, tiles_for_bbox
+from .models import MAP_TILE_SIZE, get_map_tile
+
+
+def load_cached_tiles(tiles):
+    """Chargeur par défaut : tuiles de map_tiles.py, relues en base seulement après invalidation."""
+    return get_tiles(tiles)[0]
+
+def _ring(center, radius, bounds):
+    """
+    Tuiles à exactement `radius` tuiles (distance de Tchebychev) de la tuile
+    centrale, limitées au rectangle `bounds` des tuiles occupées.
+    """
+    cx, cz = center
+    min_x, min_z, max_x, max_z = bounds
+    tiles = []
+    first_x, last_x = max(cx - radius, min_x), min(cx + radius, max_x)
+    for tile_z in {cz - radius, cz + radius}:
+        if min_z <= tile_z <= max_z:
+            tiles.extend((tile_x, tile_z) for tile_x in range(first_x, last_x + 1))
+    first_z, last_z = max(cz - radius + 1, min_z), min(cz + radius - 1, max_z)
+    for tile_x in ({cx - radius, cx + radius} if radius else ()):
+        if min_x <= tile_x <= max_x:
+            tiles.extend((tile_x, tile_z) for tile_z in range(first_z, last_z + 1))
+    return tiles
+
+def _unexplored_distance(x, z, center, radius):
+    # Distance minimale entre (x, z) et un bloc hors du carré de tuiles déjà parcouru
+    cx, cz = center
+    return min(
+        x - (cx - radius) * MAP_TILE_SIZE,
+        (cx + radius + 1) * MAP_TILE_SIZE - x,
+        z - (cz - radius) * MAP_TILE_SIZE,
+        (cz + radius + 1) * MAP_TILE_SIZE - z,
+    )
+
+def _with_distance(point, x, z):
+    return point + [round(math.hypot(point[3] - x, point[4] - z), 1)]
+
+def nearest_points(x, z, k, types, load_tiles=load_cached_tiles, bounds=None):
+    """
+    Les k points les plus proches de (x, z). La grille est parcourue par
+    anneaux de tuiles autour de la tuile de départ, et la recherche s'arrête
+    dès qu'aucune tuile non lue ne peut contenir un point plus proche que
+    le k-ième trouvé : seules quelques tuiles sont lues, pas toute la carte.
+    Dans une zone peu peuplée, le parcours continue jusqu'à avoir lu toutes
+    les tuiles occupées ; moins de k points ne sont renvoyés que si la carte
+    n'en contient pas plus.
+
+    Args:
+        x (int): Coordonnée X du point de départ
+        z (int): Coordonnée Z du point de départ
+        k (int): Nombre de points voulus
+        types (set): Types de points à retenir (voir POINT_TYPES)
+        load_tiles: Fonction renvoyant {tuile: points} pour une liste de tuiles
+        bounds (tuple): Rectangle des tuiles occupées (get_occupied_bounds() par défaut)
+
+    Returns:
+        list: Points au format compact suivis de leur distance, du plus proche au plus lointain
+    """
+    bounds = get_occupied_bounds() if bounds is None else bounds
+    if not bounds:
+        return []
+    center = get_map_tile(x, z)
+    cx, cz = center
+    min_x, min_z, max_x, max_z = bounds
+    # Les anneaux plus petits que la distance au rectangle occupé sont vides, et au-delà
+    # de last_radius tout le rectangle a été lu
+    radius = max(0, min_x - cx, cx - max_x, min_z - cz, cz - max_z)
+    last_radius = max(cx - min_x, max_x - cx, cz - min_z, max_z - cz)
+    # Tas des k meilleurs, sur l'opposé de la distance au carré pour garder le plus lointain en tête
+    best = []
+    while radius <= last_radius:
+        ring = _ring(center, radius, bounds)
+        for points in (load_tiles(ring).values() if ring else ()):
+            for point in points:
+                if not point_has_type(point, types):
+                    continue
+                distance_sq = (point[3] - x) ** 2 + (point[4] - z) ** 2
+                entry = (-distance_sq, point[0], point)
+                if len(best) < k:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+        if len(best) == k and -best[0][0] <= _unexplored_distance(x, z, center, radius) ** 2:
+            break
+        radius += 1
+    return [_with_distance(point, x, z) for _, _, point in sorted(best, reverse=True)]
+
+def points_within(x, z, radius, types, limit, load_tiles=load_cached_tiles):
+    """
+    Points à moins de `radius` blocs de (x, z), du plus proche au plus
+    lointain, en ne lisant que les tuiles qui recoupent le cercle.
+
+    Raises:
+        MapQueryError: Si le cercle couvre plus de MAP_MAX_TILES tuiles
+    """
+    if radius < 0:
+        raise MapQueryError("Rayon négatif")
+    tiles = tiles_for_bbox(x - radius, z - radius, x + radius, z + radius)
+    radius_sq = radius ** 2
+    found = []
+    for points in load_tiles(tiles).values():
+        for point in points:
+            if not point_has_type(point, types):
+                continue
+            distance_sq = (point[3] - x) ** 2 + (point[4] - z) ** 2
+            if distance_sq <= radius_sq:
+                found.append((distance_sq, point[0], point))
+    return [_with_distance(point, x, z) for _, _, point in heapq.nsmallest(limit, found)]
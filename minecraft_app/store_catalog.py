@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.cache import cache
+from .models import Rank, StoreItem, apply_discount
+
+CATALOG_CACHE_KEY = 'minecraft_app:store_catalog:{tier}'
+
+# Seules remises possibles, voir get_player_discount()
+DISCOUNT_TIERS = (0, 5, 10, 15, 20)
+
+def build_catalog(discount_percentage):
+    """
+    Construit le catalogue de la boutique pour un palier de remise : grades
+    triés par prix avec leurs avantages déjà découpés, et objets triés par
+    catégorie puis prix avec leur prix remisé.
+
+    Returns:
+        dict: 'ranks' et 'store_items', listes d'instances annotées
+    """
+    ranks = list(Rank.objects.order_by('price'))
+    for rank in ranks:
+        rank.features_list = rank.get_features_list()
+
+    store_items = list(StoreItem.objects.order_by('category', 'price'))
+    for item in store_items:
+        item.original_price = item.price
+        if discount_percentage > 0:
+            item.discounted_price = apply_discount(item.price, discount_percentage)
+            item.discount_percentage = discount_percentage
+
+    return {'ranks': ranks, 'store_items': store_items}
+
+def get_catalog(discount_percentage):
+    """
+    Catalogue du palier de remise donné, depuis le cache. Reconstruit
+    uniquement après une modification d'un Rank ou d'un StoreItem.
+    """
+    key = CATALOG_CACHE_KEY.format(tier=discount_percentage)
+    catalog = cache.get(key)
+    if catalog is None:
+        catalog = build_catalog(discount_percentage)
+        cache.set(key, catalog, timeout=settings.STORE_CATALOG_CACHE_TIMEOUT)
+    return catalog
+
+def invalidate_catalog():
+    cache.delete_many([CATALOG_CACHE_KEY.format(tier=tier) for tier in DISCOUNT_TIERS])
+
+def get_rank_offers(ranks, highest_owned_rank):
+    """
+    Grades proposés à un joueur : tous si il n'en possède aucun, sinon
+    uniquement les grades supérieurs, au prix de la mise à niveau.
+    """
+    offers = []
+    for rank in ranks:
+        rank.original_price = rank.price
+        if highest_owned_rank is None:
+            rank.discounted_price = None
+            rank.discount_percentage = 0
+        elif rank.price > highest_owned_rank.price:
+            rank.discount_price = highest_owned_rank.price
+            rank.discounted_price = rank.price - highest_owned_rank.price
+            rank.discount_percentage = int((highest_owned_rank.price / rank.price) * 100) if rank.price > 0 else 0
+        else:
+            continue
+        offers.append(rank)
+    return offers
@@ -1,3 +1,341 @@
-from django.test import TestCase
+import asyncio
+import json
+import struct
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from . import slp
+from .models import MojangProfileCache
+from .search import NAME_PREFIX_SCORE, SearchEntry, SearchIndex
+from .services import NOT_FOUND, TokenBucket, fetch_minecraft_uuids, get_mojang_bucket, uuid_cache
+
+
+def _bytes_reader(data):
+    position = [0]
+
+    def read(n):
+        chunk = data[position[0]:position[0] + n]
+        position[0] += n
+        return chunk
+
+    return read
+
+
+class FakeMinecraftServer:
+    """
+    In-process Minecraft server speaking just enough of the Server List Ping
+    protocol: handshake, status request, status response and ping/pong.
+    """
+
+    def __init__(self, status=None, delay=0, respond=True, pong=True):
+        self.status = status or {
+            'version': {'name': 'Paper 1.20.4', 'protocol': 765},
+            'players': {'online': 12, 'max': 100},
+            'description': {'text': 'Earth ', 'extra': [{'text': 'Towny'}]},
+        }
+        self.delay = delay
+        self.respond = respond
+        self.pong = pong
+        self.connections = 0
+        self.handshakes = []
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            packet_id, payload = await slp.read_packet_async(reader)
+            read = _bytes_reader(payload)
+            protocol = slp.decode_varint(read)
+            host = read(slp.decode_varint(read)).decode('utf-8')
+            port = struct.unpack('>H', read(2))[0]
+            self.handshakes.append((packet_id, protocol, host, port, slp.decode_varint(read)))
+
+            await slp.read_packet_async(reader)  # status request
+            if not self.respond:
+                # Silent server: wait for the client to give up
+                await reader.read()
+                return
+            await asyncio.sleep(self.delay)
+            writer.write(slp.build_packet(0x00, slp.encode_string(json.dumps(self.status))))
+            await writer.drain()
+
+            if self.pong:
+                packet_id, payload = await slp.read_packet_async(reader)
+                writer.write(slp.build_packet(0x01, payload))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class ServerListPingTests(SimpleTestCase):
+    async def test_ping_parses_status(self):
+        server = await FakeMinecraftServer().start()
+        try:
+            status = await slp.async_ping('127.0.0.1', server.port, timeout=2)
+        finally:
+            await server.close()
+
+        self.assertEqual(server.handshakes, [(0x00, -1, '127.0.0.1', server.port, 1)])
+        self.assertEqual(status.host, '127.0.0.1')
+        self.assertEqual(status.port, server.port)
+        self.assertEqual(status.version, 'Paper 1.20.4')
+        self.assertEqual(status.protocol, 765)
+        self.assertEqual((status.players_online, status.players_max), (12, 100))
+        self.assertEqual(status.motd, 'Earth Towny')
+        self.assertGreaterEqual(status.latency_ms, 0)
+
+    async def test_ping_without_pong(self):
+        # Some servers close the connection right after the status response
+        server = await FakeMinecraftServer(status={'description': 'Plain MOTD'}, pong=False).start()
+        try:
+            status = await slp.async_ping('127.0.0.1', server.port, timeout=2)
+        finally:
+            await server.close()
+
+        self.assertEqual(status.motd, 'Plain MOTD')
+        self.assertEqual((status.players_online, status.players_max), (0, 0))
+
+    async def test_silent_server_times_out(self):
+        server = await FakeMinecraftServer(respond=False).start()
+        started = time.monotonic()
+        try:
+            with self.assertRaises(slp.SlpError):
+                await slp.async_ping('127.0.0.1', server.port, timeout=0.2)
+        finally:
+            await server.close()
+        self.assertLess(time.monotonic() - started, 1)
+
+    async def test_refused_connection(self):
+        server = await FakeMinecraftServer().start()
+        port = server.port
+        await server.close()
+        with self.assertRaises(OSError):
+            await slp.async_ping('127.0.0.1', port, timeout=1)
+
+    def test_varint_round_trip(self):
+        for value in (0, 1, 127, 128, 255, 25565, 2 ** 31 - 1, -1, -2 ** 31):
+            self.assertEqual(slp.decode_varint(_bytes_reader(slp.encode_varint(value))), value)
+
+
+class StatusClientTests(SimpleTestCase):
+    async def test_concurrent_requests_share_one_ping(self):
+        server = await FakeMinecraftServer(delay=0.1).start()
+        client = slp.StatusClient(ttl=5, timeout=2)
+        try:
+            results = await asyncio.gather(*(client.status('127.0.0.1', server.port) for _ in range(5)))
+            # Served from the cache afterwards
+            again = await client.status('127.0.0.1', server.port)
+        finally:
+            await server.close()
+
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(again, results[0])
+
+    async def test_failures_are_cached(self):
+        server = await FakeMinecraftServer(respond=False).start()
+        client = slp.StatusClient(ttl=5, timeout=0.2)
+        try:
+            with self.assertRaises(slp.SlpError):
+                await client.status('127.0.0.1', server.port)
+            with self.assertRaises(slp.SlpError):
+                await client.status('127.0.0.1', server.port)
+        finally:
+            await server.close()
+        self.assertEqual(server.connections, 1)
+
+    async def test_status_many_reports_each_server(self):
+        up = await FakeMinecraftServer().start()
+        down = await FakeMinecraftServer(respond=False).start()
+        client = slp.StatusClient(ttl=5, timeout=0.3)
+        try:
+            results = await client.status_many([('127.0.0.1', up.port), ('127.0.0.1', down.port)])
+        finally:
+            await up.close()
+            await down.close()
+
+        self.assertEqual(results[('127.0.0.1', up.port)].players_online, 12)
+        self.assertIsInstance(results[('127.0.0.1', down.port)], slp.SlpError)
+
+    def test_threads_share_one_ping(self):
+        # The server runs on its own event loop, as status_sync() starts one per call
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        server = asyncio.run_coroutine_threadsafe(FakeMinecraftServer(delay=0.2).start(), loop).result()
+        client = slp.StatusClient(ttl=5, timeout=2)
+        results, errors = [], []
+
+        def query():
+            try:
+                results.append(client.status_sync('127.0.0.1', server.port))
+            except Exception as e:
+                errors.append(e)
+
+        try:
+            threads = [threading.Thread(target=query) for _ in range(5)]
+            for worker in threads:
+                worker.start()
+            for worker in threads:
+                worker.join()
+        finally:
+            asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 5)
+        self.assertEqual(server.connections, 1)
+
+
+class FakeMojangServer:
+    """
+    Local stand-in for POST /profiles/minecraft: answers the known names
+    among those posted, after replaying any queued (status, headers) errors.
+    """
+
+    def __init__(self, known):
+        self.known = known
+        self.requests = []
+        self.errors = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                names = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                fake.requests.append((time.monotonic(), names))
+                if fake.errors:
+                    status, headers = fake.errors.pop(0)
+                    self.send_response(status)
+                    for header, value in headers.items():
+                        self.send_header(header, value)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = json.dumps([
+                    {'id': fake.known[name.lower()], 'name': name}
+                    for name in names if name.lower() in fake.known
+                ]).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class BulkUuidLookupTests(TestCase):
+    def setUp(self):
+        uuid_cache.clear()
+        self.known = {f"player{i}": f"{i:032x}" for i in range(25)}
+        self.mojang = FakeMojangServer(self.known)
+        self.addCleanup(self.mojang.close)
+        overrides = override_settings(MOJANG_API_URL=self.mojang.url)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        # A generous limiter of its own, so the tests don't wait on the process-wide one
+        self.fetch = partial(fetch_minecraft_uuids, bucket=TokenBucket(1000, 100))
+
+    def test_names_are_posted_in_chunks_of_ten(self):
+        names = list(self.known) + ['player0', 'not a name!']
+        results = self.fetch(names)
+
+        posted = [names for _, names in self.mojang.requests]
+        self.assertEqual(sorted(len(chunk) for chunk in posted), [5, 10, 10])
+        # Duplicates and impossible names never reach Mojang
+        self.assertEqual(sorted(name for chunk in posted for name in chunk), sorted(self.known))
+        self.assertIsNone(results['not a name!'])
+        self.assertEqual({name: results[name] for name in self.known}, self.known)
+        self.assertEqual(MojangProfileCache.objects.count(), 25)
+
+    def test_rate_limit_waits_for_retry_after(self):
+        self.mojang.errors.append((429, {'Retry-After': '0.3'}))
+        results = self.fetch(['player1', 'player2'])
+
+        self.assertEqual(results, {'player1': self.known['player1'], 'player2': self.known['player2']})
+        (limited_at, _), (retried_at, retried_names) = self.mojang.requests
+        self.assertGreaterEqual(retried_at - limited_at, 0.3)
+        self.assertEqual(retried_names, ['player1', 'player2'])
+
+    def test_server_errors_are_not_cached(self):
+        self.mojang.errors.append((500, {}))
+        self.assertEqual(self.fetch(['player1']), {})
+        self.assertFalse(MojangProfileCache.objects.exists())
+
+        self.assertEqual(self.fetch(['player1']), {'player1': self.known['player1']})
+        self.assertEqual(len(self.mojang.requests), 2)
+
+    def test_unknown_players_are_cached(self):
+        self.assertEqual(self.fetch(['ghost_player', 'player3']), {
+            'ghost_player': None, 'player3': self.known['player3'],
+        })
+        self.assertEqual(MojangProfileCache.objects.get(name_lower='ghost_player').minecraft_uuid, NOT_FOUND)
+
+        # Memory cache, then the table once the memory cache is gone
+        self.assertEqual(self.fetch(['ghost_player']), {'ghost_player': None})
+        uuid_cache.clear()
+        self.assertEqual(self.fetch(['Ghost_Player', 'player3']), {
+            'Ghost_Player': None, 'player3': self.known['player3'],
+        })
+        self.assertEqual(len(self.mojang.requests), 1)
+
+    @override_settings(MOJANG_UUID_NEGATIVE_CACHE_TTL=0)
+    def test_expired_unknown_players_are_looked_up_again(self):
+        self.fetch(['ghost_player'])
+        self.known['ghost_player'] = 'f' * 32
+        self.assertEqual(self.fetch(['ghost_player']), {'ghost_player': 'f' * 32})
+        self.assertEqual(len(self.mojang.requests), 2)
+
+    def test_rate_limit_spans_calls(self):
+        # One chunk per call: the burst is spent once, not renewed by every call
+        fetch = partial(fetch_minecraft_uuids, bucket=TokenBucket(rate=10, capacity=2))
+        started = time.monotonic()
+        for i in range(5):
+            fetch([f"player{i}"])
+        self.assertEqual(len(self.mojang.requests), 5)
+        self.assertGreaterEqual(time.monotonic() - started, 0.25)
+
+    def test_default_limiter_is_shared(self):
+        self.assertIs(get_mojang_bucket(), get_mojang_bucket())
+
+
+class SearchIndexTests(SimpleTestCase):
+    def test_word_matches_do_not_crowd_out_name_matches(self):
+        # Many places mention "paris" before the towns named after it in key order
+        entries = [SearchEntry('town', i, f"Town {i}", 'Paris', 0, 0) for i in range(1, 200)]
+        entries += [SearchEntry('town', 1000 + i, f"Paris {i}", '', 0, 0) for i in range(3)]
+        index = SearchIndex(entries)
+        index.add(SearchEntry('town', 2000, 'Parisville', '', 0, 0))
+
+        results = sorted(index.search('paris', limit=5), key=lambda result: -result[0])
+        names = {entry.name for score, entry in results if score == NAME_PREFIX_SCORE}
+        self.assertEqual(names, {'Paris 0', 'Paris 1', 'Paris 2', 'Parisville'})
+        self.assertEqual(len(results), 5)
+
+        index.remove(2000)
+        self.assertNotIn(2000, {entry.id for _, entry in index.search('parisville', limit=5)})
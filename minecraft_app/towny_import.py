@@ -0,0 +1,314 @@
+import csv
+import json
+import math
+import os
+from collections import Counter, namedtuple
+from datetime import date, datetime, timezone
+from django.db import transaction
+from .leaderboard import refresh_nation_counters
+from .map_tiles import invalidate_all_tiles
+from .models import DynamicMapPoint, Nation, Town, get_map_tile
+from .page_cache import invalidate_pages
+from .search import invalidate_search
+
+# Taille d'un townblock Towny en blocs (homeBlock est exprimé en townblocks)
+TOWNBLOCK_SIZE = 16
+
+# Champs que l'import peut renseigner ; les autres (drapeau, description modifiée à la main...)
+# ne sont touchés que si l'export les fournit
+IMPORT_FIELDS = {
+    'nation': ['name', 'leader', 'capital', 'founded_date', 'description', 'flag_image', 'real_world_country'],
+    'town': ['name', 'mayor', 'nation', 'founded_date', 'description', 'residents_count',
+             'location_x', 'location_z', 'real_world_location'],
+    'map_point': ['name', 'point_type', 'location_x', 'location_z', 'description'],
+}
+INTEGER_FIELDS = {'residents_count', 'location_x', 'location_z'}
+# Champs sans valeur par défaut, obligatoires pour créer une ligne
+REQUIRED_FIELDS = {
+    'nation': [],
+    'town': ['location_x', 'location_z'],
+    'map_point': ['point_type', 'location_x', 'location_z'],
+}
+
+# Bilan d'import d'un type de données
+ImportCounts = namedtuple('ImportCounts', ['created', 'updated', 'deleted', 'unchanged'])
+
+
+class TownyImportError(ValueError):
+    """Export illisible ou ligne invalide."""
+    pass
+
+
+def _registered_date(value):
+    # Towny enregistre les dates de création en millisecondes depuis l'epoch
+    return datetime.fromtimestamp(int(value) / 1000, tz=timezone.utc).date()
+
+def _coerce(kind, record, source):
+    """Ne garde que les champs importables d'un enregistrement et les convertit."""
+    data = {}
+    for field in IMPORT_FIELDS[kind]:
+        if field not in record:
+            continue
+        value = record[field]
+        try:
+            if field in INTEGER_FIELDS:
+                # Les positions Towny sont des flottants : le bloc est la partie entière inférieure
+                value = math.floor(float(value))
+            elif field == 'founded_date' and not isinstance(value, date):
+                value = date.fromisoformat(str(value))
+            elif field == 'nation':
+                value = value or None
+            elif value is None:
+                value = ''
+        except (TypeError, ValueError):
+            raise TownyImportError(f"{source}: valeur invalide pour {field} : {value!r}")
+        data[field] = value
+    if not data.get('name'):
+        raise TownyImportError(f"{source}: nom manquant")
+    return data
+
+def _read_properties(path):
+    properties = {}
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            properties[key.strip()] = value.strip()
+    return properties
+
+def _flatfile_files(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.txt'))
+
+def read_flatfile(path):
+    """
+    Lit un dossier de données Towny en stockage « flatfile » (plugins/Towny/data),
+    un fichier à la fois : villes d'abord, puis nations, dont le chef est le
+    maire de la capitale.
+
+    Yields:
+        tuple: (type, champs) pour chaque ville et nation
+    """
+    data_dir = path if os.path.isdir(os.path.join(path, 'towns')) else os.path.join(path, 'data')
+    if not os.path.isdir(os.path.join(data_dir, 'towns')):
+        raise TownyImportError(f"{path}: dossier towns/ introuvable")
+
+    # Les versions récentes de Towny rattachent les résidents à leur ville dans residents/
+    residents = Counter()
+    for resident_file in _flatfile_files(os.path.join(data_dir, 'residents')):
+        town = _read_properties(resident_file).get('town')
+        if town:
+            residents[town] += 1
+
+    mayors = {}
+    for town_file in _flatfile_files(os.path.join(data_dir, 'towns')):
+        properties = _read_properties(town_file)
+        name = properties.get('name') or os.path.basename(town_file)[:-len('.txt')]
+        record = {'name': name, 'mayor': properties.get('mayor', ''), 'nation': properties.get('nation', '')}
+        if 'townBoard' in properties:
+            record['description'] = properties['townBoard']
+        if 'residents' in properties:
+            record['residents_count'] = len([r for r in properties['residents'].split(',') if r])
+        elif residents:
+            record['residents_count'] = residents[name]
+        try:
+            if properties.get('registered'):
+                record['founded_date'] = _registered_date(properties['registered'])
+            # spawn=monde,x,y,z,pitch,yaw en blocs ; à défaut homeBlock=monde,x,z en townblocks
+            if properties.get('spawn'):
+                parts = properties['spawn'].split(',')
+                record['location_x'], record['location_z'] = float(parts[1]), float(parts[3])
+            elif properties.get('homeBlock'):
+                parts = properties['homeBlock'].split(',')
+                record['location_x'], record['location_z'] = int(parts[1]) * TOWNBLOCK_SIZE, int(parts[2]) * TOWNBLOCK_SIZE
+        except (IndexError, ValueError):
+            raise TownyImportError(f"{town_file}: date ou position invalide")
+        mayors[name] = record['mayor']
+        yield 'town', _coerce('town', record, town_file)
+
+    for nation_file in _flatfile_files(os.path.join(data_dir, 'nations')):
+        properties = _read_properties(nation_file)
+        name = properties.get('name') or os.path.basename(nation_file)[:-len('.txt')]
+        capital = properties.get('capital', '')
+        record = {'name': name, 'capital': capital, 'leader': properties.get('king') or mayors.get(capital, '')}
+        if properties.get('registered'):
+            try:
+                record['founded_date'] = _registered_date(properties['registered'])
+            except ValueError:
+                raise TownyImportError(f"{nation_file}: date invalide")
+        if 'nationBoard' in properties:
+            record['description'] = properties['nationBoard']
+        yield 'nation', _coerce('nation', record, nation_file)
+
+def read_csv_dump(path):
+    """
+    Lit un dossier contenant nations.csv, towns.csv et/ou map_points.csv,
+    dont les colonnes portent le nom des champs (une ville référence sa
+    nation par son nom). Seules les colonnes présentes sont importées.
+
+    Yields:
+        tuple: (type, champs) pour chaque ligne
+    """
+    found = False
+    for kind, filename in (('nation', 'nations.csv'), ('town', 'towns.csv'), ('map_point', 'map_points.csv')):
+        file_path = os.path.join(path, filename)
+        if not os.path.exists(file_path):
+            continue
+        found = True
+        with open(file_path, newline='', encoding='utf-8') as f:
+            for line_number, row in enumerate(csv.DictReader(f), start=2):
+                yield kind, _coerce(kind, row, f"{filename}:{line_number}")
+    if not found:
+        raise TownyImportError(f"{path}: aucun fichier nations.csv, towns.csv ou map_points.csv")
+
+def read_json_lines(path):
+    """
+    Lit un export JSON Lines : un objet par ligne, avec `type` valant
+    'nation', 'town' ou 'map_point' et les champs à importer.
+
+    Yields:
+        tuple: (type, champs) pour chaque ligne
+    """
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            source = f"{os.path.basename(path)}:{line_number}"
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise TownyImportError(f"{source}: JSON invalide")
+            kind = record.get('type') if isinstance(record, dict) else None
+            if kind not in IMPORT_FIELDS:
+                raise TownyImportError(f"{source}: type inconnu {kind!r}")
+            yield kind, _coerce(kind, record, source)
+
+def read_dump(path):
+    """Choisit le lecteur selon la forme de l'export (dossier flatfile, dossier CSV, fichier JSON Lines)."""
+    if os.path.isfile(path):
+        return read_json_lines(path)
+    if os.path.isdir(os.path.join(path, 'towns')) or os.path.isdir(os.path.join(path, 'data', 'towns')):
+        return read_flatfile(path)
+    if os.path.isdir(path):
+        return read_csv_dump(path)
+    raise TownyImportError(f"{path}: export introuvable")
+
+
+def _record_key(kind, data):
+    return (data.get('point_type'), data['name']) if kind == 'map_point' else data['name']
+
+def _row_key(kind, row):
+    return (row['point_type'], row['name']) if kind == 'map_point' else row['name']
+
+def _sync(kind, model, incoming, batch_size, delete_missing):
+    """
+    Aligne une table sur les enregistrements importés : création des
+    nouveaux, mise à jour des seuls champs modifiés, suppression des absents.
+    Les lignes identiques ne sont pas réécrites.
+    """
+    columns = ['nation_id' if field == 'nation' else field for field in IMPORT_FIELDS[kind]]
+    has_tile = model in (Town, DynamicMapPoint)
+    existing, duplicates = {}, []
+    for row in model.objects.values('id', *columns).iterator(chunk_size=batch_size):
+        key = _row_key(kind, row)
+        if key in existing:
+            # Towny impose des noms uniques : les doublons saisis à la main sont traités comme absents
+            duplicates.append(row['id'])
+        else:
+            existing[key] = row
+
+    creates, updates, changed_fields, unchanged = [], [], set(), 0
+    for key, data in incoming.items():
+        values = {('nation_id' if field == 'nation' else field): value for field, value in data.items()}
+        row = existing.pop(key, None)
+        if row is None:
+            missing = [field for field in REQUIRED_FIELDS[kind] if field not in data]
+            if missing:
+                raise TownyImportError(f"{kind} {data['name']} : champs manquants pour la création : {', '.join(missing)}")
+            instance = model(**values)
+            if model in (Nation, Town) and instance.founded_date is None:
+                # Sans date d'enregistrement dans l'export, la ville ou la nation date de son import
+                instance.founded_date = date.today()
+            if has_tile:
+                instance.tile_x, instance.tile_z = get_map_tile(instance.location_x, instance.location_z)
+            creates.append(instance)
+            continue
+
+        changes = {column: value for column, value in values.items() if row[column] != value}
+        if not changes:
+            unchanged += 1
+            continue
+        instance = model(**row)
+        for column, value in changes.items():
+            setattr(instance, column, value)
+        if has_tile and {'location_x', 'location_z'} & changes.keys():
+            instance.tile_x, instance.tile_z = get_map_tile(instance.location_x, instance.location_z)
+            changes.update(tile_x=instance.tile_x, tile_z=instance.tile_z)
+        changed_fields |= changes.keys()
+        updates.append(instance)
+
+    model.objects.bulk_create(creates, batch_size=batch_size)
+    if updates:
+        model.objects.bulk_update(updates, sorted(changed_fields), batch_size=batch_size)
+
+    stale = duplicates + [row['id'] for row in existing.values()] if delete_missing else []
+    for start in range(0, len(stale), batch_size):
+        model.objects.filter(id__in=stale[start:start + batch_size]).delete()
+
+    return ImportCounts(len(creates), len(updates), len(stale), unchanged)
+
+def import_towny(records, delete_missing=True, batch_size=1000, dry_run=False):
+    """
+    Importe un export Towny en une seule transaction, par lots de
+    bulk_create/bulk_update. Seuls les types présents dans l'export sont
+    synchronisés : un export sans points de carte ne touche pas à ceux-ci.
+
+    Les écritures en masse n'envoient pas de signaux : les compteurs de
+    nation sont recalculés et les caches (tuiles, pages) invalidés ici.
+
+    Args:
+        records: Itérable de (type, champs), voir read_dump()
+        delete_missing (bool): Supprimer les lignes absentes de l'export
+        batch_size (int): Taille des lots d'écriture
+        dry_run (bool): Calculer le bilan puis tout annuler
+
+    Returns:
+        dict: ImportCounts par type présent dans l'export
+
+    Raises:
+        TownyImportError: Si l'export contient une ligne invalide
+    """
+    incoming = {kind: {} for kind in IMPORT_FIELDS}
+    for kind, data in records:
+        incoming[kind][_record_key(kind, data)] = data
+
+    results = {}
+    with transaction.atomic():
+        if incoming['nation']:
+            results['nation'] = _sync('nation', Nation, incoming['nation'], batch_size, delete_missing)
+        if incoming['town']:
+            nation_ids = dict(Nation.objects.values_list('name', 'id'))
+            for data in incoming['town'].values():
+                if 'nation' in data:
+                    data['nation'] = nation_ids.get(data['nation'])
+            results['town'] = _sync('town', Town, incoming['town'], batch_size, delete_missing)
+        if incoming['map_point']:
+            results['map_point'] = _sync('map_point', DynamicMapPoint, incoming['map_point'], batch_size, delete_missing)
+
+        if any(counts.created or counts.updated or counts.deleted for counts in results.values()):
+            refresh_nation_counters()
+
+            def clear_caches():
+                invalidate_all_tiles()
+                invalidate_pages(Nation)
+                invalidate_pages(Town)
+                for kind in ('nation', 'town'):
+                    invalidate_search(kind)
+            transaction.on_commit(clear_caches)
+
+        if dry_run:
+            transaction.set_rollback(True)
+    return results
@@ -1,6 +1,6 @@
 # Dans urls.py, ajouter la nouvelle URL pour store_nok
 
-from django.urls import path
+from django.urls import path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from . import views
@@ -8,6 +8,8 @@ from . import views
 urlpatterns = [
     path('', views.home, name='home'),
     path('map/', views.map_view, name='dynmap'),
+    path('nations/', views.nations, name='nations'),
+    path('nations/<int:nation_id>/', views.nation_detail, name='nation_detail'),
     path('staff/', views.staff, name='staff'),
     path('store/', views.store, name='store'),
     path('store/require_access/', views.store_nok, name='store_nok'),  # AJOUTER CETTE LIGNE
@@ -31,4 +33,17 @@ urlpatterns = [
     path('check-minecraft-username/', views.check_minecraft_username, name='check_minecraft_username'),
     path('store/gift/<int:rank_id>/', views.gift_rank, name='gift_rank'),
     path('verify-minecraft-username/', views.verify_minecraft_username, name='verify_minecraft_username'),
+    path('api/server-status/', views.server_status_api, name='server_status_api'),
+    path('api/nations/', views.nations_api, name='nations_api'),
+    path('api/nations/<int:nation_id>/towns/', views.nation_towns_api, name='nation_towns_api'),
+    path('api/towns/', views.towns_api, name='towns_api'),
+    path('api/map-points/', views.map_points_api, name='map_points_api'),
+    path('api/map/points/', views.map_viewport_api, name='map_viewport_api'),
+    path('api/map/nearby/', views.map_nearby_api, name='map_nearby_api'),
+    path('api/search/', views.search_api, name='search_api'),
+    # Les coordonnées de tuile peuvent être négatives, ce que <int:> n'accepte pas
+    re_path(r'^api/map/tiles/(?P<tile_x>-?\d+)/(?P<tile_z>-?\d+)/$', views.map_tile_api, name='map_tile_api'),
+    path('api/outbound-http-stats/', views.outbound_http_stats, name='outbound_http_stats'),
+    path('api/page-cache-stats/', views.page_cache_stats_api, name='page_cache_stats'),
+    path('avatar/<path:identifier>/<int:size>/', views.avatar, name='avatar'),
 ]
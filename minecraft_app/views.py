@@ -1,7 +1,7 @@
 from django.shortcuts import render, get_object_or_404
-from .models import TownyServer, Nation, Town, StaffMember, Rank, ServerRule, DynamicMapPoint, UserProfile, UserPurchase, StoreItemPurchase, StoreItem, CartItem, WebhookError, get_player_discount
-from django.db.models import Count, Sum, F
-from django.db import transaction
+from .models import Nation, Town, StaffMember, Rank, ServerRule, DynamicMapPoint, UserProfile, UserPurchase, StoreItemPurchase, StoreItem, CartItem, WebhookError, ContactMessage, get_player_discount, find_profile_by_minecraft_username, normalize_minecraft_username
+from django.db.models import Sum, F
+from django.db import IntegrityError, transaction
 from django.core.exceptions import ObjectDoesNotExist
 from django.urls import reverse
 from django.http import HttpResponse, JsonResponse
@@ -13,28 +13,40 @@ from django.contrib import messages
 from django import forms
 from django.conf import settings
 from django.shortcuts import redirect, render
-from .services import fetch_minecraft_uuid, format_uuid_with_dashes
+from .services import format_uuid_with_dashes
 from django.views.decorators.csrf import csrf_exempt
-from .minecraft_service import apply_rank_to_player
-import requests
-import json
+from .minecraft_service import enqueue_rank_delivery
+from .server_status import get_server, get_status_snapshot
+from .http_client import configure_stripe, host_stats
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils.http import quote_etag
+from .avatars import get_avatar, get_fallback_avatar, normalize_identifier
+from .page_cache import cache_anonymous_page, page_cache_stats
+from .store_catalog import get_catalog, get_rank_offers
+from .entitlements import get_entitlement, owns_rank
+from .leaderboard import get_nation_leaderboard
+from .pagination import InvalidCursor, get_page_size, keyset_page
+from .spatial_search import nearest_points, points_within
+from .projection import lonlat_to_block
+from .search import SEARCH_KINDS, search
+from .map_tiles import COMPACT_FIELDS, MapQueryError, get_tiles, parse_bbox, parse_types, select_points, tile_bounds, tiles_etag, tiles_for_bbox, to_geojson
+from .cart_pricing import adjust_cart_summary, get_cart_summary, invalidate_cart_summary, price_cart, remember_cart_summary
 import logging
 import stripe
-from decimal import Decimal
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
+configure_stripe()
 logger = logging.getLogger(__name__)
 
+@cache_anonymous_page(Nation, Town)
 def home(request):
-    server = TownyServer.objects.first()
     nations_count = Nation.objects.count()
     towns_count = Town.objects.count()
     
     # Get the top 3 nations for the home page display
-    top_nations = Nation.objects.annotate(towns_count=Count('towns')).order_by('-towns_count')[:3]
+    top_nations = get_nation_leaderboard(3)
     
     context = {
-        'server': server,
         'nations_count': nations_count,
         'towns_count': towns_count,
         'nations': top_nations,  # Add nations for the home page
@@ -42,13 +54,15 @@ def home(request):
     
     return render(request, 'minecraft_app/home.html', context)
 
+@cache_anonymous_page(Nation, Town)
 def nations(request):
     # Get only the top 3 nations by number of towns
-    nations_list = Nation.objects.annotate(towns_count=Count('towns')).order_by('-towns_count')[:3]
+    nations_list = get_nation_leaderboard(3)
     
-    # Calculate additional statistics for the nations page
-    total_towns = Town.objects.count()
-    total_residents = Town.objects.aggregate(total=Sum('residents_count'))['total'] or 0
+    # Calculate additional statistics for the nations page from the maintained nation counters
+    totals = Nation.objects.aggregate(towns=Sum('towns_count'), residents=Sum('residents_total'))
+    total_towns = totals['towns'] or 0
+    total_residents = totals['residents'] or 0
     
     context = {
         'nations': nations_list,
@@ -58,17 +72,154 @@ def nations(request):
     
     return render(request, 'minecraft_app/nations.html', context)
 
+# Keyset orderings for the listings below; each is backed by a composite index
+NATION_TOWNS_ORDERING = ['-residents_count', 'id']
+LISTING_ORDERING = ['id']
+
+def serialize_town(town):
+    return {
+        'id': town.id,
+        'name': town.name,
+        'mayor': town.mayor,
+        'nation_id': town.nation_id,
+        'residents_count': town.residents_count,
+        'x': town.location_x,
+        'z': town.location_z,
+    }
+
+def serialize_map_point(point):
+    return {
+        'id': point.id,
+        'name': point.name,
+        'type': point.point_type,
+        'x': point.location_x,
+        'z': point.location_z,
+    }
+
+def serialize_nation(nation):
+    return {
+        'id': nation.id,
+        'name': nation.name,
+        'capital': nation.capital,
+        'leader': nation.leader,
+        'towns_count': nation.towns_count,
+        'residents_total': nation.residents_total,
+    }
+
+def paginated_json(request, queryset, ordering, serializer):
+    """JSON page of a keyset-paginated listing, for infinite scroll (?after=<next>&limit=)"""
+    try:
+        page = keyset_page(queryset, ordering, request.GET.get('after'), get_page_size(request))
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({
+        'results': [serializer(item) for item in page.items],
+        'next': page.next_cursor,
+    })
+
+@cache_anonymous_page(Nation, Town)
 def nation_detail(request, nation_id):
     nation = get_object_or_404(Nation, id=nation_id)
-    towns = Town.objects.filter(nation=nation).order_by('-residents_count')
+    try:
+        page = keyset_page(nation.towns.all(), NATION_TOWNS_ORDERING, request.GET.get('after'), get_page_size(request))
+    except InvalidCursor:
+        return redirect('nation_detail', nation_id=nation.id)
     
     context = {
         'nation': nation,
-        'towns': towns,
+        'towns': page.items,
+        'next_cursor': page.next_cursor,
     }
     
     return render(request, 'minecraft_app/nation_detail.html', context)
 
+def nation_towns_api(request, nation_id):
+    nation = get_object_or_404(Nation, id=nation_id)
+    return paginated_json(request, nation.towns.all(), NATION_TOWNS_ORDERING, serialize_town)
+
+def towns_api(request):
+    return paginated_json(request, Town.objects.all(), LISTING_ORDERING, serialize_town)
+
+def nations_api(request):
+    return paginated_json(request, Nation.objects.all(), LISTING_ORDERING, serialize_nation)
+
+def map_points_api(request):
+    map_points = DynamicMapPoint.objects.all()
+    point_type = request.GET.get('type')
+    if point_type:
+        map_points = map_points.filter(point_type=point_type)
+    return paginated_json(request, map_points, LISTING_ORDERING, serialize_map_point)
+
+def map_tiles_response(request, tiles, bbox=None):
+    """Points of the given grid tiles, filtered by ?types= and rendered as compact JSON or GeoJSON"""
+    try:
+        types = parse_types(request.GET.get('types'))
+    except MapQueryError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    output = 'geojson' if request.GET.get('format') == 'geojson' else 'compact'
+    # GeoJSON in real-world [lon, lat] instead of blocks, for standard web map libraries
+    lonlat = output == 'geojson' and request.GET.get('coords') == 'lonlat'
+    
+    contents, versions = get_tiles(tiles)
+    etag = quote_etag(tiles_etag(versions, output, lonlat, ','.join(sorted(types)), bbox))
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponse(status=304)
+    else:
+        points = select_points(contents, types, bbox)
+        if output == 'geojson':
+            response = JsonResponse(to_geojson(points, lonlat))
+        else:
+            response = JsonResponse({'fields': COMPACT_FIELDS, 'points': points})
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.MAP_TILE_BROWSER_MAX_AGE}'
+    return response
+
+def map_viewport_api(request):
+    """Points inside the viewport (?bbox=min_x,min_z,max_x,max_z in blocks)"""
+    try:
+        bbox = parse_bbox(request.GET.get('bbox'))
+        tiles = tiles_for_bbox(*bbox)
+    except MapQueryError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return map_tiles_response(request, tiles, bbox)
+
+def map_tile_api(request, tile_x, tile_z):
+    """All points of one grid tile, so a panning map only fetches the tiles it has not seen yet"""
+    tile_x, tile_z = int(tile_x), int(tile_z)
+    response = map_tiles_response(request, [(tile_x, tile_z)])
+    if response.status_code == 200:
+        response['X-Tile-Bounds'] = ','.join(str(value) for value in tile_bounds(tile_x, tile_z))
+    return response
+
+def map_nearby_api(request):
+    """
+    Nearest points to ?x=&z=, to ?town=<id> or to a real place ?lat=&lon=
+    ("find my city"): the ?limit= closest, or all within ?radius= blocks,
+    closest first
+    """
+    try:
+        if request.GET.get('town'):
+            town = get_object_or_404(Town, id=int(request.GET['town']))
+            x, z = town.location_x, town.location_z
+        elif request.GET.get('lat') or request.GET.get('lon'):
+            x, z = lonlat_to_block(float(request.GET['lon']), float(request.GET['lat']))
+        else:
+            x, z = int(request.GET['x']), int(request.GET['z'])
+        limit = max(1, min(int(request.GET.get('limit', 10)), settings.MAP_SEARCH_MAX_RESULTS))
+        radius = int(request.GET['radius']) if request.GET.get('radius') else None
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'x and z (or town, or lat and lon), limit and radius must be valid numbers'}, status=400)
+    
+    try:
+        types = parse_types(request.GET.get('types'))
+        if radius is not None:
+            points = points_within(x, z, radius, types, limit)
+        else:
+            points = nearest_points(x, z, limit, types)
+    except MapQueryError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'center': [x, z], 'fields': COMPACT_FIELDS + ['distance'], 'points': points})
+
 def dynmap(request):
     map_points = DynamicMapPoint.objects.all()
     towns = Town.objects.all()
@@ -82,6 +233,7 @@ def dynmap(request):
     
     return render(request, 'minecraft_app/dynmap.html', context)
 
+@cache_anonymous_page(ServerRule)
 def rules(request):
     rules_list = ServerRule.objects.all()
     
@@ -91,18 +243,11 @@ def rules(request):
     
     return render(request, 'minecraft_app/rules.html', context)
 
+@cache_anonymous_page()
 def map_view(request):
-    server = TownyServer.objects.first()
-    
-    context = {
-        'server': server,
-    }
-    
-    return render(request, 'minecraft_app/map.html', context)
+    return render(request, 'minecraft_app/map.html')
 
 def contact(request):
-    server = TownyServer.objects.first()
-    
     if request.method == 'POST':
         # Get form data
         name = request.POST.get('name', '')
@@ -116,22 +261,18 @@ def contact(request):
         
         # Validate required fields
         if name and subject and message:
-            # Log webhook URL from settings
-            webhook_url = settings.DISCORD_WEBHOOK_URL
-            logging.debug(f"Using webhook URL: {webhook_url}")
-            
-            if not webhook_url or webhook_url == '':
-                logging.error("Discord webhook URL is empty or not set")
-                messages.error(request, "Server configuration error: Discord webhook not configured.")
-                return redirect('contact')
-                
-            # Send the message to Discord webhook
-            success = send_discord_webhook(name, discord_username, minecraft_username, subject, message)
-            
-            if success:
-                messages.success(request, "Your message has been sent successfully. We'll get back to you as soon as possible.")
-            else:
-                messages.error(request, "There was an error sending your message. Please try again later or contact us on Discord.")
+            if not settings.DISCORD_WEBHOOK_URL:
+                logging.warning("Discord webhook URL is empty or not set, contact message kept in the database")
+
+            # Persist the message; the send_contact_messages worker posts it to Discord
+            ContactMessage.objects.create(
+                name=name,
+                discord_username=discord_username,
+                minecraft_username=minecraft_username,
+                subject=subject,
+                message=message,
+            )
+            messages.success(request, "Your message has been sent successfully. We'll get back to you as soon as possible.")
             
             # Redirect to avoid form resubmission
             return redirect('contact')
@@ -139,15 +280,69 @@ def contact(request):
             # If required fields are missing
             messages.error(request, "Please fill in all required fields.")
     
-    context = {
-        'server': server,
-    }
+    return render(request, 'minecraft_app/contact.html')
+
+def server_status_api(request):
+    """Live server status as last cached by the poll_server_status command"""
+    snapshot = get_status_snapshot()
+    if snapshot is None:
+        # Poller not running (or cache not shared): fall back to the last DB write
+        server = get_server()
+        if server is None:
+            return JsonResponse({'error': 'No server configured'}, status=404)
+        snapshot = {
+            'online': server.status,
+            'player_count': server.player_count,
+            'max_players': server.max_players,
+            'last_success': server.last_status_success,
+        }
     
-    return render(request, 'minecraft_app/contact.html', context)
+    last_success = snapshot.get('last_success')
+    return JsonResponse({
+        'online': snapshot['online'],
+        'player_count': snapshot.get('player_count', 0) if snapshot['online'] else 0,
+        'max_players': snapshot.get('max_players'),
+        'version': snapshot.get('version'),
+        'motd': snapshot.get('motd'),
+        'latency_ms': snapshot.get('latency_ms'),
+        'last_success': last_success.isoformat() if last_success else None,
+    })
+
+@staff_member_required
+def outbound_http_stats(request):
+    """Per-host latency and error counters for outbound HTTP calls made by this process"""
+    return JsonResponse({'hosts': host_stats.snapshot()})
+
+@staff_member_required
+def page_cache_stats_api(request):
+    """Anonymous page cache hits/misses per view for this process"""
+    return JsonResponse({'views': page_cache_stats.snapshot()})
+
+def avatar(request, identifier, size):
+    """Player head served from the local disk cache (see avatars.py)"""
+    if not settings.AVATAR_MIN_SIZE <= size <= settings.AVATAR_MAX_SIZE:
+        return HttpResponse(status=404)
+    
+    # Names that can't exist on Mojang get the default head, like mc-heads.net does
+    key = normalize_identifier(identifier)
+    data, etag, is_fallback = get_avatar(key, size) if key else get_fallback_avatar(size)
+    etag = quote_etag(etag)
+    
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(data, content_type='image/png')
+    response['ETag'] = etag
+    # Keep the fallback short-lived so the real head replaces it once upstream is back
+    max_age = settings.AVATAR_FALLBACK_MAX_AGE if is_fallback else settings.AVATAR_BROWSER_MAX_AGE
+    response['Cache-Control'] = f'public, max-age={max_age}'
+    return response
 
+@cache_anonymous_page()
 def faq(request):
     return render(request, 'minecraft_app/faq.html')
 
+@cache_anonymous_page(StaffMember)
 def staff(request):
     # Check if staff members exist, if not create default administrators
     if StaffMember.objects.count() == 0:
@@ -227,26 +422,25 @@ def register_view(request):
     if request.method == 'POST':
         form = RegisterForm(request.POST)
         if form.is_valid():
-            user = form.save()
             minecraft_username = form.cleaned_data.get('minecraft_username')
-            
-            # Create user profile
-            profile = UserProfile.objects.create(
-                user=user,
-                minecraft_username=minecraft_username
-            )
-            
-            # If a Minecraft username is provided, try to retrieve the UUID
-            if minecraft_username:
-                uuid = fetch_minecraft_uuid(minecraft_username)
-                if uuid:
-                    profile.minecraft_uuid = uuid
-                    profile.save()
-                
-            # Log in the user
-            login(request, user)
-            messages.success(request, "Account created successfully! Welcome to Novania!")
-            return redirect('home')
+            try:
+                with transaction.atomic():
+                    user = form.save()
+                    
+                    # Create user profile; the UUID stays pending until the
+                    # resolve_minecraft_uuids worker picks it up
+                    UserProfile.objects.create(
+                        user=user,
+                        minecraft_username=minecraft_username
+                    )
+            except IntegrityError:
+                # Claimed by a concurrent registration since clean_minecraft_username() ran
+                form.add_error('minecraft_username', "This Minecraft username is already taken by another user.")
+            else:
+                # Log in the user
+                login(request, user)
+                messages.success(request, "Account created successfully! Welcome to Novania!")
+                return redirect('home')
     else:
         form = RegisterForm()
     
@@ -291,9 +485,6 @@ def profile_view(request):
     # Get user purchases for display
     purchases = UserPurchase.objects.filter(user=user).select_related('rank')
     
-    # Get the server for global context
-    server = TownyServer.objects.first()
-    
     if request.method == 'POST':
         # Profile update form
         minecraft_username = request.POST.get('minecraft_username')
@@ -301,7 +492,7 @@ def profile_view(request):
         bio = request.POST.get('bio')
         
         # Vérifier si le pseudo Minecraft est unique avant de mettre à jour
-        if minecraft_username and minecraft_username != profile.minecraft_username:
+        if minecraft_username and normalize_minecraft_username(minecraft_username) != profile.minecraft_username_normalized:
             if not is_minecraft_username_unique(minecraft_username, user):
                 messages.error(request, "This Minecraft username is already taken by another user.")
                 return redirect('profile')
@@ -313,27 +504,25 @@ def profile_view(request):
         profile.discord_username = discord_username
         profile.bio = bio
         
-        # If Minecraft username changed, update UUID
+        # If Minecraft username changed, mark the UUID as pending:
+        # the resolve_minecraft_uuids worker fetches it from Mojang
         if minecraft_username != old_minecraft_username:
-            if minecraft_username:
-                uuid = fetch_minecraft_uuid(minecraft_username)
-                if uuid:
-                    profile.minecraft_uuid = uuid
-                else:
-                    # If UUID can't be retrieved, clear the old one
-                    profile.minecraft_uuid = ''
-            else:
-                # If username is empty, clear UUID
-                profile.minecraft_uuid = ''
+            profile.minecraft_uuid = ''
+            profile.minecraft_uuid_checked_at = None
         
-        profile.save()
+        try:
+            with transaction.atomic():
+                profile.save()
+        except IntegrityError:
+            # Claimed by another player between the check above and the save
+            messages.error(request, "This Minecraft username is already taken by another user.")
+            return redirect('profile')
         
         messages.success(request, "Profile updated successfully!")
         return redirect('profile')
     
     context = {
         'profile': profile,
-        'server': server,
         'purchases': purchases
     }
         
@@ -365,9 +554,11 @@ def gift_rank(request, rank_id):
             messages.error(request, "Please enter a Minecraft username.")
             return redirect('gift_rank', rank_id=rank_id)
         
-        # Check if the user exists with this Minecraft username
-        try:
-            recipient_profile = UserProfile.objects.get(minecraft_username=minecraft_username)
+        # Check if the user exists with this Minecraft username (case-insensitive)
+        recipient_profile = find_profile_by_minecraft_username(minecraft_username)
+        if recipient_profile is not None:
+            # Use the name as registered, not as typed
+            minecraft_username = recipient_profile.minecraft_username
             
             # Check if recipient is the same as buyer
             if recipient_profile.user == request.user:
@@ -375,13 +566,7 @@ def gift_rank(request, rank_id):
                 return redirect('gift_rank', rank_id=rank_id)
             
             # Check if recipient already has this rank
-            existing_purchase = UserPurchase.objects.filter(
-                user=recipient_profile.user,
-                rank=rank,
-                payment_status='completed'
-            ).exists()
-            
-            if existing_purchase:
+            if owns_rank(recipient_profile.user, rank):
                 messages.error(request, f"Player {minecraft_username} already has the {rank.name} rank.")
                 return redirect('gift_rank', rank_id=rank_id)
             
@@ -420,13 +605,14 @@ def gift_rank(request, rank_id):
                 messages.error(request, f"Error creating payment: {str(e)}")
                 return redirect('gift_rank', rank_id=rank_id)
                 
-        except UserProfile.DoesNotExist:
-            messages.error(request, f"No player found with Minecraft username '{minecraft_username}'. Make sure they have registered on our website first.")
+        else:
+            suggestions = suggest_minecraft_usernames(minecraft_username)
+            hint = f" Did you mean {', '.join(suggestions)}?" if suggestions else ""
+            messages.error(request, f"No player found with Minecraft username '{minecraft_username}'.{hint} Make sure they have registered on our website first.")
             return redirect('gift_rank', rank_id=rank_id)
     
     context = {
         'rank': rank,
-        'server': TownyServer.objects.first(),
     }
     
     return render(request, 'minecraft_app/gift_rank.html', context)
@@ -436,18 +622,53 @@ def verify_minecraft_username(request):
     """AJAX endpoint to verify Minecraft username exists in database"""
     minecraft_username = request.GET.get('username', '')
     
-    try:
-        profile = UserProfile.objects.get(minecraft_username=minecraft_username)
+    profile = find_profile_by_minecraft_username(minecraft_username)
+    if profile is not None:
         return JsonResponse({
             'exists': True,
-            'username': minecraft_username,
+            'username': profile.minecraft_username,
             'is_self': profile.user == request.user
         })
-    except UserProfile.DoesNotExist:
-        return JsonResponse({
-            'exists': False,
-            'message': 'No player found with this Minecraft username'
-        })
+    
+    # Close matches for typos; player names are only listed to signed-in users
+    suggestions = suggest_minecraft_usernames(minecraft_username) if request.user.is_authenticated else []
+    return JsonResponse({
+        'exists': False,
+        'message': 'No player found with this Minecraft username',
+        'suggestions': suggestions,
+    })
+
+def suggest_minecraft_usernames(username, limit=5):
+    return [entry.name for _, entry in search(username, ['player'], limit)]
+
+def serialize_search_result(score, entry):
+    result = {'type': entry.kind, 'name': entry.name, 'detail': entry.detail, 'score': round(score, 2)}
+    if entry.kind == 'player':
+        result['avatar'] = reverse('avatar', args=[entry.name, 32])
+    elif entry.kind == 'town':
+        result.update(id=entry.id, x=entry.x, z=entry.z)
+    else:
+        result.update(id=entry.id, url=reverse('nation_detail', args=[entry.id]))
+    return result
+
+def search_api(request):
+    """
+    Autocomplete over player, town and nation names and real-world locations
+    (?q=&types=player,town,nation&limit=); players are only listed to signed-in users
+    """
+    query = request.GET.get('q', '')
+    types = [kind for kind in request.GET.get('types', ','.join(SEARCH_KINDS)).split(',') if kind]
+    if set(types) - set(SEARCH_KINDS):
+        return JsonResponse({'error': f"types must be among {', '.join(SEARCH_KINDS)}"}, status=400)
+    if not request.user.is_authenticated:
+        types = [kind for kind in types if kind != 'player']
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), settings.SEARCH_MAX_RESULTS))
+    except ValueError:
+        limit = 10
+    
+    results = search(query, types, limit) if types else []
+    return JsonResponse({'results': [serialize_search_result(score, entry) for score, entry in results]})
 
 @login_required
 def checkout(request, rank_id):
@@ -455,20 +676,7 @@ def checkout(request, rank_id):
     user = request.user
     
     # Check if the user already has a rank and apply discount if necessary
-    highest_owned_rank = None
-    user_purchases = UserPurchase.objects.filter(
-        user=user,
-        payment_status='completed'
-    ).select_related('rank')
-    
-    if user_purchases.exists():
-        try:
-            highest_owned_rank = max(
-                [purchase.rank for purchase in user_purchases if purchase.rank],
-                key=lambda rank: rank.price
-            )
-        except (ValueError, TypeError):
-            highest_owned_rank = None
+    highest_owned_rank = get_entitlement(user).highest_rank
     
     # Apply discount if user has a rank and is buying a higher rank
     actual_price = rank.price
@@ -534,13 +742,10 @@ def payment_success(request):
                 'rank_purchases': rank_purchases,
                 'store_item_purchases': store_item_purchases,
                 'total_amount': total_amount,
-                'server': TownyServer.objects.first()
             })
     
     # Fallback if purchase not found (can happen if webhook hasn't processed yet)
-    return render(request, 'minecraft_app/payment_success.html', {
-        'server': TownyServer.objects.first()
-    })
+    return render(request, 'minecraft_app/payment_success.html')
 
 @csrf_exempt
 def stripe_webhook(request):
@@ -591,24 +796,20 @@ def process_successful_payment(session):
             recipient = User.objects.get(id=recipient_user_id)
             rank = Rank.objects.get(id=rank_id)
             
-            # Create purchase record for recipient
-            purchase = UserPurchase.objects.create(
-                user=recipient,
-                rank=rank,
-                amount=rank.price,
-                payment_id=session.id,
-                payment_status='completed',
-                is_gift=True,
-                gifted_by=buyer
-            )
-            
-            # Apply rank to recipient
-            success = apply_rank_to_player(recipient_minecraft_username, rank.name)
-            
-            if success:
-                logger.info(f"Gift rank {rank.name} successfully applied to {recipient_minecraft_username}")
-            else:
-                logger.error(f"Failed to apply gift rank {rank.name} to {recipient_minecraft_username}")
+            with transaction.atomic():
+                # Create purchase record for recipient
+                purchase = UserPurchase.objects.create(
+                    user=recipient,
+                    rank=rank,
+                    amount=rank.price,
+                    payment_id=session.id,
+                    payment_status='completed',
+                    is_gift=True,
+                    gifted_by=buyer
+                )
+                
+                # Queue the rank for the recipient; deliver_ranks sends it over RCON
+                enqueue_rank_delivery(recipient, recipient_minecraft_username, rank.name, purchase=purchase)
             
         except Exception as e:
             logger.error(f"Error processing gift payment: {str(e)}")
@@ -622,6 +823,8 @@ def process_successful_payment(session):
                 user = User.objects.get(id=user_id)
                 logger.info("Found user: %s", user.username)
                 with transaction.atomic():
+                    # The purchased lines leave the cart: drop its cached count/total once committed
+                    transaction.on_commit(lambda: invalidate_cart_summary(user.id))
                     for item_id in cart_items_ids:
                         if not item_id:
                             logger.debug("Skipping empty item_id")
@@ -645,15 +848,8 @@ def process_successful_payment(session):
                                 )
                                 logger.info("Created UserPurchase %s for rank %s (user: %s)", 
                                             purchase.id, cart_item.rank.name, user.username)
-                                minecraft_username = user.profile.minecraft_username
-                                if minecraft_username:
-                                    success = apply_rank_to_player(minecraft_username, cart_item.rank.name)
-                                    logger.info("Rank %s application for %s: %s", 
-                                                cart_item.rank.name, minecraft_username, 
-                                                "Success" if success else "Failed")
-                                else:
-                                    logger.warning("No Minecraft username for user %s, rank %s not applied", 
-                                                   user.username, cart_item.rank.name)
+                                enqueue_rank_delivery(user, user.profile.minecraft_username, 
+                                                      cart_item.rank.name, purchase=purchase)
                                 cart_item.delete()
                                 logger.debug("Deleted cart item %s", item_id)
                             elif cart_item.store_item:
@@ -670,7 +866,8 @@ def process_successful_payment(session):
                                 if cart_item.store_item.quantity > 0:
                                     cart_item.store_item.quantity -= cart_item.quantity
                                     cart_item.store_item.quantity = max(0, cart_item.store_item.quantity)
-                                    cart_item.store_item.save()
+                                    # Stock only: leaves the cached store catalog alone (see signals.py)
+                                    cart_item.store_item.save(update_fields=['quantity'])
                                 cart_item.delete()
                             else:
                                 logger.warning("Cart item %s has no rank or store item", item_id)
@@ -715,23 +912,16 @@ def process_successful_payment(session):
                     user = User.objects.get(id=user_id)
                     rank = Rank.objects.get(id=rank_id)
                     
-                    purchase = UserPurchase.objects.create(
-                        user=user,
-                        rank=rank,
-                        amount=rank.price,
-                        payment_id=session.id,
-                        payment_status='completed'
-                    )
-                    
-                    minecraft_username = user.profile.minecraft_username
-                    if minecraft_username:
-                        success = apply_rank_to_player(minecraft_username, rank.name)
-                        if success:
-                            logger.info(f"Rank {rank.name} successfully applied to {minecraft_username}")
-                        else:
-                            logger.error(f"Failed to apply rank {rank.name} to {minecraft_username}")
-                    else:
-                        logger.warning(f"User {user.username} doesn't have a Minecraft username set; rank not applied")
+                    with transaction.atomic():
+                        purchase = UserPurchase.objects.create(
+                            user=user,
+                            rank=rank,
+                            amount=rank.price,
+                            payment_id=session.id,
+                            payment_status='completed'
+                        )
+                        
+                        enqueue_rank_delivery(user, user.profile.minecraft_username, rank.name, purchase=purchase)
                     
                 except Exception as e:
                     logger.error(f"Error processing single rank payment: {str(e)}")
@@ -783,151 +973,47 @@ def payment_failed(request):
     return render(request, 'minecraft_app/payment_failed.html')
 
 
-def send_discord_webhook(name, discord_username, minecraft_username, subject, message):
-    webhook_url = settings.DISCORD_WEBHOOK_URL
-    
-    # Debug log
-    logging.debug(f"Sending to Discord webhook: {webhook_url}")
-    
-    data = {
-        "embeds": [{
-            "title": f"New Contact Message: {subject}",
-            "description": message,
-            "color": 3447003,  # Discord blue
-            "fields": [
-                {"name": "From", "value": name, "inline": True},
-                {"name": "Discord", "value": discord_username or "Not provided", "inline": True},
-                {"name": "Minecraft", "value": minecraft_username or "Not provided", "inline": True}
-            ],
-            "footer": {"text": "Message sent from the website contact form"}
-        }]
-    }
-    
-    # Debug log of data being sent
-    logging.debug(f"Webhook data: {json.dumps(data)}")
-    
-    try:
-        response = requests.post(webhook_url, json=data)
-        
-        # Debug log of response
-        logging.debug(f"Discord webhook response: Status {response.status_code}, Content: {response.text}")
-        
-        return response.status_code == 204 or response.status_code == 200
-    except Exception as e:
-        logging.error(f"Error sending to Discord webhook: {str(e)}")
-        return False
-
-
 def store(request):
     # Check if user is authenticated
     if not request.user.is_authenticated:
         return redirect('store_nok')
     
-    # Get all ranks ordered by price
-    all_ranks = Rank.objects.all().order_by('price')
-    store_items = StoreItem.objects.all().order_by('category', 'price')
-    
-    # Get user's purchased ranks
-    user_purchased_ranks = UserPurchase.objects.filter(
-        user=request.user,
-        payment_status='completed'
-    ).select_related('rank')
+    # Highest owned rank and discount tier from the user's entitlement record
+    entitlement = get_entitlement(request.user)
+    highest_owned_rank = entitlement.highest_rank
     
-    # Get the highest rank the user owns (based on price)
-    highest_owned_rank = None
-    if user_purchased_ranks.exists():
-        try:
-            highest_owned_rank = max(
-                [purchase.rank for purchase in user_purchased_ranks if purchase.rank],
-                key=lambda rank: rank.price
-            )
-        except Exception as e:
-            print(f"Error determining highest rank: {str(e)}")
-    
-    # Filter ranks to show and apply discounts if user has a rank
-    available_ranks = []
-    if highest_owned_rank:
-        # Show only ranks that are more expensive than the highest owned rank
-        higher_ranks = all_ranks.filter(price__gt=highest_owned_rank.price)
-        
-        # Apply discounts to higher ranks
-        for rank in higher_ranks:
-            # Create a copy of the rank object to avoid modifying the original
-            rank_copy = rank
-            
-            # Set discount attributes
-            rank_copy.original_price = rank.price
-            rank_copy.discount_price = highest_owned_rank.price
-            rank_copy.discounted_price = rank.price - highest_owned_rank.price
-            
-            # Calculate discount percentage
-            if rank.price > 0:
-                rank_copy.discount_percentage = int((highest_owned_rank.price / rank.price) * 100)
-            else:
-                rank_copy.discount_percentage = 0
-                
-            available_ranks.append(rank_copy)
-            
-        show_new_ranks_notice = not available_ranks
-    else:
-        # User hasn't purchased any ranks, show all ranks with no discount
-        for rank in all_ranks:
-            rank_copy = rank
-            rank_copy.original_price = rank.price
-            # Set discounted_price to None to indicate no discount
-            rank_copy.discounted_price = None
-            rank_copy.discount_percentage = 0
-            available_ranks.append(rank_copy)
-        show_new_ranks_notice = False
+    # Priced catalog for the user's discount tier, cached until a Rank or StoreItem changes
+    discount_percentage = entitlement.discount_percentage
+    catalog = get_catalog(discount_percentage)
+    store_items = catalog['store_items']
     
-    # Get cart data
-    cart_count = 0
-    cart_total = 0
+    # Show only ranks above the highest owned rank, at the upgrade price
+    available_ranks = get_rank_offers(catalog['ranks'], highest_owned_rank)
+    show_new_ranks_notice = bool(highest_owned_rank) and not available_ranks
     
-    cart_items = CartItem.objects.filter(user=request.user)
-    cart_count = cart_items.count()
-    
-    # Calculate cart total
-    for item in cart_items:
-        cart_total += item.get_subtotal()
-    
-    # Calculate discount for the user based on rank for store items
-    discount_percentage = get_player_discount(request.user)
-    
-    # Apply discount to store items if applicable
-    for item in store_items:
-        item.original_price = item.price
-        if discount_percentage > 0:
-            # Store the original price and calculate the discounted price
-            discount_factor = Decimal(1 - discount_percentage / 100)
-            item.discounted_price = round(item.price * discount_factor, 2)
-            item.discount_percentage = discount_percentage
+    # Get cart data (cached count/total, no cart scan)
+    cart = get_cart_summary(request.user)
     
     context = {
         'ranks': available_ranks,
         'store_items': store_items,
-        'cart_count': cart_count,
-        'cart_total': cart_total,
+        'cart_count': cart.count,
+        'cart_total': cart.total,
         'show_new_ranks_notice': show_new_ranks_notice,
-        'user_has_any_rank': user_purchased_ranks.exists(),
+        'user_has_any_rank': bool(entitlement.owned_rank_ids),
         'highest_owned_rank': highest_owned_rank,
         'discount_percentage': discount_percentage,
     }
     
     return render(request, 'minecraft_app/store.html', context)
 
+@cache_anonymous_page()
 def store_nok(request):
     # If user is already authenticated, redirect to the actual store
     if request.user.is_authenticated:
         return redirect('store')
     
-    server = TownyServer.objects.first()
-    
-    context = {
-        'server': server,
-    }
-    
-    return render(request, 'minecraft_app/store_nok.html', context)
+    return render(request, 'minecraft_app/store_nok.html')
 # Modifié le fichier views.py pour supporter AJAX dans la fonction add_to_cart
 
 @login_required
@@ -961,25 +1047,7 @@ def add_to_cart(request):
                 rank = Rank.objects.get(id=item_id)
                 
                 # Check if user already has a rank and calculate discount
-                highest_owned_rank = None
-                user_purchases = UserPurchase.objects.filter(
-                    user=request.user,
-                    payment_status='completed'
-                ).select_related('rank')
-                
-                # DEBUGGING: Log user purchases
-                logger.debug(f"User {request.user.username} adding rank {rank.name} to cart. Existing purchases: {[p.rank.name if p.rank else 'None' for p in user_purchases]}")
-                
-                if user_purchases.exists():
-                    try:
-                        highest_owned_rank = max(
-                            [purchase.rank for purchase in user_purchases if purchase.rank],
-                            key=lambda r: r.price
-                        )
-                        # DEBUGGING: Log highest owned rank
-                        logger.debug(f"Highest owned rank for cart: {highest_owned_rank.name}, price: {highest_owned_rank.price}")
-                    except (ValueError, TypeError) as e:
-                        logger.error(f"Error determining highest rank for cart: {str(e)}")
+                highest_owned_rank = get_entitlement(request.user).highest_rank
                 
                 # Create cart item with the right price info
                 cart_item, created = CartItem.objects.get_or_create(
@@ -1011,6 +1079,7 @@ def add_to_cart(request):
                     else:
                         messages.warning(request, error_msg)
                         return redirect('cart')
+                count_delta, total_delta = 1, cart_item.get_subtotal()
                 logger.debug("Added rank %s to cart", item_id)
                 
             elif item_type == 'store_item':
@@ -1023,12 +1092,17 @@ def add_to_cart(request):
                     defaults={'quantity': quantity}
                 )
                 
-                if not created:
+                discount_percentage = get_player_discount(request.user)
+                if created:
+                    count_delta, total_delta = 1, cart_item.get_subtotal(discount_percentage)
+                else:
                     # If the item already exists, update the quantity
+                    previous_subtotal = cart_item.get_subtotal(discount_percentage)
                     cart_item.quantity += quantity
                     if cart_item.quantity > max_available:
                         cart_item.quantity = max_available
                     cart_item.save()
+                    count_delta, total_delta = 0, cart_item.get_subtotal(discount_percentage) - previous_subtotal
                 
                 logger.debug("Added store item %s to cart with quantity %d", item_id, quantity)
                 
@@ -1040,10 +1114,8 @@ def add_to_cart(request):
                     messages.error(request, error_msg)
                     return redirect('store')
 
-            # Calculate cart totals
-            cart_items = CartItem.objects.filter(user=request.user)
-            cart_count = cart_items.count()
-            cart_total = sum(item.get_subtotal() for item in cart_items)
+            # Update the cached cart totals with this line only
+            cart = adjust_cart_summary(request.user, count_delta, total_delta)
 
             success_msg = "Item added to cart successfully."
             if is_ajax:
@@ -1051,8 +1123,8 @@ def add_to_cart(request):
                     'success': True,
                     'message': success_msg,
                     'status': 'success',
-                    'cart_count': cart_count,
-                    'cart_total': f"{cart_total:.2f}",
+                    'cart_count': cart.count,
+                    'cart_total': f"{cart.total:.2f}",
                     'current_quantity': cart_item.quantity
                 })
             else:
@@ -1078,16 +1150,12 @@ def add_to_cart(request):
 # View cart page
 @login_required
 def view_cart(request):
-    cart_items = CartItem.objects.filter(user=request.user)
-    
-    total = 0
-    for item in cart_items:
-        total += item.get_subtotal()
+    cart = price_cart(request.user)
+    remember_cart_summary(request.user, cart)
     
     context = {
-        'cart_items': cart_items,
-        'total': total,
-        'server': TownyServer.objects.first(),
+        'cart_items': cart.items,
+        'total': cart.total,
     }
     
     return render(request, 'minecraft_app/cart.html', context)
@@ -1096,9 +1164,11 @@ def view_cart(request):
 @login_required
 def remove_from_cart(request, item_id):
     try:
-        cart_item = CartItem.objects.get(id=item_id, user=request.user)
+        cart_item = CartItem.objects.select_related('rank', 'store_item').get(id=item_id, user=request.user)
         item_name = cart_item.rank.name if cart_item.rank else cart_item.store_item.name
+        subtotal = cart_item.get_subtotal(get_player_discount(request.user))
         cart_item.delete()
+        adjust_cart_summary(request.user, -1, -subtotal)
         messages.success(request, f"'{item_name}' has been removed from your cart.")
     except CartItem.DoesNotExist:
         messages.error(request, "Item not found in your cart.")
@@ -1115,7 +1185,7 @@ def update_cart_quantity(request):
         is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
         
         try:
-            cart_item = CartItem.objects.get(id=item_id, user=request.user)
+            cart_item = CartItem.objects.select_related('rank', 'store_item').get(id=item_id, user=request.user)
             logger.debug("DEBUG: Before update: Item %s, quantity=%s, store_item=%s, rank=%s", item_id, cart_item.quantity, cart_item.store_item, cart_item.rank)
             
             # Only store items can have quantities (not ranks)
@@ -1137,6 +1207,8 @@ def update_cart_quantity(request):
                         messages.warning(request, f"Quantity adjusted to maximum available ({max_available}).")
                 
                 # Update the quantity
+                discount_percentage = get_player_discount(request.user)
+                previous_subtotal = cart_item.get_subtotal(discount_percentage)
                 logger.debug("DEBUG: Setting quantity to: %s", quantity)
                 cart_item.quantity = quantity
                 logger.debug("DEBUG: Quantity after set: %s", cart_item.quantity)
@@ -1148,14 +1220,15 @@ def update_cart_quantity(request):
                 cart_item.refresh_from_db()
                 logger.debug("DEBUG: After refresh: Item %s, DB quantity=%s", item_id, cart_item.quantity)
                 
+                item_subtotal = cart_item.get_subtotal(discount_percentage)
+                cart = adjust_cart_summary(request.user, 0, item_subtotal - previous_subtotal)
+                
                 if is_ajax:
-                    item_subtotal = cart_item.get_subtotal()
-                    cart_total = sum(item.get_subtotal() for item in CartItem.objects.filter(user=request.user))
-                    logger.debug("DEBUG: Subtotal=%s, Total=%s", item_subtotal, cart_total)
+                    logger.debug("DEBUG: Subtotal=%s, Total=%s", item_subtotal, cart.total)
                     return JsonResponse({
                         'success': True,
                         'item_subtotal': f"{item_subtotal:.2f}",
-                        'cart_total': f"{cart_total:.2f}",
+                        'cart_total': f"{cart.total:.2f}",
                         'current_quantity': cart_item.quantity
                     })
             else:
@@ -1189,20 +1262,18 @@ def update_cart_quantity(request):
 # Checkout from cart
 @login_required
 def checkout_cart(request):
-    cart_items = CartItem.objects.filter(user=request.user)
+    cart = price_cart(request.user)
+    cart_items = cart.items
     
-    if not cart_items.exists():
+    if not cart_items:
         messages.error(request, "Your cart is empty.")
         return redirect('cart')
     
     # Calculate total
-    total_amount = 0
+    total_amount = cart.total
     items_description = []
     
     for item in cart_items:
-        subtotal = item.get_subtotal()
-        total_amount += subtotal
-        
         if item.rank:
             items_description.append(f"Rank: {item.rank.name}")
         elif item.store_item:
@@ -1248,7 +1319,8 @@ def is_minecraft_username_unique(username, current_user=None):
     if not username:
         return True
     
-    existing_profiles = UserProfile.objects.filter(minecraft_username=username)
+    # Through the unique index on the lowercased name: 'Steve' is taken if 'steve' is
+    existing_profiles = UserProfile.objects.filter(minecraft_username_normalized=normalize_minecraft_username(username))
     if current_user:
         existing_profiles = existing_profiles.exclude(user=current_user)
     
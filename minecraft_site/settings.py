@@ -47,16 +47,74 @@ LOGGING = {
     },
 }
 
+# Cache : mémoire locale par défaut (propre à chaque processus). Pour le partager
+# entre le site et les workers, utiliser par exemple
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache et CACHE_LOCATION=redis://redis:6379/1
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'minecraft-site'),
+        'TIMEOUT': int(os.getenv('CACHE_TIMEOUT', '300')),
+        'KEY_PREFIX': 'minecraft_site',
     }
 }
 
+# Durée de vie du TownyServer mis en cache pour le context processor. Invalidé à chaque
+# sauvegarde ; l'expiration borne le retard sur les statuts écrits en base par le poller
+SERVER_CACHE_TIMEOUT = int(os.getenv('SERVER_CACHE_TIMEOUT', '300'))
+
+# Cache des pages publiques pour les visiteurs anonymes (page_cache.py). Invalidé par les
+# signaux ; l'expiration couvre les changements de statut vus par un poller qui ne partage pas le cache
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '60'))
+
+# Catalogue de la boutique par palier de remise (store_catalog.py), invalidé à chaque
+# modification d'un Rank ou d'un StoreItem ; l'expiration n'est qu'un filet de sécurité
+STORE_CATALOG_CACHE_TIMEOUT = int(os.getenv('STORE_CATALOG_CACHE_TIMEOUT', '86400'))
+
+# Droits par joueur (entitlements.py), vidés au commit de chaque achat
+ENTITLEMENT_CACHE_TIMEOUT = int(os.getenv('ENTITLEMENT_CACHE_TIMEOUT', '3600'))
+
+# Nombre d'articles et total du panier par joueur (cart_pricing.py), mis à jour à chaque ajout/retrait
+CART_SUMMARY_CACHE_TIMEOUT = int(os.getenv('CART_SUMMARY_CACHE_TIMEOUT', '3600'))
+
+# Pagination par clé des listes de villes, nations et points de carte (pagination.py)
+LISTING_PAGE_SIZE = int(os.getenv('LISTING_PAGE_SIZE', '50'))
+LISTING_MAX_PAGE_SIZE = int(os.getenv('LISTING_MAX_PAGE_SIZE', '500'))
+
+# Index de la carte par tuiles de 1024 blocs (map_tiles.py) : chaque tuile est mise en cache
+# et invalidée par les signaux ; une requête bbox est limitée à MAP_MAX_TILES tuiles
+MAP_TILE_CACHE_TIMEOUT = int(os.getenv('MAP_TILE_CACHE_TIMEOUT', '86400'))
+MAP_MAX_TILES = int(os.getenv('MAP_MAX_TILES', '400'))
+MAP_TILE_BROWSER_MAX_AGE = int(os.getenv('MAP_TILE_BROWSER_MAX_AGE', '30'))
+# Nombre maximal de résultats d'une recherche de proximité (spatial_search.py)
+MAP_SEARCH_MAX_RESULTS = int(os.getenv('MAP_SEARCH_MAX_RESULTS', '100'))
+
+# Projection de la carte Terre (projection.py) : mètres réels par bloc, et bloc de la
+# longitude 0 / latitude 0 si la carte n'est pas centrée sur l'origine du monde
+MAP_SCALE = float(os.getenv('MAP_SCALE', '1000'))
+MAP_ORIGIN_X = int(os.getenv('MAP_ORIGIN_X', '0'))
+MAP_ORIGIN_Z = int(os.getenv('MAP_ORIGIN_Z', '0'))
+
+# Recherche de joueurs, villes et nations (search.py) : similarité minimale des trigrammes
+# pour une correspondance approchée, et nombre maximal de résultats d'autocomplétion
+SEARCH_MIN_SIMILARITY = float(os.getenv('SEARCH_MIN_SIMILARITY', '0.3'))
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', '20'))
+# Construire les index en arrière-plan dès la première requête de chaque processus
+SEARCH_WARM_INDEXES = os.getenv('SEARCH_WARM_INDEXES', 'True') == 'True'
+
 # Clés Stripe
 STRIPE_PUBLIC_KEY = os.getenv('STRIPE_PUBLIC_KEY')
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+STRIPE_READ_TIMEOUT = float(os.getenv('STRIPE_READ_TIMEOUT', '30'))
+STRIPE_MAX_NETWORK_RETRIES = int(os.getenv('STRIPE_MAX_NETWORK_RETRIES', '2'))
+
+# Appels HTTP sortants (minecraft_app/http_client.py) : Mojang, Discord, Stripe
+OUTBOUND_HTTP_CONNECT_TIMEOUT = float(os.getenv('OUTBOUND_HTTP_CONNECT_TIMEOUT', '3.05'))
+OUTBOUND_HTTP_READ_TIMEOUT = float(os.getenv('OUTBOUND_HTTP_READ_TIMEOUT', '5'))
+OUTBOUND_HTTP_RETRIES = int(os.getenv('OUTBOUND_HTTP_RETRIES', '2'))  # méthodes idempotentes uniquement
+OUTBOUND_HTTP_POOL_HOSTS = int(os.getenv('OUTBOUND_HTTP_POOL_HOSTS', '10'))
+OUTBOUND_HTTP_POOL_SIZE = int(os.getenv('OUTBOUND_HTTP_POOL_SIZE', '10'))  # connexions keep-alive par hôte
 
 
 # Configuration RCON pour Minecraft
@@ -64,6 +122,29 @@ MINECRAFT_RCON_HOST = os.getenv('MINECRAFT_RCON_HOST', 'localhost')
 MINECRAFT_RCON_PORT = int(os.getenv('MINECRAFT_RCON_PORT', '25575'))
 MINECRAFT_RCON_PASSWORD = os.getenv('MINECRAFT_RCON_PASSWORD', 'password')
 
+# Pool de connexions RCON (voir minecraft_app/rcon.py)
+MINECRAFT_RCON_POOL_SIZE = int(os.getenv('MINECRAFT_RCON_POOL_SIZE', '2'))
+MINECRAFT_RCON_TIMEOUT = float(os.getenv('MINECRAFT_RCON_TIMEOUT', '5'))  # connexion et lecture, en secondes
+MINECRAFT_RCON_POOL_ACQUIRE_TIMEOUT = float(os.getenv('MINECRAFT_RCON_POOL_ACQUIRE_TIMEOUT', '10'))
+MINECRAFT_RCON_KEEPALIVE = float(os.getenv('MINECRAFT_RCON_KEEPALIVE', '30'))  # ping des connexions inactives depuis plus longtemps
+# Commandes envoyées sans attendre la réponse dans un lot ; 1 = pas à pas (sûr avec le RCON vanilla/Paper)
+MINECRAFT_RCON_PIPELINE_DEPTH = int(os.getenv('MINECRAFT_RCON_PIPELINE_DEPTH', '1'))
+
+# Outbox des livraisons de rangs (commande deliver_ranks)
+RANK_DELIVERY_MAX_ATTEMPTS = int(os.getenv('RANK_DELIVERY_MAX_ATTEMPTS', '10'))
+RANK_DELIVERY_BACKOFF_BASE = float(os.getenv('RANK_DELIVERY_BACKOFF_BASE', '30'))  # secondes avant le 1er nouvel essai
+RANK_DELIVERY_BACKOFF_MAX = float(os.getenv('RANK_DELIVERY_BACKOFF_MAX', '3600'))
+
+# Statut du serveur de jeu (commande poll_server_status)
+MINECRAFT_SERVER_HOST = os.getenv('MINECRAFT_SERVER_HOST', MINECRAFT_RCON_HOST)
+MINECRAFT_SERVER_PORT = int(os.getenv('MINECRAFT_SERVER_PORT', '25565'))
+MINECRAFT_STATUS_TIMEOUT = float(os.getenv('MINECRAFT_STATUS_TIMEOUT', '3'))
+MINECRAFT_STATUS_CACHE_TTL = float(os.getenv('MINECRAFT_STATUS_CACHE_TTL', '5'))  # réponses SLP partagées entre requêtes simultanées
+MINECRAFT_STATUS_POLL_INTERVAL = float(os.getenv('MINECRAFT_STATUS_POLL_INTERVAL', '30'))
+MINECRAFT_STATUS_POLL_JITTER = float(os.getenv('MINECRAFT_STATUS_POLL_JITTER', '5'))  # +/- secondes aléatoires
+MINECRAFT_STATUS_CACHE_TIMEOUT = int(os.getenv('MINECRAFT_STATUS_CACHE_TIMEOUT', '180'))
+MINECRAFT_STATUS_DB_WRITE_INTERVAL = float(os.getenv('MINECRAFT_STATUS_DB_WRITE_INTERVAL', '300'))
+
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
@@ -106,6 +187,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'minecraft_app.context_processors.server',
             ],
         },
     },
@@ -183,4 +265,32 @@ CSRF_TRUSTED_ORIGINS = [
 
 # Configuration Discord
 DISCORD_SERVER_LINK = "https://discord.gg/a8G7wUKp2Y"
-DISCORD_WEBHOOK_URL = os.getenv('DISCORD_WEBHOOK_URL', '')  # Ajoute cette URL à ton fichier .env
\ No newline at end of file
+DISCORD_WEBHOOK_URL = os.getenv('DISCORD_WEBHOOK_URL', '')  # Ajoute cette URL à ton fichier .env
+
+# Envoi des messages du formulaire de contact (commande send_contact_messages)
+CONTACT_DELIVERY_BACKOFF_BASE = float(os.getenv('CONTACT_DELIVERY_BACKOFF_BASE', '10'))  # secondes avant le 1er nouvel essai
+CONTACT_DELIVERY_BACKOFF_MAX = float(os.getenv('CONTACT_DELIVERY_BACKOFF_MAX', '600'))
+
+# API Mojang (services.py) ; l'URL peut pointer vers un serveur local pour les tests
+MOJANG_API_URL = os.getenv('MOJANG_API_URL', 'https://api.mojang.com')
+MOJANG_API_RATE = float(os.getenv('MOJANG_API_RATE', '1'))  # appels par seconde (600 / 10 min côté Mojang)
+MOJANG_API_BURST = int(os.getenv('MOJANG_API_BURST', '10'))
+
+# Cache des UUID Mojang (services.fetch_minecraft_uuid)
+MOJANG_UUID_CACHE_SIZE = int(os.getenv('MOJANG_UUID_CACHE_SIZE', '4096'))  # entrées du cache mémoire
+MOJANG_UUID_CACHE_TTL = int(os.getenv('MOJANG_UUID_CACHE_TTL', str(7 * 24 * 3600)))  # pseudo trouvé
+MOJANG_UUID_NEGATIVE_CACHE_TTL = int(os.getenv('MOJANG_UUID_NEGATIVE_CACHE_TTL', '3600'))  # pseudo inconnu
+
+# Proxy des têtes de joueurs (vue avatar, minecraft_app/avatars.py)
+AVATAR_UPSTREAM_URL = os.getenv('AVATAR_UPSTREAM_URL', 'https://mc-heads.net')
+AVATAR_CACHE_DIR = os.getenv('AVATAR_CACHE_DIR', os.path.join(BASE_DIR, 'media', 'avatars'))
+AVATAR_SOURCE_SIZE = 256  # taille téléchargée, réduite ensuite avec Pillow
+AVATAR_MIN_SIZE = 8
+AVATAR_MAX_SIZE = 256
+AVATAR_CACHE_TTL = int(os.getenv('AVATAR_CACHE_TTL', str(24 * 3600)))  # re-téléchargement des skins modifiés
+AVATAR_BROWSER_MAX_AGE = int(os.getenv('AVATAR_BROWSER_MAX_AGE', str(24 * 3600)))
+AVATAR_FALLBACK_MAX_AGE = 300
+AVATAR_UPSTREAM_TIMEOUT = float(os.getenv('AVATAR_UPSTREAM_TIMEOUT', '1.5'))  # une seule tentative, sans reprise
+AVATAR_FAILURE_TTL = int(os.getenv('AVATAR_FAILURE_TTL', '60'))  # échecs mémorisés avant de réessayer mc-heads.net
+AVATAR_CACHE_MAX_ENTRIES = int(os.getenv('AVATAR_CACHE_MAX_ENTRIES', '20000'))  # joueurs gardés sur disque
+AVATAR_CACHE_PRUNE_INTERVAL = 60  # secondes entre deux nettoyages du cache disque